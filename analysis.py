@@ -1,20 +1,36 @@
 import click
 import os
-from typing import Tuple, List, Dict, Any
+import time
+import fnmatch
+from typing import Tuple, List, Dict, Any, Callable, Optional
 import pandas as pd
 from tqdm import tqdm
-import matplotlib as plt
+import matplotlib.pyplot as plt
 import numpy as np
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
 
-from analysis.validity_days import plot_validity_days
-from analysis.domains import plot_domain_count, count_num_no_common
-from analysis.basic_constraints import count_ca_enabled_certs
-from analysis.key_usage import count_key_usages
-from analysis.location import count_issuer_subject_country_matches
-from analysis.policies import plot_ev_certificates, count_certificate_policies
-from analysis.crl import plot_crl_distribution_points
-from analysis.crypto import plot_signature_algorithm
-from analysis.ct import plot_certificate_transparency_data
+from analysis.validity_days import plot_validity_days, aggregate_validity_days, render_validity_days, validity_days_columns
+from analysis.domains import plot_domain_count, aggregate_domain_count, render_domain_count, domain_count_columns
+from analysis.domains import count_num_no_common, aggregate_num_no_common, render_num_no_common, no_common_name_count_columns
+from analysis.basic_constraints import count_ca_enabled_certs, aggregate_ca_enabled_certs, render_ca_enabled_certs, ca_enabled_count_columns
+from analysis.key_usage import count_key_usages, aggregate_key_usages, render_key_usages, key_usage_count_columns
+from analysis.key_usage import plot_key_usage_combinations, render_key_usage_combinations, load_flag_names
+from analysis.location import count_issuer_subject_country_matches, aggregate_issuer_subject_country_matches, render_issuer_subject_country_matches, issuer_subject_country_matches_columns
+from analysis.policies import plot_ev_certificates, aggregate_ev_certificates, render_ev_certificates, ev_certificates_columns
+from analysis.policies import count_certificate_policies, certificate_policies_columns
+from analysis.crl import plot_crl_distribution_points, aggregate_crl_distribution_points, render_crl_distribution_points, crl_distribution_points_columns
+from analysis.crypto import plot_signature_algorithm, aggregate_signature_algorithm, render_signature_algorithm, signature_algorithm_columns
+from analysis.ct import plot_certificate_transparency_data, aggregate_certificate_transparency_data, render_certificate_transparency_data, certificate_transparency_data_columns
+from analysis.chains import plot_chains, aggregate_chains, render_chains, chains_columns, load_intermediates
+from analysis.keys import plot_public_keys, aggregate_public_keys, render_public_keys, public_keys_columns
+from analysis.aggregates import merge_aggregates
+from analysis.kernels import list_types_mapper
+from analysis.issuers import load_issuers
+from analysis.cache import AggregateCache, RenderCapture, export_aggregate, restore_rendered
+
+# custom imports
+from dataset import is_dataset
 
 # Create new `pandas` methods which use `tqdm` progress
 # (can use tqdm_gui, optional kwargs, etc.)
@@ -32,9 +48,467 @@ def ensure_dir_exists(path: str):
         )
 
 
+def plot_certificate_policies(df: pd.DataFrame, output_dir: str):
+    plot_ev_certificates(df, output_dir)
+
+    count_certificate_policies(df)
+
+
+def render_certificate_policies(aggregate: Dict[str, Any], output_dir: str):
+    render_ev_certificates(aggregate, output_dir)
+
+    # the rows sorted by the number of policies can't be printed without loading all of them
+    print("Skipping the rows sorted by the number of policies, they are only printed in memory")
+
+
+# maps the name of every analysis to the subdirectory of the output directory it writes
+# its plots to (None if it only prints its results), the function running it, the
+# columns it uses (patterns as understood by fnmatch) and the functions aggregating a
+# part of the rows / rendering the merged aggregates, used to run it out of core. the
+# functions take the rows / aggregates and the output directory, some of them take
+# keyword arguments in addition (see sketch_analyses and analysis_arguments)
+analyses: Dict[str, Tuple[
+    Optional[str],
+    Callable[..., None],
+    List[str],
+    Tuple[Callable[..., Dict[str, Any]], Callable[..., None]]
+]] = {
+    "validity-days": (
+        "validity",
+        plot_validity_days,
+        validity_days_columns,
+        (aggregate_validity_days, render_validity_days)
+    ),
+    "domain-count": (
+        "domains",
+        plot_domain_count,
+        domain_count_columns,
+        (aggregate_domain_count, render_domain_count)
+    ),
+    "no-common-name-count": (
+        None,
+        lambda df, output_dir: count_num_no_common(df),
+        no_common_name_count_columns,
+        (aggregate_num_no_common, lambda aggregate, output_dir: render_num_no_common(aggregate))
+    ),
+    "ca-enabled-count": (
+        None,
+        lambda df, output_dir: count_ca_enabled_certs(df),
+        ca_enabled_count_columns,
+        (aggregate_ca_enabled_certs, lambda aggregate, output_dir: render_ca_enabled_certs(aggregate))
+    ),
+    "key-usage-count": (
+        None,
+        lambda df, output_dir, flag_names: count_key_usages(df, flag_names),
+        key_usage_count_columns,
+        (
+            aggregate_key_usages,
+            lambda aggregate, output_dir, flag_names: render_key_usages(aggregate, flag_names)
+        )
+    ),
+    "key-usage-combinations": (
+        "key-usage",
+        plot_key_usage_combinations,
+        key_usage_count_columns,
+        (aggregate_key_usages, render_key_usage_combinations)
+    ),
+    "issuer-subject-country-matches": (
+        None,
+        lambda df, output_dir, issuers: count_issuer_subject_country_matches(df, issuers),
+        issuer_subject_country_matches_columns,
+        (
+            aggregate_issuer_subject_country_matches,
+            lambda aggregate, output_dir, issuers: render_issuer_subject_country_matches(aggregate, issuers)
+        )
+    ),
+    "certificate-policies": (
+        "policies",
+        plot_certificate_policies,
+        ev_certificates_columns + certificate_policies_columns,
+        (aggregate_ev_certificates, render_certificate_policies)
+    ),
+    "crl": (
+        "crl",
+        plot_crl_distribution_points,
+        crl_distribution_points_columns,
+        (aggregate_crl_distribution_points, render_crl_distribution_points)
+    ),
+    "crypto": (
+        "crypto",
+        plot_signature_algorithm,
+        signature_algorithm_columns,
+        (aggregate_signature_algorithm, render_signature_algorithm)
+    ),
+    "ct": (
+        "ct",
+        plot_certificate_transparency_data,
+        certificate_transparency_data_columns,
+        (aggregate_certificate_transparency_data, render_certificate_transparency_data)
+    ),
+    "chains": (
+        "chains",
+        plot_chains,
+        chains_columns,
+        (aggregate_chains, render_chains)
+    ),
+    "public-keys": (
+        "keys",
+        plot_public_keys,
+        public_keys_columns,
+        (aggregate_public_keys, render_public_keys)
+    ),
+}
+
+# the version of the aggregate of every analysis, part of the key of the cached
+# aggregates. it has to be bumped whenever the aggregation of an analysis changes
+analysis_versions: Dict[str, int] = {
+    "validity-days": 2,
+    "domain-count": 2,
+    "no-common-name-count": 1,
+    "ca-enabled-count": 1,
+    "key-usage-count": 2,
+    "key-usage-combinations": 1,
+    "issuer-subject-country-matches": 2,
+    "certificate-policies": 2,
+    "crl": 1,
+    "crypto": 1,
+    "ct": 1,
+    "chains": 1,
+    "public-keys": 2,
+}
+
+# the columns used by the analyses when run out of core, if they differ from the above
+out_of_core_columns: Dict[str, List[str]] = {
+    "certificate-policies": ev_certificates_columns,
+}
+
+# the analyses which can estimate their name statistics with sketches instead of
+# computing them exactly, their aggregation accepts a `sketch` argument
+sketch_analyses = ["validity-days", "domain-count"]
+
+# the additional arguments of the analyses which show data that is not part of the rows,
+# loaded once per input by load_analysis_arguments:
+#  - issuers: the issuers table of the input, see analysis/issuers.py
+#  - flag_names: the names of the bits of the bitmask columns, see analysis/key_usage.py
+#  - intermediates: the intermediates table of the input, see analysis/chains.py
+analysis_arguments: Dict[str, List[str]] = {
+    "validity-days": ['issuers'],
+    "issuer-subject-country-matches": ['issuers'],
+    "public-keys": ['issuers'],
+    "key-usage-count": ['flag_names'],
+    "key-usage-combinations": ['flag_names'],
+    "chains": ['intermediates'],
+}
+
+
+def load_analysis_arguments(selected: List[str], input_path: str) -> Dict[str, Any]:
+    "Loads the additional arguments required by the selected analyses"
+    required = set(
+        argument for name in selected for argument in analysis_arguments.get(name, [])
+    )
+
+    arguments: Dict[str, Any] = {}
+
+    if 'issuers' in required:
+        arguments['issuers'] = load_issuers(input_path)
+
+    if 'flag_names' in required:
+        arguments['flag_names'] = load_flag_names(input_path)
+
+    if 'intermediates' in required:
+        arguments['intermediates'] = load_intermediates(input_path)
+
+    return arguments
+
+
+def analysis_options(analysis: str, arguments: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    "The additional arguments an analysis is run / rendered with"
+    if arguments is None:
+        return {}
+
+    return {
+        argument: arguments[argument] for argument in analysis_arguments.get(analysis, [])
+    }
+
+
+def resolve_columns(patterns: List[str], available_columns: List[str]) -> List[str]:
+    "Returns the available columns matching any of the patterns, in the order of the file"
+    # the id is always loaded, this way the number of rows is known even if none
+    # of the other columns exist
+    patterns = ['id'] + patterns
+
+    return [
+        column for column in available_columns
+        if any(fnmatch.fnmatchcase(column, pattern) for pattern in patterns)
+    ]
+
+
+def load_input(input_file: str, patterns: List[str]) -> pd.DataFrame:
+    "Loads the columns of the input file or partitioned dataset that match the given patterns"
+    filename = os.path.basename(input_file)
+
+    if is_dataset(input_file):
+        dataset = ds.dataset(input_file, format="parquet")
+        available_columns = dataset.schema.names
+        columns = resolve_columns(patterns, available_columns)
+        df = dataset.to_table(columns=columns)\
+            .to_pandas(types_mapper=list_types_mapper)
+    elif filename.endswith(".csv"):
+        available_columns = pd.read_csv(input_file, nrows=0).columns.tolist()
+        columns = resolve_columns(patterns, available_columns)
+        df = pd.read_csv(input_file, usecols=columns)[columns]
+    elif filename.endswith(".parquet"):
+        available_columns = pq.read_schema(input_file).names
+        columns = resolve_columns(patterns, available_columns)
+        # the list columns are kept in arrow, the analyses operate on them vectorized
+        df = pq.read_table(input_file, columns=columns)\
+            .to_pandas(types_mapper=list_types_mapper)
+    else:
+        raise Exception(
+            f"Unsupported format, only .csv and .parquet files are currently supported"
+        )
+
+    print(f"Loaded {len(columns)} of {len(available_columns)} columns")
+
+    return df
+
+
+def get_analysis_output_dir(analysis: str, output_dir: str) -> str:
+    subdirectory = analyses[analysis][0]
+
+    if subdirectory is None:
+        return output_dir
+
+    ensure_dir_exists(f"{output_dir}/{subdirectory}/")
+
+    return f"{output_dir}/{subdirectory}/"
+
+
+def run_analysis(analysis: str, df: pd.DataFrame, output_dir: str, sketch: bool = False, arguments: Optional[Dict[str, Any]] = None) -> float:
+    "Runs a single analysis and returns its wall time in seconds"
+    if analysis not in analyses:
+        raise Exception(f"Unimplemented analysis method '{analysis}'")
+
+    run = analyses[analysis][1]
+
+    if sketch and analysis in sketch_analyses:
+        aggregate_rows, render = analyses[analysis][3]
+        run = lambda df, output_dir, **options: render(aggregate_rows(df, sketch=True), output_dir, **options)
+
+    analysis_output_dir = get_analysis_output_dir(analysis, output_dir)
+
+    start = time.perf_counter()
+
+    # the analyses add and fill columns of the dataframe they are given. a shallow copy
+    # gives every analysis its own view such that these changes don't leak into the
+    # analyses that run afterwards, the data itself is not copied
+    run(df.copy(deep=False), analysis_output_dir, **analysis_options(analysis, arguments))
+
+    # free the figures of the analysis
+    plt.close('all')
+
+    return time.perf_counter() - start
+
+
+def aggregate_out_of_core(selected: List[str], input_path: str, batch_size: int, sketch: bool = False) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+    """
+    Aggregates the analyses on batches of rows of a parquet file or dataset such that only
+    one batch has to be held in memory at a time. The partial results of every batch are
+    merged. Returns the merged aggregates and the wall times in seconds.
+    """
+    dataset = ds.dataset(input_path, format="parquet")
+
+    available_columns = dataset.schema.names
+    columns = resolve_columns(
+        [
+            pattern for name in selected
+            for pattern in out_of_core_columns.get(name, analyses[name][2])
+        ],
+        available_columns
+    )
+
+    print(f"Loading {len(columns)} of {len(available_columns)} columns in batches")
+
+    aggregates: Dict[str, Dict[str, Any]] = {}
+    wall_times: Dict[str, float] = {name: 0.0 for name in selected}
+
+    for batch in tqdm(
+        dataset.to_batches(columns=columns, batch_size=batch_size),
+        total=-(-dataset.count_rows() // batch_size),
+        unit="batches"
+    ):
+        # datasets yield empty batches for empty files
+        if batch.num_rows == 0:
+            continue
+
+        df = batch.to_pandas(types_mapper=list_types_mapper)
+
+        for name in selected:
+            start = time.perf_counter()
+
+            aggregate = aggregate_analysis(name, df, sketch)
+
+            aggregates[name] = merge_aggregates(aggregates[name], aggregate) \
+                if name in aggregates else aggregate
+
+            wall_times[name] += time.perf_counter() - start
+
+    if len(aggregates) == 0:
+        raise Exception(f"Input '{input_path}' does not contain any rows")
+
+    return aggregates, wall_times
+
+
+def aggregate_analysis(analysis: str, df: pd.DataFrame, sketch: bool = False) -> Dict[str, Any]:
+    "Computes the aggregate of an analysis for the given rows"
+    aggregate_rows = analyses[analysis][3][0]
+
+    # see run_analysis, the analyses may change the dataframe they are given
+    if sketch and analysis in sketch_analyses:
+        return aggregate_rows(df.copy(deep=False), sketch=True)
+
+    return aggregate_rows(df.copy(deep=False))
+
+
+def render_analysis(analysis: str, aggregate: Dict[str, Any], output_dir: str, arguments: Optional[Dict[str, Any]] = None) -> float:
+    "Renders the merged aggregate of an analysis and returns its wall time in seconds"
+    render = analyses[analysis][3][1]
+
+    start = time.perf_counter()
+
+    render(aggregate, get_analysis_output_dir(analysis, output_dir), **analysis_options(analysis, arguments))
+
+    # free the figures of the analysis
+    plt.close('all')
+
+    return time.perf_counter() - start
+
+
+def run_analyses_out_of_core(selected: List[str], input_path: str, output_dir: str, batch_size: int, sketch: bool = False, arguments: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+    "Runs the analyses on batches of rows, see aggregate_out_of_core. Returns the wall times in seconds"
+    aggregates, wall_times = aggregate_out_of_core(selected, input_path, batch_size, sketch)
+
+    for name in selected:
+        print(f"Running analysis '{name}'..")
+
+        wall_times[name] += render_analysis(name, aggregates[name], output_dir, arguments)
+
+        print(f"Analysis '{name}' took {wall_times[name]:.2f}s")
+
+    return wall_times
+
+
+def aggregate_options(analysis: str, sketch: bool) -> Dict[str, Any]:
+    "The options changing the aggregate of an analysis, part of its cache key"
+    return {'sketch': sketch and analysis in sketch_analyses}
+
+
+def uses_aggregate(analysis: str, out_of_core: bool) -> bool:
+    "Checks whether an analysis is run by rendering its aggregate, only those can be cached and exported"
+    # the in memory runs of these analyses print more than their aggregates contain
+    return out_of_core or analysis not in out_of_core_columns
+
+
+def render_analysis_cached(analysis: str, aggregate: Dict[str, Any], output_dir: str, sketch: bool, cache: AggregateCache, arguments: Optional[Dict[str, Any]] = None) -> float:
+    """
+    Renders the aggregate of an analysis, restoring the plots and the printed results of
+    a previous rendering of the same aggregate from the cache. Returns the wall time in seconds.
+    """
+    analysis_output_dir = get_analysis_output_dir(analysis, output_dir)
+    key = (analysis, analysis_versions[analysis], aggregate_options(analysis, sketch), analysis_options(analysis, arguments))
+
+    start = time.perf_counter()
+    rendered = cache.lookup_rendered(*key)
+
+    if rendered is not None:
+        print(f"Using the cached rendering of analysis '{analysis}'")
+        restore_rendered(rendered, analysis_output_dir)
+
+        return time.perf_counter() - start
+
+    with RenderCapture(analysis_output_dir) as capture:
+        render_analysis(analysis, aggregate, output_dir, arguments)
+
+    cache.store_rendered(*key, capture.rendered)
+
+    return time.perf_counter() - start
+
+
+def run_analyses_cached(selected: List[str], input_path: str, output_dir: str, out_of_core: bool, batch_size: int, sketch: bool, cache: Optional[AggregateCache], export_format: Optional[str], arguments: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+    """
+    Runs the analyses, taking the aggregates of an unchanged input from the cache and
+    only loading the input for the ones that are missing. The computed aggregates are
+    stored in the cache and, if a format is given, exported to the output directory.
+    Returns the wall times in seconds.
+    """
+    aggregates: Dict[str, Dict[str, Any]] = {}
+    wall_times: Dict[str, float] = {name: 0.0 for name in selected}
+
+    if cache is not None:
+        for name in selected:
+            if not uses_aggregate(name, out_of_core):
+                continue
+
+            aggregate = cache.lookup(name, analysis_versions[name], aggregate_options(name, sketch))
+
+            if aggregate is not None:
+                print(f"Using the cached aggregate of analysis '{name}'")
+                aggregates[name] = aggregate
+
+    missing = [name for name in selected if name not in aggregates]
+    df: Optional[pd.DataFrame] = None
+
+    if out_of_core and len(missing) > 0:
+        computed, wall_times_computed = aggregate_out_of_core(
+            missing, input_path, batch_size, sketch
+        )
+        aggregates.update(computed)
+        wall_times.update(wall_times_computed)
+    elif len(missing) > 0:
+        # only load the columns used by the analyses that are not cached
+        df = load_input(
+            input_path,
+            [pattern for name in missing for pattern in analyses[name][2]]
+        )
+
+    for name in selected:
+        print(f"Running analysis '{name}'..")
+
+        if not uses_aggregate(name, out_of_core):
+            wall_times[name] = run_analysis(name, df, output_dir, sketch, arguments)
+            print(f"Analysis '{name}' took {wall_times[name]:.2f}s")
+            continue
+
+        if name not in aggregates:
+            start = time.perf_counter()
+            aggregates[name] = aggregate_analysis(name, df, sketch)
+            wall_times[name] += time.perf_counter() - start
+
+        if name in missing and cache is not None:
+            cache.store(
+                name, analysis_versions[name], aggregate_options(name, sketch), aggregates[name]
+            )
+
+        if export_format is not None:
+            export_aggregate(
+                aggregates[name], get_analysis_output_dir(name, output_dir), name, export_format
+            )
+
+        if cache is None:
+            wall_times[name] += render_analysis(name, aggregates[name], output_dir, arguments)
+        else:
+            wall_times[name] += render_analysis_cached(
+                name, aggregates[name], output_dir, sketch, cache, arguments
+            )
+
+        print(f"Analysis '{name}' took {wall_times[name]:.2f}s")
+
+    return wall_times
+
+
 @click.command()
 # positional arguments
-# the input path, either a csv file or a parquet file
+# the input path, either a csv file, a parquet file or (out of core only) a partitioned dataset
 @click.argument('input_file', type=click.Path(exists=True))
 # output must be a folder
 @click.argument('output_dir')
@@ -44,59 +518,80 @@ def ensure_dir_exists(path: str):
 @click.option('--no-common-name-count', 'analysis', flag_value='no-common-name-count')
 @click.option('--ca-enabled-count', 'analysis', flag_value='ca-enabled-count')
 @click.option('--key-usage-count', 'analysis', flag_value='key-usage-count')
+@click.option('--key-usage-combinations', 'analysis', flag_value='key-usage-combinations')
 @click.option('--issuer-subject-country-matches', 'analysis', flag_value='issuer-subject-country-matches')
 @click.option('--certificate-policies', 'analysis', flag_value='certificate-policies')
 @click.option('--crl', 'analysis', flag_value='crl')
 @click.option('--ct', 'analysis', flag_value='ct')
 @click.option('--crypto', 'analysis', flag_value='crypto')
-def main(input_file: str, output_dir: str, analysis: str):
-    if not os.path.isfile(input_file):
-        raise Exception(f"Input path has to be a file")
+@click.option('--chains', 'analysis', flag_value='chains')
+@click.option('--public-keys', 'analysis', flag_value='public-keys')
+# run multiple analyses on a single load of the input, overrides the flags above
+@click.option('--analysis', 'selected_analyses', type=click.Choice(list(analyses.keys())), multiple=True)
+@click.option('--all', 'all_analyses', is_flag=True, default=False)
+# process parquet inputs in batches of rows instead of loading them at once
+@click.option('--out-of-core', is_flag=True, default=False)
+@click.option('--batch-size', type=click.IntRange(min=1), default=100000)
+# estimate the distinct names and the most frequent names / issuers with sketches
+# taking constant memory, see analysis/sketches.py for the error bounds
+@click.option('--sketch', is_flag=True, default=False)
+# store the aggregates of the analyses, unchanged inputs are only rendered again
+@click.option('--cache-dir', type=click.Path(file_okay=False), default=None)
+# write the aggregates of the analyses next to their plots
+@click.option('--export-aggregates', 'export_format', type=click.Choice(['csv', 'json']), default=None)
+def main(input_file: str, output_dir: str, analysis: str, selected_analyses: Tuple[str], all_analyses: bool, out_of_core: bool, batch_size: int, sketch: bool, cache_dir: Optional[str], export_format: Optional[str]):
+    if out_of_core:
+        if not input_file.endswith(".parquet") and not is_dataset(input_file):
+            raise Exception(
+                f"Out of core analyses require a .parquet file or a partitioned dataset as input"
+            )
+    elif not os.path.isfile(input_file) and not is_dataset(input_file):
+        raise Exception(f"Input path has to be a file or a partitioned dataset")
 
-    filename = os.path.basename(input_file)
+    if not os.path.isdir(output_dir):
+        raise Exception(f"Output path must point to a directory")
 
-    if filename.endswith(".csv"):
-        df = pd.read_csv(input_file)
-    elif filename.endswith(".parquet"):
-        df = pd.read_parquet(input_file)
+    if all_analyses:
+        selected = list(analyses.keys())
+    elif len(selected_analyses) > 0:
+        selected = list(selected_analyses)
     else:
-        raise Exception(
-            f"Unsupported format, only .csv and .parquet files are currently supported"
-        )
+        selected = [analysis]
 
-    if not os.path.isdir(output_dir):
-        raise Exception(f"Output path must point to a directory")
+    for name in selected:
+        if name not in analyses:
+            raise Exception(f"Unimplemented analysis method '{name}'")
+
+    # e.g. the names of the issuers are only loaded if any of the analyses shows them
+    arguments = load_analysis_arguments(selected, input_file)
 
-    if analysis == "validity-days":
-        ensure_dir_exists(f"{output_dir}/validity/")
-        plot_validity_days(df, f"{output_dir}/validity/")
-    elif analysis == "domain-count":
-        ensure_dir_exists(f"{output_dir}/domains/")
-        plot_domain_count(df, f"{output_dir}/domains/")
-    elif analysis == "no-common-name-count":
-        count_num_no_common(df)
-    elif analysis == "ca-enabled-count":
-        count_ca_enabled_certs(df)
-    elif analysis == "key-usage-count":
-        count_key_usages(df)
-    elif analysis == "issuer-subject-country-matches":
-        count_issuer_subject_country_matches(df)
-    elif analysis == "certificate-policies":
-        ensure_dir_exists(f"{output_dir}/policies/")
-        plot_ev_certificates(df, f"{output_dir}/policies/")
-
-        count_certificate_policies(df)
-    elif analysis == "crl":
-        ensure_dir_exists(f"{output_dir}/crl/")
-        plot_crl_distribution_points(df, f"{output_dir}/crl/")
-    elif analysis == "crypto":
-        ensure_dir_exists(f"{output_dir}/crypto/")
-        plot_signature_algorithm(df, f"{output_dir}/crypto/")
-    elif analysis == "ct":
-        ensure_dir_exists(f"{output_dir}/ct/")
-        plot_certificate_transparency_data(df, f"{output_dir}/ct/")
+    if cache_dir is not None or export_format is not None:
+        cache = AggregateCache(cache_dir, input_file) if cache_dir is not None else None
+
+        wall_times = run_analyses_cached(
+            selected, input_file, output_dir, out_of_core, batch_size, sketch, cache, export_format, arguments
+        )
+    elif out_of_core:
+        wall_times = run_analyses_out_of_core(
+            selected, input_file, output_dir, batch_size, sketch, arguments
+        )
     else:
-        raise Exception(f"Unimplemented analysis method '{analysis}'")
+        # only load the columns used by the selected analyses
+        df = load_input(
+            input_file,
+            [pattern for name in selected for pattern in analyses[name][2]]
+        )
+
+        wall_times: Dict[str, float] = {}
+
+        for name in selected:
+            print(f"Running analysis '{name}'..")
+            wall_times[name] = run_analysis(name, df, output_dir, sketch, arguments)
+            print(f"Analysis '{name}' took {wall_times[name]:.2f}s")
+
+    if len(wall_times) > 1:
+        for name, wall_time in wall_times.items():
+            print(f"{name}: {wall_time:.2f}s")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,54 @@
+from typing import Tuple, List, Dict, Any
+import pandas as pd
+import pyarrow as pa
+
+from analysis.sketches import HyperLogLog, HeavyHitters
+
+
+# the analyses are split into an aggregation computing partial results of a part of
+# the rows and a rendering step printing / plotting the merged partial results. the
+# partial results consist of the following types, which are merged as follows:
+#  - ints / floats: summed up
+#  - sets: united
+#  - pandas series of counts / sums indexed by a key: summed up per key
+#  - arrow tables of distinct rows: united without duplicates
+#  - sketches: merged, see analysis/sketches.py
+#  - dicts: merged per key, following the rules above for keys present in both
+
+
+def merge_counts(a: pd.Series, b: pd.Series) -> pd.Series:
+    "Sums up two series per index key, the result is sorted by the keys like a groupby result"
+    # empty series of batches without any matching rows might not share the dtype
+    if len(a) == 0:
+        return b
+
+    if len(b) == 0:
+        return a
+
+    return pd.concat([a, b]).groupby(level=0).sum()
+
+
+def merge_aggregates(a: Any, b: Any) -> Any:
+    "Merges two partial results of an analysis"
+    if isinstance(a, dict):
+        # keep the order of the keys as they appeared first
+        merged = dict(a)
+
+        for key, value in b.items():
+            merged[key] = merge_aggregates(a[key], value) if key in a else value
+
+        return merged
+
+    if isinstance(a, HyperLogLog) or isinstance(a, HeavyHitters):
+        return a.merge(b)
+
+    if isinstance(a, set):
+        return a | b
+
+    if isinstance(a, pd.Series):
+        return merge_counts(a, b)
+
+    if isinstance(a, pa.Table):
+        return pa.concat_tables([a, b]).group_by(a.column_names).aggregate([])
+
+    return a + b
@@ -11,17 +11,30 @@ from itertools import chain
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the columns used by count_ca_enabled_certs
+ca_enabled_count_columns = ['EXTENSION_BASIC_CONSTRAINTS_CA']
+
+
+def aggregate_ca_enabled_certs(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of count_ca_enabled_certs for the given rows"
+    return {
+        'ca_enabled_count': len(df[df['EXTENSION_BASIC_CONSTRAINTS_CA'] == True]),
+        # print(df[df['id'].isna()]["id"])
+        'no_basic_constraints_count': len(df[df['EXTENSION_BASIC_CONSTRAINTS_CA'].isna()]),
+        'total_count': len(df),
+    }
 
-def count_ca_enabled_certs(df: pd.DataFrame):
 
-    print(
-        len(df[df['EXTENSION_BASIC_CONSTRAINTS_CA'] == True])
-    )
+def render_ca_enabled_certs(aggregate: Dict[str, Any]):
 
-    # print(df[df['id'].isna()]["id"])
+    print(aggregate['ca_enabled_count'])
 
     # there are some certificartes without the basic_constraints extension
     # but this is fine as this results in the flag being set to false
     # https://www.rfc-editor.org/rfc/rfc5280#section-4.2.1.9
     # print(df[df['EXTENSION_BASIC_CONSTRAINTS_CA'].isna()]["id"])
-    print(f"{len(df[df['EXTENSION_BASIC_CONSTRAINTS_CA'].isna()])} / {len(df)}")
+    print(f"{aggregate['no_basic_constraints_count']} / {aggregate['total_count']}")
+
+
+def count_ca_enabled_certs(df: pd.DataFrame):
+    render_ca_enabled_certs(aggregate_ca_enabled_certs(df))
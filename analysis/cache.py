@@ -0,0 +1,248 @@
+import os
+import io
+import sys
+import glob
+import json
+import pickle
+import hashlib
+import contextlib
+from typing import Tuple, List, Dict, Any, Optional
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pcsv
+
+from analysis.sketches import HyperLogLog, HeavyHitters
+
+# the merged aggregates of the analyses (see analysis/aggregates.py) are small compared
+# to their input, persisting them allows re-rendering the plots of an unchanged input
+# without loading it again. the rendered plots and the printed results are stored as
+# well, an unchanged aggregate is not even rendered again
+
+
+# identifies the version of the rendering, rendered outputs of a different version are
+# stale. it changes whenever the code of any of the analyses changes
+render_version_hash = hashlib.sha256()
+
+for source_path in sorted(glob.glob(f"{os.path.dirname(os.path.abspath(__file__))}/*.py")) + \
+        [f"{os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}/analysis.py"]:
+    with open(source_path, 'rb') as f:
+        render_version_hash.update(f.read())
+
+render_version = render_version_hash.hexdigest()
+
+
+def input_fingerprint(input_path: str) -> List[Tuple[str, int, int]]:
+    "Returns the relative path, size and modification time of the input file or of every file of an input dataset"
+    if os.path.isfile(input_path):
+        stat = os.stat(input_path)
+        return [(os.path.basename(input_path), stat.st_size, stat.st_mtime_ns)]
+
+    fingerprint: List[Tuple[str, int, int]] = []
+
+    for directory, _, filenames in os.walk(input_path):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            fingerprint.append((os.path.relpath(path, input_path), stat.st_size, stat.st_mtime_ns))
+
+    return sorted(fingerprint)
+
+
+class AggregateCache:
+    """
+    Stores the merged aggregates of the analyses of an input as pickle files in a
+    directory. The key of an entry combines the fingerprint of the input with the
+    version of the analysis and the options changing its aggregates, bumping the
+    version of an analysis invalidates all of its entries. Only the latest entry of
+    every analysis and input is kept.
+    """
+
+    def __init__(self, cache_dir: str, input_path: str):
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        self.cache_dir = cache_dir
+
+        # the entries of the same input share a prefix, such that outdated ones can be removed
+        input_path = os.path.abspath(input_path)
+        self.input_prefix = os.path.basename(input_path) + "-" + \
+            hashlib.sha1(input_path.encode()).hexdigest()[:8]
+        self.fingerprint = input_fingerprint(input_path)
+
+    def entry_path(self, analysis: str, version: int, options: Dict[str, Any]) -> str:
+        key = hashlib.sha1(json.dumps({
+            'fingerprint': self.fingerprint,
+            'version': version,
+            'options': options,
+        }, sort_keys=True).encode()).hexdigest()[:16]
+
+        return f"{self.cache_dir}/{analysis}-{self.input_prefix}-{key}.pickle"
+
+    def lookup(self, analysis: str, version: int, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        "Returns the cached aggregate of an analysis, None if the input, the version or the options changed"
+        path = self.entry_path(analysis, version, options)
+
+        if not os.path.isfile(path):
+            return None
+
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def store(self, analysis: str, version: int, options: Dict[str, Any], aggregate: Dict[str, Any]):
+        path = self.entry_path(analysis, version, options)
+
+        # the rendered outputs of the outdated entries are removed as well
+        for outdated_path in glob.glob(f"{self.cache_dir}/{glob.escape(analysis)}-{glob.escape(self.input_prefix)}-*.pickle"):
+            os.remove(outdated_path)
+
+        write_pickle(path, aggregate)
+
+    def rendered_path(self, analysis: str, version: int, options: Dict[str, Any], arguments: Dict[str, Any]) -> str:
+        # the rendering also depends on the code of the analyses and on their additional
+        # arguments, e.g. the issuers table
+        key = hashlib.sha1(json.dumps({
+            'render_version': render_version,
+            'arguments': hashlib.sha1(pickle.dumps(arguments)).hexdigest(),
+        }, sort_keys=True).encode()).hexdigest()[:16]
+
+        return self.entry_path(analysis, version, options).removesuffix(".pickle") + f"-rendered-{key}.pickle"
+
+    def lookup_rendered(self, analysis: str, version: int, options: Dict[str, Any], arguments: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        "Returns the cached outputs of rendering an analysis, see RenderCapture"
+        path = self.rendered_path(analysis, version, options, arguments)
+
+        if not os.path.isfile(path):
+            return None
+
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def store_rendered(self, analysis: str, version: int, options: Dict[str, Any], arguments: Dict[str, Any], rendered: Dict[str, Any]):
+        path = self.rendered_path(analysis, version, options, arguments)
+        prefix = self.entry_path(analysis, version, options).removesuffix(".pickle")
+
+        # only the latest rendering of an aggregate is kept
+        for outdated_path in glob.glob(f"{glob.escape(prefix)}-rendered-*.pickle"):
+            os.remove(outdated_path)
+
+        write_pickle(path, rendered)
+
+
+def write_pickle(path: str, value: Any):
+    # write to a temporary file first, an existing entry is always complete
+    with open(f"{path}.tmp", 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(f"{path}.tmp", path)
+
+
+class TeeOutput:
+    "Writes the printed text to the original output and keeps a copy of it"
+
+    def __init__(self, stream: Any):
+        self.stream = stream
+        self.copy = io.StringIO()
+
+    def write(self, text: str) -> int:
+        self.copy.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def modification_times(output_dir: str) -> Dict[str, int]:
+    return {
+        entry.name: entry.stat().st_mtime_ns
+        for entry in os.scandir(output_dir) if entry.is_file()
+    }
+
+
+class RenderCapture:
+    """
+    Records the files an analysis writes to its output directory and the text it prints
+    while rendering, such that a cached rendering can be restored without rendering the
+    plots again (see restore_rendered).
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.rendered: Dict[str, Any] = {'files': {}, 'printed': ""}
+
+    def __enter__(self):
+        self.before = modification_times(self.output_dir)
+        self.output = TeeOutput(sys.stdout)
+        self.redirect = contextlib.redirect_stdout(self.output)
+        self.redirect.__enter__()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        self.redirect.__exit__(*exc_info)
+
+        # the files that were created or overwritten
+        for name, mtime in modification_times(self.output_dir).items():
+            if self.before.get(name) != mtime:
+                with open(f"{self.output_dir}/{name}", 'rb') as f:
+                    self.rendered['files'][name] = f.read()
+
+        self.rendered['printed'] = self.output.copy.getvalue()
+
+
+def restore_rendered(rendered: Dict[str, Any], output_dir: str):
+    "Writes the files and prints the text of a cached rendering, see RenderCapture"
+    for name, content in rendered['files'].items():
+        with open(f"{output_dir}/{name}", 'wb') as f:
+            f.write(content)
+
+    print(rendered['printed'], end="")
+
+
+def to_json_value(value: Any) -> Any:
+    "Converts a part of an aggregate to a value that can be serialized as json"
+    if isinstance(value, dict):
+        return {str(key): to_json_value(item) for key, item in value.items()}
+
+    if isinstance(value, HyperLogLog) or isinstance(value, HeavyHitters):
+        return value.to_dict()
+
+    if isinstance(value, set):
+        return sorted(to_json_value(item) for item in value)
+
+    if isinstance(value, pd.Series):
+        return {str(key): to_json_value(item) for key, item in value.items()}
+
+    if isinstance(value, pa.Table):
+        return value.to_pylist()
+
+    # numpy scalars
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+
+def export_aggregate(aggregate: Dict[str, Any], output_dir: str, analysis: str, format: str):
+    """
+    Writes the aggregate of an analysis to the output directory. With the json format
+    it is written to a single `<analysis>-aggregate.json` file. With the csv format the
+    series and tables are written to a `<analysis>-<key>.csv` file each and the
+    remaining values to the json file.
+    """
+    remaining: Dict[str, Any] = {}
+
+    for key, value in aggregate.items():
+        if format == 'csv' and isinstance(value, pd.Series):
+            # the values are named after the key, the index keeps its name
+            value.rename(key).to_csv(f"{output_dir}/{analysis}-{key}.csv")
+        elif format == 'csv' and isinstance(value, pa.Table):
+            pcsv.write_csv(value, f"{output_dir}/{analysis}-{key}.csv")
+        else:
+            remaining[key] = value
+
+    if len(remaining) == 0:
+        return
+
+    with open(f"{output_dir}/{analysis}-aggregate.json", 'w') as f:
+        json.dump(to_json_value(remaining), f, indent=2)
@@ -0,0 +1,113 @@
+import os
+from typing import Tuple, List, Dict, Any
+import pandas as pd
+from tqdm import tqdm
+import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analysis.kernels import list_lengths, flatten_lists
+
+# custom imports
+from dataset import side_table_path, INTERMEDIATES_FILENAME
+
+# Create new `pandas` methods which use `tqdm` progress
+# (can use tqdm_gui, optional kwargs, etc.)
+# (https://stackoverflow.com/a/34365537/2897827)
+tqdm.pandas()
+
+# the columns used by plot_chains
+chains_columns = ['chain_fingerprints']
+
+# the number of intermediates shown in the frequency plot
+TOP_INTERMEDIATES = 20
+
+
+def load_intermediates(input_path: str) -> pd.DataFrame:
+    "Loads the intermediates table of an extraction output, indexed by the fingerprint"
+    path = side_table_path(input_path, "intermediates", INTERMEDIATES_FILENAME)
+
+    if not os.path.isfile(path):
+        raise Exception(
+            f"Did not find the intermediates table '{path}', it is written along with the extracted certificates"
+        )
+
+    if path.endswith(".csv"):
+        intermediates = pd.read_csv(path)
+    else:
+        intermediates = pq.read_table(path).to_pandas()
+
+    return intermediates.set_index('fingerprint')
+
+
+def aggregate_chains(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of plot_chains for the given rows"
+
+    # the number of certificates in the chain of every certificate, the certificate itself excluded
+    chain_length = pd.Series(list_lengths(df['chain_fingerprints']))
+
+    # the number of chains every intermediate / root is part of, some chains list the
+    # same certificate more than once
+    rows, fingerprints = flatten_lists(df['chain_fingerprints'])
+    fingerprints = pa.table({'row': rows, 'fingerprint': fingerprints})\
+        .group_by(['row', 'fingerprint'])\
+        .aggregate([])['fingerprint']\
+        .to_pandas()
+
+    return {
+        'count_by_chain_length': chain_length.groupby(chain_length).size(),
+        'count_by_intermediate': fingerprints.groupby(fingerprints).size(),
+        'total_count': len(df),
+    }
+
+
+def render_chains(aggregate: Dict[str, Any], output_dir: str, intermediates: pd.DataFrame):
+    count_by_chain_length = aggregate['count_by_chain_length']
+
+    fig, ax = plt.subplots(dpi=300)
+    ax.set_yscale("log")
+    ax.set_ylabel("# of certificates")
+    ax.set_xlabel("# of certificates in the chain")
+    # force integer ticks
+    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+    ax.bar(count_by_chain_length.index, count_by_chain_length.values)
+    plt.savefig(f"{output_dir}/chain-length.png")
+
+    # the most frequent intermediates, labeled by the start of their fingerprint. the
+    # full fingerprints are printed along with the subjects from the intermediates table
+    count_by_intermediate = aggregate['count_by_intermediate']\
+        .sort_values(ascending=False)
+    top_intermediates = count_by_intermediate.head(TOP_INTERMEDIATES)
+
+    fig, ax = plt.subplots(dpi=300)
+    ax.set_yscale("log")
+    ax.set_ylabel("# of certificates")
+    ax.set_xlabel("intermediate (fingerprint)")
+
+    ax.bar(
+        [fingerprint[:8] for fingerprint in top_intermediates.index],
+        top_intermediates.values
+    )
+
+    for tick in ax.xaxis.get_major_ticks():
+        tick.label.set_fontsize(4)
+
+    fig.autofmt_xdate(rotation=90)
+    plt.savefig(f"{output_dir}/intermediates.png")
+
+    total_count = aggregate['total_count']
+
+    print(f"Distinct certificates in the chains: {len(count_by_intermediate)}")
+    print(f"Most frequent certificates in the chains of {total_count} certificates:")
+
+    subjects = intermediates['subject']
+
+    for fingerprint, count in top_intermediates.items():
+        subject = subjects.get(fingerprint, "unknown subject")
+        print(f"{fingerprint} ({subject}): {count}, {count / total_count * 100:.2f}%")
+
+
+def plot_chains(df: pd.DataFrame, output_dir: str, intermediates: pd.DataFrame):
+    render_chains(aggregate_chains(df), output_dir, intermediates)
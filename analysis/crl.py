@@ -12,36 +12,25 @@ from itertools import chain
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the columns used by plot_crl_distribution_points
+crl_distribution_points_columns = [
+    'EXTENSION_CRL_DISTRIBUTION_POINTS_COUNT',
+    'EXTENSION_TLS_FEATURE',
+    'EXTENSION_TLS_FEATURE_STATUS_REQUEST',
+    'EXTENSION_TLS_FEATURE_STATUS_REQUEST_2',
+]
 
-def plot_crl_distribution_points(df: pd.DataFrame, output_dir: str):
+
+def aggregate_crl_distribution_points(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of plot_crl_distribution_points for the given rows"
 
     df['EXTENSION_CRL_DISTRIBUTION_POINTS_COUNT'] = df['EXTENSION_CRL_DISTRIBUTION_POINTS_COUNT']\
         .fillna(0)
 
-    # sort the rows by the number of distribution points
-    certificates_by_crl_distribution_count = df.groupby(
+    # the number of rows per number of distribution points
+    count_by_crl_distribution_count = df.groupby(
         by=['EXTENSION_CRL_DISTRIBUTION_POINTS_COUNT']
-    ).agg(
-        count=('EXTENSION_CRL_DISTRIBUTION_POINTS_COUNT', 'count')
-    ).sort_values(
-        by=['count'], ascending=False
-    )
-
-    fig, ax = plt.subplots(dpi=300)
-    ax.set_yscale("log")
-    ax.set_ylabel("# of certificates")
-    ax.set_xlabel("# crl distribution points")
-    # force integer ticks
-    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
-    # fig.autofmt_xdate(rotation=45)
-
-    ax.bar(
-        certificates_by_crl_distribution_count.index,
-        certificates_by_crl_distribution_count.values.reshape(
-            len(certificates_by_crl_distribution_count)
-        ).astype(int)
-    )
-    plt.savefig(f"{output_dir}/distribution-points.png")
+    )['EXTENSION_CRL_DISTRIBUTION_POINTS_COUNT'].count()
 
     df['EXTENSION_TLS_FEATURE'] = df['EXTENSION_TLS_FEATURE'].fillna(False)
     df['EXTENSION_TLS_FEATURE_STATUS_REQUEST'] = df['EXTENSION_TLS_FEATURE_STATUS_REQUEST']\
@@ -72,14 +61,57 @@ def plot_crl_distribution_points(df: pd.DataFrame, output_dir: str):
     assert tls_feature_status_request_2_count + \
         no_tls_feature_status_request_2_count == len(df)
 
+    return {
+        'count_by_crl_distribution_count': count_by_crl_distribution_count,
+        'tls_feature_count': tls_feature_count,
+        'tls_feature_status_request_count': tls_feature_status_request_count,
+        'tls_feature_status_request_2_count': tls_feature_status_request_2_count,
+        'total_count': len(df),
+    }
+
+
+def render_crl_distribution_points(aggregate: Dict[str, Any], output_dir: str):
+
+    # sort the rows by the number of distribution points
+    certificates_by_crl_distribution_count = pd.DataFrame({
+        'count': aggregate['count_by_crl_distribution_count']
+    }).sort_values(
+        by=['count'], ascending=False
+    )
+
+    fig, ax = plt.subplots(dpi=300)
+    ax.set_yscale("log")
+    ax.set_ylabel("# of certificates")
+    ax.set_xlabel("# crl distribution points")
+    # force integer ticks
+    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+    # fig.autofmt_xdate(rotation=45)
+
+    ax.bar(
+        certificates_by_crl_distribution_count.index,
+        certificates_by_crl_distribution_count.values.reshape(
+            len(certificates_by_crl_distribution_count)
+        ).astype(int)
+    )
+    plt.savefig(f"{output_dir}/distribution-points.png")
+
+    total_count = aggregate['total_count']
+    tls_feature_count = aggregate['tls_feature_count']
+    tls_feature_status_request_count = aggregate['tls_feature_status_request_count']
+    tls_feature_status_request_2_count = aggregate['tls_feature_status_request_2_count']
+
     print(
-        f"Certificates with TLS_FEATURE: {tls_feature_count} / {len(df)}, {tls_feature_count / len(df) * 100}%"
+        f"Certificates with TLS_FEATURE: {tls_feature_count} / {total_count}, {tls_feature_count / total_count * 100}%"
     )
 
     print(
-        f"Certificates with MUST-STAPLE (status_request): {tls_feature_status_request_count} / {len(df)}, {tls_feature_status_request_count / len(df) * 100}%"
+        f"Certificates with MUST-STAPLE (status_request): {tls_feature_status_request_count} / {total_count}, {tls_feature_status_request_count / total_count * 100}%"
     )
 
     print(
-        f"Certificates with status_request_v2: {tls_feature_status_request_2_count} / {len(df)}, {tls_feature_status_request_2_count / len(df) * 100}%"
+        f"Certificates with status_request_v2: {tls_feature_status_request_2_count} / {total_count}, {tls_feature_status_request_2_count / total_count * 100}%"
     )
+
+
+def plot_crl_distribution_points(df: pd.DataFrame, output_dir: str):
+    render_crl_distribution_points(aggregate_crl_distribution_points(df), output_dir)
@@ -11,8 +11,12 @@ from itertools import chain
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the columns used by plot_signature_algorithm
+signature_algorithm_columns = ['signature_algorithm', 'signature_hash_algorithm']
 
-def plot_signature_algorithm(df: pd.DataFrame, output_dir: str):
+
+def aggregate_signature_algorithm(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of plot_signature_algorithm for the given rows"
 
     df['signature_algorithm'] = df['signature_algorithm']\
         .fillna("unknown")
@@ -20,12 +24,21 @@ def plot_signature_algorithm(df: pd.DataFrame, output_dir: str):
         .fillna("unknown")
 
     # group the rows by the signature algorithm and count the number of certificates in each group
+    return {
+        'count_by_signature_algo': df.groupby(
+            by=['signature_algorithm']
+        )['signature_algorithm'].count(),
+        'count_by_signature_hash_algo': df.groupby(
+            by=['signature_hash_algorithm']
+        )['signature_hash_algorithm'].count(),
+    }
+
+
+def render_signature_algorithm(aggregate: Dict[str, Any], output_dir: str):
 
-    certificates_by_signature_algo = df.groupby(
-        by=['signature_algorithm']
-    ).agg(
-        count=('signature_algorithm', 'count')
-    ).sort_values(
+    certificates_by_signature_algo = pd.DataFrame({
+        'count': aggregate['count_by_signature_algo']
+    }).sort_values(
         by=['count'], ascending=False
     )
 
@@ -47,12 +60,9 @@ def plot_signature_algorithm(df: pd.DataFrame, output_dir: str):
 
     plt.savefig(f"{output_dir}/signature-hash-algorithm.png")
 
-    # group the rows by the signature algorithm and count the number of certificates in each group
-    certificates_by_signature_hash_algo = df.groupby(
-        by=['signature_hash_algorithm']
-    ).agg(
-        count=('signature_hash_algorithm', 'count')
-    ).sort_values(
+    certificates_by_signature_hash_algo = pd.DataFrame({
+        'count': aggregate['count_by_signature_hash_algo']
+    }).sort_values(
         by=['count'], ascending=False
     )
 
@@ -72,3 +82,7 @@ def plot_signature_algorithm(df: pd.DataFrame, output_dir: str):
         )
     )
     plt.savefig(f"{output_dir}/hash-algorithm.png")
+
+
+def plot_signature_algorithm(df: pd.DataFrame, output_dir: str):
+    render_signature_algorithm(aggregate_signature_algorithm(df), output_dir)
@@ -12,8 +12,15 @@ from itertools import chain
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the columns used by plot_certificate_transparency_data
+certificate_transparency_data_columns = [
+    'EXTENSION_PRECERT_POISON',
+    'EXTENSION_PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS',
+]
 
-def plot_certificate_transparency_data(df: pd.DataFrame, output_dir: str):
+
+def aggregate_certificate_transparency_data(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of plot_certificate_transparency_data for the given rows"
 
     df['EXTENSION_PRECERT_POISON'] = df['EXTENSION_PRECERT_POISON'].fillna(
         False
@@ -24,37 +31,13 @@ def plot_certificate_transparency_data(df: pd.DataFrame, output_dir: str):
 
     assert poison_count + nonpoison_count == len(df)
 
-    print(
-        f"Certificates with precert poison: {poison_count} / {len(df)}, {poison_count / len(df) * 100}%"
-    )
-
     df['EXTENSION_PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS'] = df['EXTENSION_PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS']\
         .fillna(0)
 
-    # sort the rows by the number of distribution points
-    certificates_by_sct_count = df.groupby(
+    # the number of rows per number of scts
+    count_by_sct_count = df.groupby(
         by=['EXTENSION_PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS']
-    ).agg(
-        count=('EXTENSION_PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS', 'count')
-    ).sort_values(
-        by=['count'], ascending=False
-    )
-
-    fig, ax = plt.subplots(dpi=300)
-    ax.set_yscale("log")
-    ax.set_ylabel("# of certificates")
-    ax.set_xlabel("# SCTs")
-    # force integer ticks
-    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
-    # fig.autofmt_xdate(rotation=45)
-
-    ax.bar(
-        certificates_by_sct_count.index,
-        certificates_by_sct_count.values.reshape(
-            len(certificates_by_sct_count)
-        ).astype(int)
-    )
-    plt.savefig(f"{output_dir}/scts.png")
+    )['EXTENSION_PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS'].count()
 
     # check if the certificates with scts and without precert poison coincide
     # print(len(df[df['EXTENSION_PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS'] > 0]))
@@ -86,3 +69,48 @@ def plot_certificate_transparency_data(df: pd.DataFrame, output_dir: str):
     #         (df['EXTENSION_PRECERT_POISON'] == False)
     #     ]['id']
     # )
+
+    return {
+        'poison_count': poison_count,
+        'count_by_sct_count': count_by_sct_count,
+        'total_count': len(df),
+    }
+
+
+def render_certificate_transparency_data(aggregate: Dict[str, Any], output_dir: str):
+
+    poison_count = aggregate['poison_count']
+    total_count = aggregate['total_count']
+
+    print(
+        f"Certificates with precert poison: {poison_count} / {total_count}, {poison_count / total_count * 100}%"
+    )
+
+    # sort the rows by the number of scts
+    certificates_by_sct_count = pd.DataFrame({
+        'count': aggregate['count_by_sct_count']
+    }).sort_values(
+        by=['count'], ascending=False
+    )
+
+    fig, ax = plt.subplots(dpi=300)
+    ax.set_yscale("log")
+    ax.set_ylabel("# of certificates")
+    ax.set_xlabel("# SCTs")
+    # force integer ticks
+    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+    # fig.autofmt_xdate(rotation=45)
+
+    ax.bar(
+        certificates_by_sct_count.index,
+        certificates_by_sct_count.values.reshape(
+            len(certificates_by_sct_count)
+        ).astype(int)
+    )
+    plt.savefig(f"{output_dir}/scts.png")
+
+
+def plot_certificate_transparency_data(df: pd.DataFrame, output_dir: str):
+    render_certificate_transparency_data(
+        aggregate_certificate_transparency_data(df), output_dir
+    )
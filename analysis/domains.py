@@ -6,34 +6,57 @@ import matplotlib.pyplot as plt
 import numpy as np
 from itertools import chain
 
+from analysis.kernels import list_lengths, flatten_lists
+from analysis.sketches import HyperLogLog, HeavyHitters
+
 # Create new `pandas` methods which use `tqdm` progress
 # (can use tqdm_gui, optional kwargs, etc.)
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the columns used by plot_domain_count
+domain_count_columns = ['subject_COMMON_NAME', 'EXTENSION_SUBJECT_ALTERNATIVE_NAME']
+
+# the columns used by count_num_no_common
+no_common_name_count_columns = ['subject_COMMON_NAME']
 
-def plot_domain_count(df: pd.DataFrame, output_dir: str):
+
+def aggregate_domain_count(df: pd.DataFrame, sketch: bool = False) -> Dict[str, Any]:
+    "Computes the partial results of plot_domain_count for the given rows, adding sketches of the names if requested"
 
     # duplicate rows for each subject common name and subject alternative name
     # print(df.columns)
     # count the number of common names + subject alternative names per certificate
-    df['subject_COMMON_NAME_count'] = df['subject_COMMON_NAME'].apply(
-        lambda x: len(x) if not x is None else 0
-    )
-    df['EXTENSION_SUBJECT_ALTERNATIVE_NAME_count'] = df['EXTENSION_SUBJECT_ALTERNATIVE_NAME'].apply(
-        lambda x: len(x) if not x is None else 0
+    df['subject_COMMON_NAME_count'] = list_lengths(df['subject_COMMON_NAME'])
+    df['EXTENSION_SUBJECT_ALTERNATIVE_NAME_count'] = list_lengths(
+        df['EXTENSION_SUBJECT_ALTERNATIVE_NAME']
     )
 
     df['name_count'] = df['subject_COMMON_NAME_count'] + \
         df['EXTENSION_SUBJECT_ALTERNATIVE_NAME_count']
 
-    # basic plot with the number of certificates per # of domains
-    count_by_domains = df['name_count'].groupby(df['name_count']).size()
+    # the number of certificates per # of domains
+    aggregate: Dict[str, Any] = {
+        'count_by_domains': df['name_count'].groupby(df['name_count']).size()
+    }
 
-    # print largest name counts
-    # print(
-    #     df.sort_index(ascending=False).head(10)
-    # )
+    if sketch:
+        names = np.concatenate([
+            flatten_lists(df['subject_COMMON_NAME'])[1].to_numpy(zero_copy_only=False),
+            flatten_lists(df['EXTENSION_SUBJECT_ALTERNATIVE_NAME'])[1].to_numpy(zero_copy_only=False),
+        ])
+
+        # the number of distinct names and the most frequent ones
+        aggregate['distinct_names_sketch'] = HyperLogLog().add(names)
+        aggregate['top_names_sketch'] = HeavyHitters().add(names)
+
+    return aggregate
+
+
+def render_domain_count(aggregate: Dict[str, Any], output_dir: str):
+
+    # basic plot with the number of certificates per # of domains
+    count_by_domains = aggregate['count_by_domains']
 
     fig, ax = plt.subplots(dpi=300)
     ax.set_yscale("log")
@@ -43,9 +66,36 @@ def plot_domain_count(df: pd.DataFrame, output_dir: str):
     ax.plot(count_by_domains.index, count_by_domains)
     plt.savefig(f"{output_dir}/domain-counts.png")
 
-    # df.explode('subject_COMMON_NAME').explode('EXTENSION_SUBJECT_ALTERNATIVE_NAME')
-    # print(df['EXTENSION_SUBJECT_ALTERNATIVE_NAME'].dropna())
+    if 'distinct_names_sketch' in aggregate:
+        distinct_names = aggregate['distinct_names_sketch']
+        top_names = aggregate['top_names_sketch']
+
+        print(
+            f"Distinct names (CN + SANs): {round(distinct_names.estimate())} (estimated, standard error {distinct_names.standard_error() * 100:.2f}%)"
+        )
+        print(
+            f"Most frequent names (CN + SANs), counts at most {top_names.error_bound():.0f} too low:"
+        )
+
+        for name, count in top_names.top(10)['count'].items():
+            print(f"{name}: {count}")
+
+
+def plot_domain_count(df: pd.DataFrame, output_dir: str):
+    render_domain_count(aggregate_domain_count(df), output_dir)
+
+
+def aggregate_num_no_common(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of count_num_no_common for the given rows"
+    return {
+        'no_common_name_count': int(df['subject_COMMON_NAME'].isna().sum()),
+        'total_count': len(df),
+    }
+
+
+def render_num_no_common(aggregate: Dict[str, Any]):
+    print(f"{aggregate['no_common_name_count']} / {aggregate['total_count']}")
 
 
 def count_num_no_common(df: pd.DataFrame):
-    print(f"{df['subject_COMMON_NAME'].isna().sum()} / {len(df)}")
+    render_num_no_common(aggregate_num_no_common(df))
@@ -0,0 +1,55 @@
+import os
+from typing import Tuple, List, Dict, Any
+import pandas as pd
+import numpy as np
+import pyarrow.parquet as pq
+
+# custom imports
+from dataset import side_table_path, ISSUERS_FILENAME
+
+# the certificates only refer to their issuer by the `issuer_id` column, the names of
+# the issuers are part of the issuers table written by the extraction (see issuers.py).
+# the analyses aggregate by the ids and only join the names when rendering
+
+
+def load_issuers(input_path: str) -> pd.DataFrame:
+    "Loads the issuers table of an extraction output, indexed by the issuer id"
+    path = side_table_path(input_path, "issuers", ISSUERS_FILENAME)
+
+    if not os.path.isfile(path):
+        raise Exception(
+            f"Did not find the issuers table '{path}', it is written along with the extracted certificates"
+        )
+
+    if path.endswith(".csv"):
+        issuers = pd.read_csv(path)
+    else:
+        issuers = pq.read_table(path).to_pandas()
+
+    return issuers.set_index('issuer_id')
+
+
+def sum_by_issuer_name(values: Any, issuers: pd.DataFrame, column: str = 'issuer_COMMON_NAME') -> Any:
+    """
+    Sums up the values of a series or the rows of a dataframe indexed by the issuer id
+    per name of the issuers. Issuers with several names count for each of them, issuers
+    without a name are left out.
+    """
+    names = issuers[column].explode().dropna()
+    names = names[names.index.isin(values.index)]
+
+    return values.loc[names.index]\
+        .set_axis(pd.Index(names.to_numpy(), name=column))\
+        .groupby(level=0)\
+        .sum()
+
+
+def issuer_label(issuers: pd.DataFrame, issuer_id: int, column: str = 'issuer_COMMON_NAME') -> str:
+    "Returns the names of an issuer joined into a single label, its id if it has none"
+    names = issuers[column].get(issuer_id)
+
+    # missing names are None, the lists are read as numpy arrays
+    if not isinstance(names, (list, np.ndarray)) or len(names) == 0:
+        return str(issuer_id)
+
+    return ", ".join(names)
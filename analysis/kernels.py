@@ -0,0 +1,127 @@
+from typing import Tuple, List, Dict, Any, Optional
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# vectorized operations on the list columns (names, alternative names, ..) of the
+# certificates. they operate on the offsets and the flattened values of arrow list
+# arrays instead of calling python functions for every row
+
+
+def list_types_mapper(data_type: pa.DataType) -> Optional[pd.ArrowDtype]:
+    "Keeps list columns backed by arrow when converting a table to pandas, see `to_list_array`"
+    if pa.types.is_list(data_type) or pa.types.is_large_list(data_type):
+        return pd.ArrowDtype(data_type)
+
+    # default conversion for all other columns
+    return None
+
+
+def to_list_array(series: pd.Series) -> pa.Array:
+    "Returns a list column of strings as an arrow list array, without converting it if it is backed by arrow already"
+    if isinstance(series.dtype, pd.ArrowDtype):
+        return series.array.__arrow_array__().combine_chunks()
+
+    # columns of numpy arrays / lists are converted, missing values become nulls
+    return pa.array(series, type=pa.list_(pa.string()), from_pandas=True)
+
+
+def list_lengths(series: pd.Series) -> np.ndarray:
+    "Returns the number of elements of every list, 0 for missing lists"
+    return pc.list_value_length(to_list_array(series))\
+        .fill_null(0)\
+        .to_numpy()\
+        .astype(np.int64)
+
+
+def flatten_lists(series: pd.Series) -> Tuple[np.ndarray, pa.Array]:
+    "Returns the elements of all lists and the row index of the list each element belongs to"
+    lists = to_list_array(series)
+
+    return pc.list_parent_indices(lists).to_numpy(), lists.flatten()
+
+
+def distinct_values_per_key(keys: np.ndarray, series: pd.Series, key_name: str, value_name: str) -> pa.Table:
+    "Returns the distinct pairs of the key of a row and the elements of its list, rows with missing keys are skipped"
+    parents, values = flatten_lists(series)
+
+    pairs = pa.table({
+        # NaN keys become nulls
+        key_name: pa.array(keys[parents], from_pandas=True),
+        value_name: values,
+    })
+    pairs = pairs.filter(pc.is_valid(pairs[key_name]))
+
+    return pairs.group_by([key_name, value_name]).aggregate([])
+
+
+def count_distinct_values_per_key(pairs: pa.Table, key_name: str) -> pd.Series:
+    "Counts the distinct pairs of `distinct_values_per_key` per key"
+    counts = pairs.group_by([key_name]).aggregate([([], 'count_all')]).to_pandas()
+
+    return counts.set_index(key_name)['count_all']
+
+
+def single_distinct_values(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    "Returns whether the list of a row contains exactly one distinct element and this element"
+    rows, values = flatten_lists(series)
+
+    pairs = pa.table({'row': rows, 'value': values})\
+        .group_by(['row', 'value'])\
+        .aggregate([])
+
+    pair_rows = pairs['row'].to_numpy()
+
+    is_single = np.bincount(pair_rows, minlength=len(series)) == 1
+
+    # the element is only meaningful for rows with a single distinct element
+    single_values = np.full(len(series), None, dtype=object)
+    single_values[pair_rows] = pairs['value'].to_numpy(zero_copy_only=False)
+
+    return is_single, single_values
+
+
+# vectorized operations on the bitmask columns (key usages, extended key usages). every
+# bit of a bitmask is a flag, the names of the bits are stored in the metadata of the
+# extraction output (see flag_columns in extraction_helpers.py)
+
+
+def bitmasks(series: pd.Series) -> np.ndarray:
+    "Returns the bitmasks of a column as unsigned integers, missing bitmasks become 0"
+    # integer columns with missing values are loaded as floats or objects
+    return series.fillna(0).to_numpy(dtype=np.int64).astype(np.uint64)
+
+
+def popcount(masks: np.ndarray) -> np.ndarray:
+    "Returns the number of set bits of every bitmask"
+    # count the bits of every 2 / 4 / 8 bits in parallel, then sum up the bytes
+    # (https://en.wikipedia.org/wiki/Hamming_weight)
+    masks = masks.astype(np.uint64)
+    masks = masks - ((masks >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    masks = (masks & np.uint64(0x3333333333333333)) + \
+        ((masks >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    masks = (masks + (masks >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+
+    return ((masks * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def bitmask_bits(masks: np.ndarray, bit_count: int) -> np.ndarray:
+    "Returns a matrix of the bits of every bitmask, one row per bitmask and one column per bit"
+    return ((masks.astype(np.uint64)[:, None] >> np.arange(bit_count, dtype=np.uint64)) & np.uint64(1))\
+        .astype(np.int64)
+
+
+def count_bits(masks: np.ndarray, counts: np.ndarray, bit_count: int) -> np.ndarray:
+    "Returns the number of times every bit is set, every bitmask occurring `counts` times"
+    return counts.astype(np.int64) @ bitmask_bits(masks, bit_count)
+
+
+def count_bit_pairs(masks: np.ndarray, counts: np.ndarray, bit_count: int) -> np.ndarray:
+    """
+    Returns the number of times every pair of bits is set together, every bitmask
+    occurring `counts` times. The diagonal contains the number of times every bit is set.
+    """
+    bits = bitmask_bits(masks, bit_count)
+
+    return bits.T @ (bits * counts.astype(np.int64)[:, None])
@@ -4,27 +4,139 @@ import pandas as pd
 from tqdm import tqdm
 import matplotlib.pyplot as plt
 import numpy as np
-from itertools import chain
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+import json
+
+from analysis.kernels import bitmasks, popcount, count_bits, count_bit_pairs
+
+# custom imports
+from dataset import is_dataset
+from extraction_helpers import flag_columns, FLAGS_METADATA_KEY
 
 # Create new `pandas` methods which use `tqdm` progress
 # (can use tqdm_gui, optional kwargs, etc.)
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the bitmask columns used by count_key_usages and plot_key_usage_combinations
+key_usage_count_columns = ['EXTENSION_KEY_USAGE', 'EXTENSION_EXTENDED_KEY_USAGE']
+
+# the number of combinations of usages printed per column
+TOP_COMBINATIONS = 10
+
+
+def load_flag_names(input_path: str) -> Dict[str, List[str]]:
+    "Loads the names of the bits of the bitmask columns of an extraction output"
+    if is_dataset(input_path):
+        metadata = ds.dataset(input_path, format="parquet").schema.metadata
+    elif input_path.endswith(".parquet"):
+        metadata = pq.read_schema(input_path).metadata
+    else:
+        metadata = None
+
+    # csv outputs don't have any metadata, their bits are named by the current extraction
+    if metadata is None or FLAGS_METADATA_KEY not in metadata:
+        return flag_columns
+
+    return json.loads(metadata[FLAGS_METADATA_KEY])
+
+
+def aggregate_key_usages(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of count_key_usages / plot_key_usage_combinations for the given rows"
+
+    # the number of certificates per combination of usages of the certificates with the
+    # extension. the counts of the single usages and of the pairs of usages are derived
+    # from these, there are only few distinct combinations
+    count_by_bitmask: Dict[str, pd.Series] = {}
+
+    for column in key_usage_count_columns:
+        # the column is dropped if no certificate has the extension
+        if column not in df.columns:
+            continue
+
+        masks = bitmasks(df[column].dropna())
+        distinct_masks, counts = np.unique(masks, return_counts=True)
+
+        count_by_bitmask[column] = pd.Series(counts, index=distinct_masks)
+
+    return {
+        'count_by_bitmask': count_by_bitmask,
+        'total_count': len(df),
+    }
+
+
+def flag_label(names: List[str], mask: int) -> str:
+    "Joins the names of the set bits of a bitmask"
+    return " + ".join(
+        name for bit, name in enumerate(names) if int(mask) >> bit & 1
+    ) or "none"
 
-def count_key_usages(df: pd.DataFrame):
 
-    columns = [
-        col for col in df.columns
-        if col.startswith("EXTENSION_KEY_USAGE") or col.startswith("EXTENSION_EXTENDED")
-    ]
+def render_key_usages(aggregate: Dict[str, Any], flag_names: Dict[str, List[str]]):
 
     counts: Dict[str, int] = {}
 
-    for col in columns:
-        df[col].fillna(False)
-        counts[col] = len(df[df[col] == True])
+    for column, count_by_bitmask in aggregate['count_by_bitmask'].items():
+        names = flag_names[column]
+        bit_counts = count_bits(
+            count_by_bitmask.index.to_numpy(), count_by_bitmask.to_numpy(), len(names)
+        )
 
-    counts["TOTAL"] = len(df)
+        for name, count in zip(names, bit_counts):
+            counts[f"{column}_{name}"] = int(count)
+
+    # ordered like the columns of the flags used to be
+    counts = dict(sorted(counts.items()))
+
+    counts["TOTAL"] = aggregate['total_count']
 
     print(counts)
+
+
+def count_key_usages(df: pd.DataFrame, flag_names: Dict[str, List[str]]):
+    render_key_usages(aggregate_key_usages(df), flag_names)
+
+
+def render_key_usage_combinations(aggregate: Dict[str, Any], output_dir: str, flag_names: Dict[str, List[str]]):
+    total_count = aggregate['total_count']
+
+    for column, count_by_bitmask in aggregate['count_by_bitmask'].items():
+        names = flag_names[column]
+        masks = count_by_bitmask.index.to_numpy()
+        counts = count_by_bitmask.to_numpy()
+
+        # the number of certificates having both usages of every pair of usages
+        pairs = count_bit_pairs(masks, counts, len(names))
+
+        fig, ax = plt.subplots(dpi=300)
+        image = ax.imshow(pairs, cmap="Blues")
+        fig.colorbar(image, ax=ax, label="# of certificates")
+        ax.set_xticks(range(len(names)), names, rotation=90, fontsize=4)
+        ax.set_yticks(range(len(names)), names, fontsize=4)
+        fig.tight_layout()
+        plt.savefig(
+            f"{output_dir}/{column.removeprefix('EXTENSION_').lower().replace('_', '-')}-pairs.png"
+        )
+
+        extension_count = counts.sum()
+
+        print(f"{column}: {extension_count} / {total_count} certificates have the extension")
+
+        # the number of usages of the certificates
+        usage_counts = pd.Series(counts).groupby(popcount(masks)).sum()
+
+        for usage_count, count in usage_counts.items():
+            print(
+                f"{usage_count} usages: {count} / {extension_count}, {count / extension_count * 100:.2f}%"
+            )
+
+        # the most frequent combinations of usages
+        for mask, count in count_by_bitmask.sort_values(ascending=False).head(TOP_COMBINATIONS).items():
+            print(
+                f"{flag_label(names, mask)}: {count} / {extension_count}, {count / extension_count * 100:.2f}%"
+            )
+
+
+def plot_key_usage_combinations(df: pd.DataFrame, output_dir: str, flag_names: Dict[str, List[str]]):
+    render_key_usage_combinations(aggregate_key_usages(df), output_dir, flag_names)
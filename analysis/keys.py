@@ -0,0 +1,96 @@
+import os
+from typing import Tuple, List, Dict, Any
+import pandas as pd
+from tqdm import tqdm
+import matplotlib.pyplot as plt
+import numpy as np
+
+from analysis.issuers import sum_by_issuer_name
+
+# Create new `pandas` methods which use `tqdm` progress
+# (can use tqdm_gui, optional kwargs, etc.)
+# (https://stackoverflow.com/a/34365537/2897827)
+tqdm.pandas()
+
+# the columns used by plot_public_keys
+public_keys_columns = ['public_key_type', 'public_key_size', 'issuer_id']
+
+# the number of issuers shown in the plot of the keys per issuer
+TOP_ISSUERS = 10
+
+
+def public_key_names(df: pd.DataFrame) -> pd.Series:
+    "Combines the type and the size of the public key of every row, e.g. 'RSA 2048'"
+    key_type = df['public_key_type'].fillna("unknown").astype(str)
+    key_size = df['public_key_size']
+
+    return key_type.where(
+        key_size.isna(),
+        key_type + " " + key_size.astype('Int64').astype(str)
+    )
+
+
+def aggregate_public_keys(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of plot_public_keys for the given rows"
+    keys = public_key_names(df)
+
+    # the number of certificates per key type and size, overall and per issuer id. the
+    # names of the issuers are only joined when rendering
+    return {
+        'count_by_key': keys.groupby(keys).size(),
+        'count_by_issuer': {
+            issuer_id: issuer_keys.groupby(issuer_keys).size()
+            for issuer_id, issuer_keys in keys.groupby(df['issuer_id'])
+        },
+        'total_count': len(df),
+    }
+
+
+def render_public_keys(aggregate: Dict[str, Any], output_dir: str, issuers: pd.DataFrame):
+    count_by_key = aggregate['count_by_key'].sort_values(ascending=False)
+
+    fig, ax = plt.subplots(dpi=300)
+    ax.set_yscale("log")
+    ax.set_ylabel("# of certificates")
+    ax.set_xlabel("public key type and size")
+    ax.bar(count_by_key.index, count_by_key.values)
+    plt.savefig(f"{output_dir}/public-keys.png")
+
+    # the share of every key type and size of the issuers with the most certificates
+    count_by_issuer = sum_by_issuer_name(
+        pd.DataFrame(aggregate['count_by_issuer']).T.fillna(0), issuers
+    )
+    count_by_issuer = count_by_issuer.loc[
+        count_by_issuer.sum(axis=1).sort_values(ascending=False).index[:TOP_ISSUERS]
+    ]
+    # order the keys like the overall plot
+    count_by_issuer = count_by_issuer[
+        [key for key in count_by_key.index if key in count_by_issuer.columns]
+    ]
+    share_by_issuer = count_by_issuer.div(count_by_issuer.sum(axis=1), axis=0)
+
+    fig, ax = plt.subplots(dpi=300)
+    ax.set_ylabel("share of certificates")
+    ax.set_xlabel("issuer common name")
+    fig.autofmt_xdate(rotation=45)
+
+    for tick in ax.xaxis.get_major_ticks():
+        tick.label.set_fontsize(4)
+
+    bottom = np.zeros(len(share_by_issuer))
+
+    for key in share_by_issuer.columns:
+        ax.bar(share_by_issuer.index, share_by_issuer[key], bottom=bottom, label=key)
+        bottom += share_by_issuer[key].to_numpy()
+
+    ax.legend(fontsize=6)
+    plt.savefig(f"{output_dir}/public-keys-per-issuer.png")
+
+    total_count = aggregate['total_count']
+
+    for key, count in count_by_key.items():
+        print(f"{key}: {count} / {total_count}, {count / total_count * 100:.2f}%")
+
+
+def plot_public_keys(df: pd.DataFrame, output_dir: str, issuers: pd.DataFrame):
+    render_public_keys(aggregate_public_keys(df), output_dir, issuers)
@@ -6,32 +6,44 @@ import matplotlib.pyplot as plt
 import numpy as np
 from itertools import chain
 
+from analysis.kernels import single_distinct_values
+
 # Create new `pandas` methods which use `tqdm` progress
 # (can use tqdm_gui, optional kwargs, etc.)
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the columns used by count_issuer_subject_country_matches
+issuer_subject_country_matches_columns = ['subject_COUNTRY_NAME', 'issuer_id']
+
+
+def subject_countries_by_issuer(df: pd.DataFrame) -> Dict[str, pd.Series]:
+    "Counts the certificates with a single subject country per country and issuer"
+    # de-duplicate, only the distinct countries of a certificate are compared
+    subject_single, subject_country = single_distinct_values(df['subject_COUNTRY_NAME'])
 
-def country_match(row):
-    # de-duplicate
-    subject_countries = [] if row['subject_COUNTRY_NAME'] is None else list(
-        set(row['subject_COUNTRY_NAME']))
+    issuer_ids = df['issuer_id'][subject_single]
 
-    issuer_countries = [] if row['issuer_COUNTRY_NAME'] is None else list(
-        set(row['issuer_COUNTRY_NAME']))
+    return {
+        country: issuer_ids.groupby(issuer_ids).size()
+        for country, issuer_ids in issuer_ids.groupby(subject_country[subject_single])
+    }
 
-    # if there is just one country each return true
-    if len(subject_countries) == 1 and \
-            len(issuer_countries) == 1 and \
-            subject_countries[0] == issuer_countries[0]:
-        return True
 
-    # else return false
-    # print(f"sub: {len(subject_countries)}, issuer: {len(issuer_countries)}")
-    return False
+def country_match_count(countries: Dict[str, pd.Series], issuers: pd.DataFrame) -> int:
+    "Counts the certificates whose single subject country is the single country of their issuer"
+    issuer_single, issuer_country = single_distinct_values(issuers['issuer_COUNTRY_NAME'])
+    issuer_country = pd.Series(issuer_country, index=issuers.index)[issuer_single]
+
+    # if there is just one country each count the certificates of the matching issuers
+    return sum(
+        int(counts[counts.index.isin(issuer_country.index[issuer_country == country])].sum())
+        for country, counts in countries.items()
+    )
 
 
-def count_issuer_subject_country_matches(df: pd.DataFrame):
+def aggregate_issuer_subject_country_matches(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of count_issuer_subject_country_matches for the given rows"
 
     # drop all rows where the country is empty
     count_all = len(df)
@@ -41,11 +53,21 @@ def count_issuer_subject_country_matches(df: pd.DataFrame):
     # print(df['issuer_COUNTRY_NAME'])
     # exit()
 
-    df['country_match'] = df.apply(
-        country_match,
-        axis=1
-    )
+    # the countries of the issuers are only joined when rendering
+    return {
+        'subject_countries_by_issuer': subject_countries_by_issuer(df),
+        'countries_set_count': count_countries_set,
+    }
+
+
+def render_issuer_subject_country_matches(aggregate: Dict[str, Any], issuers: pd.DataFrame):
 
     print(
-        f"{len(df[df['country_match'] == True])} / {count_countries_set}"
+        f"{country_match_count(aggregate['subject_countries_by_issuer'], issuers)} / {aggregate['countries_set_count']}"
+    )
+
+
+def count_issuer_subject_country_matches(df: pd.DataFrame, issuers: pd.DataFrame):
+    render_issuer_subject_country_matches(
+        aggregate_issuer_subject_country_matches(df), issuers
     )
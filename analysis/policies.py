@@ -11,8 +11,15 @@ from itertools import chain
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the columns used by plot_ev_certificates
+ev_certificates_columns = ['EXTENSION_CERTIFICATE_POLICIES_EV']
 
-def plot_ev_certificates(df: pd.DataFrame, output_dir: str):
+# the columns used by count_certificate_policies, it prints the whole dataframe
+certificate_policies_columns = ['*']
+
+
+def aggregate_ev_certificates(df: pd.DataFrame) -> Dict[str, Any]:
+    "Computes the partial results of plot_ev_certificates for the given rows"
     df['EXTENSION_CERTIFICATE_POLICIES_EV'] = df['EXTENSION_CERTIFICATE_POLICIES_EV'].fillna(
         False)
     ev_count = len(df[df['EXTENSION_CERTIFICATE_POLICIES_EV'] == True])
@@ -20,6 +27,14 @@ def plot_ev_certificates(df: pd.DataFrame, output_dir: str):
 
     assert ev_count + dv_count == len(df)
 
+    return {
+        'ev_count': ev_count,
+        'dv_count': dv_count,
+    }
+
+
+def render_ev_certificates(aggregate: Dict[str, Any], output_dir: str):
+
     fig, ax = plt.subplots(dpi=300)
     ax.set_yscale("log")
     ax.set_ylabel("# of certificates")
@@ -28,11 +43,15 @@ def plot_ev_certificates(df: pd.DataFrame, output_dir: str):
 
     ax.bar(
         ["DV certificates", "EV certificates"],
-        [dv_count, ev_count]
+        [aggregate['dv_count'], aggregate['ev_count']]
     )
     plt.savefig(f"{output_dir}/ev-dv.png")
 
 
+def plot_ev_certificates(df: pd.DataFrame, output_dir: str):
+    render_ev_certificates(aggregate_ev_certificates(df), output_dir)
+
+
 def count_certificate_policies(df: pd.DataFrame):
 
     # ev_count = len(df[df['EXTENSION_CERTIFICATE_POLICIES_EV'] == True])
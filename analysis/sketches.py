@@ -0,0 +1,234 @@
+import math
+import base64
+from typing import Tuple, List, Dict, Any, Optional
+import pandas as pd
+import numpy as np
+
+# probabilistic summaries of the names of the certificates which take a constant
+# amount of memory regardless of the number of distinct names. both sketches can be
+# merged, e.g. the sketches of several shards or dump years, and serialized to dicts
+# which can be stored as json
+
+# 2^14 registers, 16KB per sketch
+DEFAULT_PRECISION = 14
+
+# the number of counters of the heavy hitters sketches
+DEFAULT_CAPACITY = 1000
+
+
+def hash_values(values: np.ndarray) -> np.ndarray:
+    "Hashes the values to 64 bits, the hash is stable across processes and runs"
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def leading_zeros(values: np.ndarray) -> np.ndarray:
+    "Counts the leading zero bits of 64 bit unsigned integers"
+    values = values.astype(np.uint64)
+    zeros = np.zeros(len(values), dtype=np.uint64)
+
+    # binary search for the highest set bit
+    for shift in [32, 16, 8, 4, 2, 1]:
+        is_small = values < (np.uint64(1) << np.uint64(64 - shift))
+        zeros += is_small * np.uint64(shift)
+        values = np.where(is_small, values << np.uint64(shift), values)
+
+    # only 0 has 64 leading zeros
+    return zeros + (values == 0)
+
+
+class HyperLogLog:
+    """
+    Estimates the number of distinct values (Flajolet et al. 2007, "HyperLogLog: the
+    analysis of a near-optimal cardinality estimation algorithm"). With m = 2^precision
+    registers the relative standard error of the estimate is 1.04 / sqrt(m), 0.81% for
+    the default precision of 14, i.e. the estimate is within 2.4% of the actual count
+    with a probability of 99.7%. Merging sketches yields the sketch of the union.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        if precision < 4 or precision > 18:
+            raise Exception(f"HyperLogLog precision has to be between 4 and 18, got {precision}")
+
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values: np.ndarray) -> 'HyperLogLog':
+        "Adds the values, missing values are skipped"
+        values = np.asarray(values, dtype=object)
+        values = values[pd.notna(values)]
+
+        if len(values) == 0:
+            return self
+
+        hashes = hash_values(values)
+
+        # the first bits select the register, the position of the first set bit of
+        # the remaining ones is the observed rank
+        registers = hashes >> np.uint64(64 - self.precision)
+        ranks = np.minimum(
+            leading_zeros(hashes << np.uint64(self.precision)) + 1,
+            64 - self.precision + 1
+        )
+
+        np.maximum.at(self.registers, registers.astype(np.int64), ranks.astype(np.uint8))
+
+        return self
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        "Returns the sketch of the union of both sketches"
+        if self.precision != other.precision:
+            raise Exception(
+                f"Cannot merge HyperLogLog sketches of precision {self.precision} and {other.precision}"
+            )
+
+        merged = HyperLogLog(self.precision)
+        merged.registers = np.maximum(self.registers, other.registers)
+
+        return merged
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+
+        # use linear counting for small cardinalities, the 64 bit hashes don't require
+        # a correction for large ones
+        empty_registers = int(np.count_nonzero(self.registers == 0))
+
+        if estimate <= 2.5 * m and empty_registers > 0:
+            estimate = m * math.log(m / empty_registers)
+
+        return float(estimate)
+
+    def standard_error(self) -> float:
+        "The relative standard error of the estimate"
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'type': 'hyperloglog',
+            'precision': self.precision,
+            'registers': base64.b64encode(self.registers.tobytes()).decode(),
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> 'HyperLogLog':
+        sketch = HyperLogLog(data['precision'])
+        sketch.registers = np.frombuffer(
+            base64.b64decode(data['registers']), dtype=np.uint8
+        ).copy()
+
+        return sketch
+
+
+class HeavyHitters:
+    """
+    Keeps the counts of the at most `capacity` most frequent values, using the mergeable
+    variant of the Misra-Gries summary (Agarwal et al. 2012, "Mergeable summaries").
+    Every value can carry a weight (e.g. the validity days of a certificate) which is
+    summed up per value. The counts are never overestimated and at most `error_bound()`
+    too low, which in turn is at most n / (capacity + 1) for n added values. Every value
+    occurring more often than that is guaranteed to be kept. The weights are reduced
+    proportionally to the counts, averages of weights remain averages of the kept values.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        # the total number of values added
+        self.total = 0
+        self.counters = pd.DataFrame({
+            'count': pd.Series(dtype=np.int64),
+            'weight': pd.Series(dtype=np.float64),
+        })
+
+    def add(self, values: np.ndarray, weights: Optional[np.ndarray] = None) -> 'HeavyHitters':
+        "Adds the values, missing values are skipped"
+        batch = pd.DataFrame({
+            'value': np.asarray(values, dtype=object),
+            'weight': np.zeros(len(values)) if weights is None else weights,
+        })
+        batch = batch[batch['value'].notna()]
+
+        self.total += len(batch)
+
+        # count the batch exactly first, then fold it into the counters
+        counters = batch.groupby('value').agg(
+            count=('weight', 'size'), weight=('weight', 'sum')
+        )
+        counters.index.name = None
+
+        self.counters = self._reduce(self._combine(self.counters, counters))
+
+        return self
+
+    def merge(self, other: 'HeavyHitters') -> 'HeavyHitters':
+        "Returns the summary of both summaries"
+        if self.capacity != other.capacity:
+            raise Exception(
+                f"Cannot merge heavy hitters of capacity {self.capacity} and {other.capacity}"
+            )
+
+        merged = HeavyHitters(self.capacity)
+        merged.total = self.total + other.total
+        merged.counters = merged._reduce(self._combine(self.counters, other.counters))
+
+        return merged
+
+    @staticmethod
+    def _combine(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+        if len(a) == 0:
+            return b
+
+        if len(b) == 0:
+            return a
+
+        combined = a.add(b, fill_value=0)
+        combined['count'] = combined['count'].astype(np.int64)
+
+        return combined
+
+    def _reduce(self, counters: pd.DataFrame) -> pd.DataFrame:
+        "Subtracts the (capacity + 1)-th largest count from all counters and drops the ones that become empty"
+        if len(counters) <= self.capacity:
+            return counters
+
+        threshold = counters['count'].nlargest(self.capacity + 1).iloc[-1]
+        counters = counters[counters['count'] > threshold].copy()
+
+        counters['weight'] *= (counters['count'] - threshold) / counters['count']
+        counters['count'] -= threshold
+
+        return counters
+
+    def error_bound(self) -> float:
+        "The maximum amount by which the count of any value is too low"
+        return (self.total - int(self.counters['count'].sum())) / (self.capacity + 1)
+
+    def top(self, n: int) -> pd.DataFrame:
+        "Returns the count and weight of the n most frequent values, sorted by the count in descending order"
+        return self.counters\
+            .sort_index()\
+            .sort_values(by=['count'], ascending=False, kind='stable')\
+            .head(n)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'type': 'heavy_hitters',
+            'capacity': self.capacity,
+            'total': self.total,
+            'values': self.counters.index.tolist(),
+            'counts': self.counters['count'].tolist(),
+            'weights': self.counters['weight'].tolist(),
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> 'HeavyHitters':
+        sketch = HeavyHitters(data['capacity'])
+        sketch.total = data['total']
+        sketch.counters = pd.DataFrame({
+            'count': pd.Series(data['counts'], index=data['values'], dtype=np.int64),
+            'weight': pd.Series(data['weights'], index=data['values'], dtype=np.float64),
+        })
+
+        return sketch
@@ -6,6 +6,10 @@ import matplotlib.pyplot as plt
 import numpy as np
 from itertools import chain
 
+from analysis.kernels import flatten_lists, distinct_values_per_key, count_distinct_values_per_key
+from analysis.sketches import HyperLogLog, HeavyHitters
+from analysis.issuers import sum_by_issuer_name, issuer_label
+
 # Create new `pandas` methods which use `tqdm` progress
 # (can use tqdm_gui, optional kwargs, etc.)
 # (https://stackoverflow.com/a/34365537/2897827)
@@ -13,16 +17,70 @@ tqdm.pandas()
 
 SECONDS_PER_DAY = 60 * 60 * 24
 
+# the columns used by plot_validity_days
+validity_days_columns = ['validity_time', 'subject_COMMON_NAME', 'issuer_id']
+
 
-def plot_validity_days(df: pd.DataFrame, output_dir: str):
+def aggregate_validity_days(df: pd.DataFrame, sketch: bool = False) -> Dict[str, Any]:
+    "Computes the partial results of plot_validity_days for the given rows, estimating the name statistics with sketches if requested"
 
     # round to full days
     df['validity_days'] = (df['validity_time'] / SECONDS_PER_DAY).round()
 
-    # first a basic plot with the number of certificates per validity time in days
+    # first the number of certificates per validity time in days
     count_by_days = df['validity_days']\
         .groupby(df['validity_days']).size()
 
+    # check how many different unique domains issue certificates for a given
+    # validity time
+
+    validity_days = df['validity_days'].to_numpy()
+
+    if sketch:
+        # estimate the number of distinct common names per validity_time
+        rows, common_names = flatten_lists(df['subject_COMMON_NAME'])
+        common_names_per_day = {
+            day: HyperLogLog().add(names.to_numpy())
+            for day, names in pd.Series(common_names.to_numpy(zero_copy_only=False))
+            .groupby(validity_days[rows])
+        }
+
+        # the most frequent issuers along with the sum of their validity days
+        has_validity_days = ~np.isnan(validity_days)
+
+        top_issuers = HeavyHitters().add(
+            df['issuer_id'].to_numpy()[has_validity_days],
+            validity_days[has_validity_days]
+        )
+
+        return {
+            'count_by_days': count_by_days,
+            'common_names_per_day_sketch': common_names_per_day,
+            'top_issuers_sketch': top_issuers,
+        }
+
+    # the distinct pairs of validity_time and common name
+    common_names_per_day = distinct_values_per_key(
+        validity_days, df['subject_COMMON_NAME'], 'validity_days', 'subject_COMMON_NAME'
+    )
+
+    # the sum and the number of validity days per issuer, the average is derived
+    # from these once all rows are aggregated
+    validity_days_by_issuer = df['validity_days'].groupby(df['issuer_id'])
+
+    return {
+        'count_by_days': count_by_days,
+        'common_names_per_day': common_names_per_day,
+        'validity_days_sum_by_issuer': validity_days_by_issuer.sum(),
+        'validity_days_count_by_issuer': validity_days_by_issuer.count(),
+    }
+
+
+def render_validity_days(aggregate: Dict[str, Any], output_dir: str, issuers: pd.DataFrame):
+
+    count_by_days = aggregate['count_by_days']
+
+    # first a basic plot with the number of certificates per validity time in days
     fig, ax = plt.subplots(dpi=300)
     ax.set_yscale("log")
     ax.set_ylabel("# of certificates")
@@ -31,27 +89,26 @@ def plot_validity_days(df: pd.DataFrame, output_dir: str):
     ax.plot(count_by_days.index, count_by_days)
     plt.savefig(f"{output_dir}/validity-days.png")
 
-    # check how many different unique domains issue certificates for a given
-    # validity time
-
-    # fill NAs with empty arrays
-    df['subject_COMMON_NAME'] = df['subject_COMMON_NAME']\
-        .apply(lambda x: x if not x is None else [])
-
-    common_names_per_day = df.groupby(['validity_days'])\
-        .agg({'subject_COMMON_NAME': lambda x: list(chain.from_iterable(x))})
-
-    # count total domains per validity_time
-    common_names_per_day['subject_COMMON_NAME_total_count'] = common_names_per_day['subject_COMMON_NAME']\
-        .apply(lambda x: len(x) if not x is None else 0)
-
-    # prune duplicates
-    common_names_per_day['subject_COMMON_NAME'] = common_names_per_day['subject_COMMON_NAME']\
-        .apply(lambda x: list(set(x)) if not x is None else list())
+    # count unique domains names per validity_time, days without any common name
+    # don't have any pairs
+    if 'common_names_per_day_sketch' in aggregate:
+        sketches = aggregate['common_names_per_day_sketch']
+        unique_count = pd.Series({
+            day: round(sketch.estimate()) for day, sketch in sketches.items()
+        }, dtype=np.int64)
+
+        if len(sketches) > 0:
+            print(
+                f"Distinct subject COMMON_NAMEs per validity time are estimated, standard error {next(iter(sketches.values())).standard_error() * 100:.2f}%"
+            )
+    else:
+        unique_count = count_distinct_values_per_key(
+            aggregate['common_names_per_day'], 'validity_days'
+        )
 
-    # count unique domains names per validity_time
-    common_names_per_day['subject_COMMON_NAME_unique_count'] = common_names_per_day['subject_COMMON_NAME']\
-        .apply(lambda x: len(x) if not x is None else 0)
+    common_names_per_day = pd.DataFrame({
+        'subject_COMMON_NAME_unique_count': unique_count.reindex(count_by_days.index, fill_value=0)
+    })
 
     fig, ax = plt.subplots(dpi=300)
     ax.set_yscale("log")
@@ -78,14 +135,6 @@ def plot_validity_days(df: pd.DataFrame, output_dir: str):
     )
     plt.savefig(f"{output_dir}/validity-days-certs-per-unique.png")
 
-    # print days with the most certificates
-    # print(
-    #     common_names_per_day[['subject_COMMON_NAME_total_count']].sort_values(
-    #         by=['subject_COMMON_NAME_total_count'],
-    #         ascending=False
-    #     ).head(20)
-    # )
-
     # sort by certs_per_unique_subject_COMMON_NAME in descending order
     # print(
     #     common_names_per_day.sort_values(
@@ -95,10 +144,34 @@ def plot_validity_days(df: pd.DataFrame, output_dir: str):
     # )
 
     # plot the average validity days per issuer
-    days_by_issuer = df.explode('issuer_COMMON_NAME')\
-        .groupby(['issuer_COMMON_NAME'])\
-        .agg(avg_validity_days=('validity_days', np.mean), count=('validity_days', 'count'))\
-        .sort_values(by=['count'], ascending=False)
+    if 'top_issuers_sketch' in aggregate:
+        top_issuers = aggregate['top_issuers_sketch']
+
+        print(
+            f"Certificate counts of the top issuers are estimated, at most {top_issuers.error_bound():.0f} too low"
+        )
+
+        days_by_issuer = top_issuers.top(10)
+        days_by_issuer = pd.DataFrame({
+            'avg_validity_days': days_by_issuer['weight'] / days_by_issuer['count'],
+            'count': days_by_issuer['count'],
+        })
+        days_by_issuer.index = [
+            issuer_label(issuers, issuer_id) for issuer_id in days_by_issuer.index
+        ]
+    else:
+        # the averages are shown per common name, issuers sharing a name are combined
+        validity_days_sum_by_issuer = sum_by_issuer_name(
+            aggregate['validity_days_sum_by_issuer'], issuers
+        )
+        validity_days_count_by_issuer = sum_by_issuer_name(
+            aggregate['validity_days_count_by_issuer'], issuers
+        )
+
+        days_by_issuer = pd.DataFrame({
+            'avg_validity_days': validity_days_sum_by_issuer / validity_days_count_by_issuer,
+            'count': validity_days_count_by_issuer,
+        }).sort_values(by=['count'], ascending=False)
 
     days_by_top_issuer = days_by_issuer.head(10).sort_values(
         by=['avg_validity_days'], ascending=True)
@@ -127,3 +200,7 @@ def plot_validity_days(df: pd.DataFrame, output_dir: str):
         )
 
     plt.savefig(f"{output_dir}/validity-days-per-issuer.png")
+
+
+def plot_validity_days(df: pd.DataFrame, output_dir: str, issuers: pd.DataFrame):
+    render_validity_days(aggregate_validity_days(df), output_dir, issuers)
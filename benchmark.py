@@ -0,0 +1,276 @@
+import os
+import io
+import sys
+import json
+import time
+import glob
+import tempfile
+import subprocess
+import contextlib
+import importlib.util
+import click
+from typing import Tuple, List, Dict, Any, Optional
+
+# custom imports
+from extraction import read_input_file
+from extraction_helpers import map_certificate_row, map_certificate_batch
+
+# measures the throughput of the extraction and the analyses on a synthetic dump written
+# by generate_dump.py. everything runs offline, the same parameters yield the same
+# workload such that reports of different revisions can be compared
+
+# the directory of the scripts, the benchmarks run them as child processes
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the metrics where a higher value is better, for all others lower is better
+HIGHER_IS_BETTER = ['certificates_per_second']
+
+
+def run_script(arguments: List[str]) -> Tuple[float, int]:
+    "Runs one of the scripts in a child process, returns its wall time in seconds and its peak RSS in bytes"
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+
+        process = subprocess.Popen(
+            [sys.executable] + arguments,
+            cwd=SCRIPT_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr
+        )
+
+        # unlike the resource usage of all children, wait4 returns the one of this process
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+        wall_time = time.perf_counter() - start
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            output = stderr.read().decode(errors='replace')
+
+            raise Exception(
+                f"Running '{' '.join(arguments)}' failed with exit code {process.returncode}:\n{output[-2000:]}"
+            )
+
+    # ru_maxrss is in kilobytes on linux
+    return wall_time, usage.ru_maxrss * 1024
+
+
+def load_analysis_names() -> List[str]:
+    "Returns the names of the analyses of analysis.py, it can't be imported by its name as the analysis package shadows it"
+    spec = importlib.util.spec_from_file_location("analysis_script", f"{SCRIPT_DIR}/analysis.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return list(module.analyses.keys())
+
+
+def prepare_dump(work_dir: str, files: int, certificates: int, seed: int) -> List[str]:
+    "Generates the synthetic dump unless one with the same parameters exists already, returns its files"
+    dump_dir = f"{work_dir}/dump"
+    parameters_path = f"{work_dir}/dump.json"
+    parameters = {'files': files, 'certificates': certificates, 'seed': seed}
+
+    existing_parameters = None
+
+    if os.path.isfile(parameters_path):
+        with open(parameters_path) as f:
+            existing_parameters = json.load(f)
+
+    if existing_parameters != parameters:
+        for path in glob.glob(f"{dump_dir}/*.gz"):
+            os.remove(path)
+
+        print(f"Generating {files * certificates} certificates..")
+
+        run_script([
+            "generate_dump.py", dump_dir,
+            "--files", str(files),
+            "--certificates", str(certificates),
+            "--seed", str(seed),
+        ])
+
+        with open(parameters_path, 'w') as f:
+            json.dump(parameters, f)
+
+    return sorted(glob.glob(f"{dump_dir}/*.gz"))
+
+
+def benchmark_mapping(input_file: str, count: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    "Measures the certificates parsed per second by map_certificate_row and map_certificate_batch"
+    with read_input_file(input_file) as df:
+        df = df.head(count)
+
+    rows = df.to_dict('records')
+    ids = df['id'].tolist()
+    certificates_base64 = df['certificate_base64'].tolist()
+
+    wall_times: Dict[str, float] = {}
+
+    # the certificates that can't be parsed are printed
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+
+            for row in rows:
+                map_certificate_row(row)
+
+            wall_times['map_certificate_row'] = min(
+                wall_times.get('map_certificate_row', float('inf')),
+                time.perf_counter() - start
+            )
+
+            start = time.perf_counter()
+
+            map_certificate_batch(ids, certificates_base64)
+
+            wall_times['map_certificate_batch'] = min(
+                wall_times.get('map_certificate_batch', float('inf')),
+                time.perf_counter() - start
+            )
+
+    return {
+        name: {'wall_time': wall_time, 'certificates_per_second': len(rows) / wall_time}
+        for name, wall_time in wall_times.items()
+    }
+
+
+def benchmark_script(arguments: List[str], repeat: int, certificates: Optional[int] = None) -> Dict[str, float]:
+    "Runs a script `repeat` times, the fastest run is reported as the others were slowed down by something else"
+    runs = [run_script(arguments) for _ in range(repeat)]
+
+    wall_time = min(wall_time for wall_time, _ in runs)
+    peak_rss = max(peak_rss for _, peak_rss in runs)
+
+    result = {'wall_time': wall_time, 'peak_rss': peak_rss}
+
+    if certificates is not None:
+        result['certificates_per_second'] = certificates / wall_time
+
+    return result
+
+
+def print_report(report: Dict[str, Dict[str, float]]):
+    for name, metrics in report.items():
+        values = []
+
+        if 'wall_time' in metrics:
+            values.append(f"{metrics['wall_time']:.2f}s")
+
+        if 'certificates_per_second' in metrics:
+            values.append(f"{metrics['certificates_per_second']:.0f} certs/s")
+
+        if 'peak_rss' in metrics:
+            values.append(f"{metrics['peak_rss'] / (1 << 20):.0f}MB peak RSS")
+
+        print(f"{name}: {', '.join(values)}")
+
+
+def compare_reports(report: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    "Prints the change of every metric relative to the baseline, returns the metrics that got worse by more than the tolerance"
+    regressions: List[str] = []
+
+    for name, metrics in report.items():
+        for metric, value in metrics.items():
+            if metric not in baseline.get(name, {}) or baseline[name][metric] == 0:
+                continue
+
+            change = value / baseline[name][metric] - 1
+
+            # the relative change in the direction where positive values are worse
+            worsening = -change if metric in HIGHER_IS_BETTER else change
+
+            print(f"{name} {metric}: {change * 100:+.1f}%")
+
+            if worsening > tolerance:
+                regressions.append(f"{name} {metric}")
+
+    return regressions
+
+
+@click.command()
+# positional arguments
+# the directory the dump, the extracted data and the analysis results are written to
+@click.argument('work_dir', type=click.Path(file_okay=False))
+# flags / options
+# the size of the synthetic dump, see generate_dump.py
+@click.option('--files', type=click.IntRange(min=2), default=2)
+@click.option('--certificates', type=click.IntRange(min=1), default=10000)
+@click.option('--seed', type=int, default=0)
+# the number of certificates parsed in process by map_certificate_row / map_certificate_batch
+@click.option('--mapping-certificates', type=click.IntRange(min=1), default=2000)
+# the number of times every benchmark is run, the fastest run is reported
+@click.option('--repeat', type=click.IntRange(min=1), default=3)
+# write the report as json
+@click.option('--output', type=click.Path(dir_okay=False), default=None)
+# compare to a previous report and fail if a metric got worse by more than the tolerance
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), default=None)
+@click.option('--tolerance', type=click.FloatRange(min=0), default=0.2)
+def main(work_dir: str, files: int, certificates: int, seed: int, mapping_certificates: int, repeat: int, output: Optional[str], baseline: Optional[str], tolerance: float):
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+
+    work_dir = os.path.abspath(work_dir)
+    dump_files = prepare_dump(work_dir, files, certificates, seed)
+    total_certificates = files * certificates
+
+    report: Dict[str, Dict[str, float]] = {}
+
+    print("Benchmarking the certificate mapping..")
+    report.update(benchmark_mapping(dump_files[0], mapping_certificates, repeat))
+
+    print("Benchmarking the extraction..")
+    report['extraction'] = benchmark_script(
+        ["extraction.py", f"{work_dir}/dump", f"{work_dir}/extracted.parquet"],
+        repeat,
+        total_certificates
+    )
+    report['extraction_streaming'] = benchmark_script(
+        ["extraction.py", f"{work_dir}/dump", f"{work_dir}/streamed.parquet", "--stream"],
+        repeat,
+        total_certificates
+    )
+
+    print("Benchmarking the combiner..")
+    # the combiner merges the extracted files of every dump file
+    parts = []
+
+    for i, dump_file in enumerate(dump_files):
+        parts.append(f"{work_dir}/part-{i:05d}.parquet")
+        run_script(["extraction.py", dump_file, parts[-1]])
+
+    report['combiner'] = benchmark_script(
+        ["combiner.py"] + parts + [f"{work_dir}/combined.parquet"],
+        repeat,
+        total_certificates
+    )
+
+    print("Benchmarking the analyses..")
+    analyses_dir = f"{work_dir}/analyses"
+
+    if not os.path.exists(analyses_dir):
+        os.makedirs(analyses_dir)
+
+    for name in load_analysis_names():
+        report[f"analysis_{name}"] = benchmark_script([
+            "analysis.py", f"{work_dir}/extracted.parquet", analyses_dir, "--analysis", name
+        ], repeat)
+
+    print_report(report)
+
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        with open(baseline) as f:
+            regressions = compare_reports(report, json.load(f), tolerance)
+
+        if len(regressions) > 0:
+            raise Exception(
+                f"Metrics worse than the baseline by more than {tolerance * 100:.0f}%: {', '.join(regressions)}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
 import os
+import csv
+import gzip
+import json
 import pandas as pd
 import numpy as np
 import click
@@ -10,6 +13,27 @@ from tqdm import tqdm
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the columns of the gzipped input csv files
+input_columns = [
+    'log_url',
+    'id',
+    'hash',
+    'certificate_base64',
+    'certificate_chain_base64',
+    'domains',
+    'ts1',
+    'ts2'
+]
+
+# one entry per input row, sorted by id. the offset points to the start of the row
+# in the decompressed file
+index_dtype = np.dtype([
+    ('id', np.int64),
+    ('file', np.uint32),
+    ('offset', np.uint64),
+    ('length', np.uint32),
+])
+
 
 def is_valid_input(input_path: str):
 
@@ -22,13 +46,7 @@ def is_valid_input(input_path: str):
     return True
 
 
-@ click.command()
-# positional arguments
-# the input paths, can either be a directory or a single file
-@ click.argument('inputs', type=click.Path(exists=True), nargs=-1)
-@ click.argument('lookup_id', type=int)
-def main(inputs: List[str], lookup_id: str):
-
+def find_input_files(inputs: List[str]) -> List[str]:
     # first validate the arguments
     input_files = []
     for input_path in inputs:
@@ -54,6 +72,215 @@ def main(inputs: List[str], lookup_id: str):
             f"Did not find any valid input files given the paths '{joined_paths}'"
         )
 
+    return input_files
+
+
+def print_certificate(certificate_base64: str, certificate_chain_base64: str):
+    print(
+        "-----BEGIN CERTIFICATE-----\n" +
+        certificate_base64 +
+        "\n-----END CERTIFICATE-----"
+    )
+    print("-" * 50)
+    chain = ([
+        "-----BEGIN CERTIFICATE-----\n" +
+        c +
+        "\n-----END CERTIFICATE-----"
+        for c in certificate_chain_base64.split(";")
+    ])
+    for c in chain:
+        print(c)
+
+
+def parse_row(line: bytes) -> Dict[str, str]:
+    return dict(zip(input_columns, next(csv.reader([line.decode()]))))
+
+
+def parse_row_id(line: bytes) -> int:
+    # the id is the second column, only fall back to the csv parser if the first
+    # column is quoted and might contain a comma
+    if line.startswith(b'"'):
+        return int(parse_row(line)['id'])
+
+    return int(line.split(b",", 2)[1])
+
+
+def load_index(index_dir: str) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    with open(f"{index_dir}/files.json") as f:
+        files = json.load(f)
+
+    # check that the inputs did not change since the index was built
+    for file in files:
+        if not os.path.isfile(file['path']) or \
+                os.path.getsize(file['path']) != file['size'] or \
+                os.path.getmtime(file['path']) != file['mtime']:
+            raise Exception(
+                f"Input file '{file['path']}' changed since the index was built, rebuild the index"
+            )
+
+    # the index is memory mapped, a lookup only touches a few pages of it
+    index = np.load(f"{index_dir}/ids.npy", mmap_mode='r')
+
+    return index, files
+
+
+def lookup_ids(index: np.ndarray, lookup_ids: np.ndarray) -> np.ndarray:
+    "Returns the index entries of the given ids, ids that are not part of the index are skipped"
+    # the same id might occur in multiple logs, hence return the whole range of matching entries
+    starts = np.searchsorted(index['id'], lookup_ids, side='left')
+    ends = np.searchsorted(index['id'], lookup_ids, side='right')
+
+    return index[np.concatenate(
+        [np.arange(start, end) for start, end in zip(starts, ends)] + [np.array([], dtype=np.int64)]
+    )]
+
+
+def read_rows(path: str, entries: np.ndarray) -> List[Tuple[int, Dict[str, str]]]:
+    "Reads the rows at the offsets of the given entries in a single pass over the file, returns them along with their offsets"
+    rows = []
+
+    with gzip.open(path, 'rb') as f:
+        # gzip streams can only be read forward, visit the offsets in order
+        for entry in np.sort(entries, order='offset'):
+            f.seek(int(entry['offset']))
+            rows.append((int(entry['offset']), parse_row(f.read(int(entry['length'])))))
+
+    return rows
+
+
+class DefaultCommandGroup(click.Group):
+    "Runs the `scan` command if the first argument is not a command, this keeps `cherry-pick.py INPUTS ID` working"
+
+    def parse_args(self, ctx: click.Context, args: List[str]) -> List[str]:
+        if len(args) > 0 and args[0] not in self.commands and not args[0].startswith("-"):
+            args = ['scan'] + args
+
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultCommandGroup)
+def main():
+    pass
+
+
+@main.command()
+# positional arguments
+# the input paths, can either be a directory or a single file
+@click.argument('inputs', type=click.Path(exists=True), nargs=-1)
+# the directory the index is written to
+@click.argument('index_dir', type=click.Path(file_okay=False))
+def index(inputs: List[str], index_dir: str):
+    "Builds an index mapping every id to its position in the input files"
+    input_files = find_input_files(inputs)
+
+    files: List[Dict[str, Any]] = []
+    entries: List[np.ndarray] = []
+
+    for file_index, input_file in enumerate(input_files):
+        print(f"Indexing file '{input_file}'..")
+
+        ids: List[int] = []
+        offsets: List[int] = []
+        lengths: List[int] = []
+        offset = 0
+
+        with gzip.open(input_file, 'rb') as f:
+            for line in tqdm(f, unit="rows"):
+                ids.append(parse_row_id(line))
+                offsets.append(offset)
+                lengths.append(len(line))
+                offset += len(line)
+
+        file_entries = np.empty(len(ids), dtype=index_dtype)
+        file_entries['id'] = ids
+        file_entries['file'] = file_index
+        file_entries['offset'] = offsets
+        file_entries['length'] = lengths
+        entries.append(file_entries)
+
+        files.append({
+            'path': os.path.abspath(input_file),
+            'size': os.path.getsize(input_file),
+            'mtime': os.path.getmtime(input_file),
+        })
+
+    index = np.concatenate(entries)
+    index.sort(order='id', kind='stable')
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(f"{index_dir}/ids.npy", index)
+
+    with open(f"{index_dir}/files.json", 'w') as f:
+        json.dump(files, f, indent=2)
+
+    print(f"Indexed {len(index)} rows of {len(files)} files")
+
+
+@main.command()
+# positional arguments
+# the directory containing the index
+@click.argument('index_dir', type=click.Path(exists=True, file_okay=False))
+@click.argument('ids', type=int, nargs=-1)
+# flags / options
+# a csv file with an id column, e.g. the -invalid.csv of the extraction
+@click.option('--ids-file', type=click.Path(exists=True, dir_okay=False), default=None)
+# write the certificates to <id>-<input file>-<offset>.pem files in this directory instead
+# of printing them, the same id might occur in multiple logs
+@click.option('--output-dir', type=click.Path(file_okay=False), default=None)
+def lookup(index_dir: str, ids: List[int], ids_file: str, output_dir: str):
+    "Looks up certificates by their id using an index"
+    lookup_ids_list = list(ids)
+
+    if ids_file is not None:
+        lookup_ids_list += pd.read_csv(ids_file, usecols=['id'])['id'].tolist()
+
+    if len(lookup_ids_list) == 0:
+        raise Exception(f"No ids to look up given")
+
+    index, files = load_index(index_dir)
+    entries = lookup_ids(
+        index, np.unique(np.array(lookup_ids_list, dtype=np.int64))
+    )
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    found_ids = set()
+
+    # group the entries by file, this way every file is opened once
+    for file_index in np.unique(entries['file']):
+        path = files[file_index]['path']
+
+        for offset, row in read_rows(path, entries[entries['file'] == file_index]):
+            found_ids.add(int(row['id']))
+
+            if output_dir is not None:
+                filename = f"{row['id']}-{os.path.basename(path).removesuffix('.gz')}-{offset}.pem"
+
+                with open(f"{output_dir}/{filename}", 'w') as f:
+                    for c in [row['certificate_base64']] + row['certificate_chain_base64'].split(";"):
+                        f.write(
+                            "-----BEGIN CERTIFICATE-----\n" + c + "\n-----END CERTIFICATE-----\n"
+                        )
+            else:
+                print(f"id {row['id']}:")
+                print_certificate(
+                    row['certificate_base64'], row['certificate_chain_base64']
+                )
+
+    for lookup_id in sorted(set(lookup_ids_list) - found_ids):
+        print(f"Could not find any entry with id {lookup_id}")
+
+
+@main.command()
+# positional arguments
+# the input paths, can either be a directory or a single file
+@click.argument('inputs', type=click.Path(exists=True), nargs=-1)
+@click.argument('lookup_id', type=int)
+def scan(inputs: List[str], lookup_id: str):
+    "Looks up a certificate by its id by reading all input files"
+    input_files = find_input_files(inputs)
+
     df = None
 
     # read all input files, parse them and extract all useful data
@@ -65,16 +292,7 @@ def main(inputs: List[str], lookup_id: str):
             # inputs do not contain any headers
             header=None,
             # name columns manually
-            names=[
-                'log_url',
-                'id',
-                'hash',
-                'certificate_base64',
-                'certificate_chain_base64',
-                'domains',
-                'ts1',
-                'ts2'
-            ],
+            names=input_columns,
             # files are gzipped
             compression='gzip'
         )
@@ -82,20 +300,10 @@ def main(inputs: List[str], lookup_id: str):
         cert = df[df['id'] == lookup_id]
 
         if (len(cert) > 0):
-            print(
-                "-----BEGIN CERTIFICATE-----\n" +
-                cert.iloc[0]['certificate_base64'] +
-                "\n-----END CERTIFICATE-----"
+            print_certificate(
+                cert.iloc[0]['certificate_base64'],
+                cert.iloc[0]['certificate_chain_base64']
             )
-            print("-" * 50)
-            chain = ([
-                "-----BEGIN CERTIFICATE-----\n" +
-                c +
-                "\n-----END CERTIFICATE-----"
-                for c in cert.iloc[0]['certificate_chain_base64'].split(";")
-            ])
-            for c in chain:
-                print(c)
 
             exit()
 
@@ -2,9 +2,19 @@ import os
 import pandas as pd
 import numpy as np
 import click
-from typing import Tuple, List, Dict, Any
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+from typing import Tuple, List, Dict, Any, Callable, Optional
 from tqdm import tqdm
 
+# custom imports
+from dataset import is_dataset, side_table_path, key_columns, NAMES_FILENAME, INTERMEDIATES_FILENAME, ISSUERS_FILENAME
+from names import merge_sorted_runs
+from intermediates import merge_intermediates
+from issuers import merge_issuers
+from extraction_helpers import flags_metadata, FLAGS_METADATA_KEY
+
 # Create new `pandas` methods which use `tqdm` progress
 # (can use tqdm_gui, optional kwargs, etc.)
 # (https://stackoverflow.com/a/34365537/2897827)
@@ -24,6 +34,10 @@ def get_sibling_paths(input_path: str, suffixes: List[str]):
 
 def is_valid_input(input_path: str):
 
+    # partitioned datasets written by the extraction
+    if is_dataset(input_path):
+        return True
+
     if not os.path.isfile(input_path):
         return False
 
@@ -56,6 +70,76 @@ def single_value_cols(df):
     ]
 
 
+def combine_side_tables(input_files: List[str], output: str, suffix: str, dataset_filename: str, merge: Callable[[List[str], str], None], unique_columns: Optional[List[str]] = None, sort_columns: Optional[List[str]] = None):
+    "Combines the tables written along with the inputs, e.g. their intermediates, into the table of the output"
+    paths = [
+        side_table_path(input_file, suffix, dataset_filename)
+        for input_file in input_files
+    ]
+
+    for path in paths:
+        if not os.path.isfile(path):
+            raise Exception(
+                f"Did not find the {suffix} table '{path}', it is written along with the extracted certificates"
+            )
+
+    output_path = side_table_path(output, suffix, dataset_filename)
+
+    print(f"Combining the {suffix} of {len(paths)} inputs into '{output_path}'..")
+
+    if output.endswith(".parquet"):
+        # the lists of the csv tables are written as strings, they can't be converted back
+        if any(path.endswith(".csv") for path in paths):
+            raise Exception(
+                f"Can't combine the {suffix} tables of csv inputs into the parquet output '{output}'"
+            )
+
+        merge(paths, output_path)
+        return
+
+    # the csv tables are small enough to be combined in memory
+    df = pd.concat([
+        pd.read_csv(path) if path.endswith(".csv") else pd.read_parquet(path)
+        for path in paths
+    ], ignore_index=True)
+
+    if unique_columns is not None:
+        df = df.drop_duplicates(subset=unique_columns, keep='last')
+
+    if sort_columns is not None:
+        df = df.sort_values(sort_columns)
+
+    df.to_csv(output_path, index=False)
+
+
+def input_flags_metadata(input_files: List[str]) -> Dict[bytes, bytes]:
+    "Returns the names of the bits of the bitmask columns the inputs were extracted with"
+    flags = set()
+
+    for input_file in input_files:
+        if is_dataset(input_file):
+            metadata = ds.dataset(input_file, format="parquet").schema.metadata
+        elif input_file.endswith(".parquet"):
+            metadata = pq.read_schema(input_file).metadata
+        else:
+            metadata = None
+
+        if metadata is not None and FLAGS_METADATA_KEY in metadata:
+            flags.add(metadata[FLAGS_METADATA_KEY])
+
+    # the bitmasks of the inputs can't be combined if their bits mean different things
+    if len(flags) > 1:
+        raise Exception(
+            "The inputs were extracted with different bits of the bitmask columns, extract them again"
+        )
+
+    # csv inputs don't have any metadata, their bits are named by the current extraction
+    if len(flags) == 0:
+        return flags_metadata()
+
+    return {FLAGS_METADATA_KEY: flags.pop()}
+
+
 @ click.command()
 # positional arguments
 # the input paths, can either be a directory or a single file
@@ -67,9 +151,15 @@ def main(inputs: List[str], output: str):
     input_files = []
     for input_path in inputs:
         # check if the input is a single file or a directory
-        if os.path.isdir(input_path):
+        if os.path.isdir(input_path) and not is_dataset(input_path):
             # walk input directory and retrive the list of all valid input files
             for root, dirs, files in os.walk(input_path):
+                # datasets are read as a whole, don't descend into them
+                if is_dataset(root):
+                    input_files += [root]
+                    dirs.clear()
+                    continue
+
                 input_files += [
                     # map each file to its full filename
                     f"{root}/{f}"
@@ -94,21 +184,26 @@ def main(inputs: List[str], output: str):
     for i, input_file in enumerate(input_files):
         print(f"Reading file '{input_file}'..")
 
-        if input_file.endswith(".csv"):
+        if is_dataset(input_file):
+            # datasets contain all columns and no single-valued file, the empty
+            # columns are dropped here and the single-valued ones further below
+            df_in = pd.read_parquet(input_file).dropna(axis=1, how='all')
+        elif input_file.endswith(".csv"):
             df_in = pd.read_csv(input_file)
         elif input_file.endswith(".parquet"):
             df_in = pd.read_parquet(input_file)
         else:
             raise Exception(f"Unkown input format for file {input_file}''")
 
-        single_valued_path = get_sibling_paths(
-            input_file,
-            ["single-valued.csv"]
-        )[0]
+        if not is_dataset(input_file):
+            single_valued_path = get_sibling_paths(
+                input_file,
+                ["single-valued.csv"]
+            )[0]
 
-        df_single_valued = pd.read_csv(single_valued_path)
-        for column in df_single_valued.columns:
-            df_in[column] = df_single_valued.iloc[0][column]
+            df_single_valued = pd.read_csv(single_valued_path)
+            for column in df_single_valued.columns:
+                df_in[column] = df_single_valued.iloc[0][column]
 
         if i == 0:
             df = df_in
@@ -129,7 +224,8 @@ def main(inputs: List[str], output: str):
     # fill 'single_valued_columns' and 'single_valued' by iterating over the
     # set of all column names and the is_single_value_col array
     for single_value, column_name in zip(is_single_value_col, df.columns):
-        if single_value:
+        # the key columns are kept, otherwise the rows could not be joined with their tables
+        if single_value and column_name not in key_columns:
             single_valued_columns.append(column_name)
             single_valued[column_name] = first_row[column_name]
 
@@ -138,7 +234,12 @@ def main(inputs: List[str], output: str):
 
     # store df without single-valued columns
     if output.endswith(".parquet"):
-        df.to_parquet(output, index=False)
+        # keep the names of the bits of the bitmask columns, see load_flag_names
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(
+            table.replace_schema_metadata({**table.schema.metadata, **input_flags_metadata(input_files)}),
+            output
+        )
     elif output.endswith(".csv"):
         df.to_csv(output, index=False)
     else:
@@ -151,6 +252,25 @@ def main(inputs: List[str], output: str):
 
     pd.DataFrame([single_valued]).to_csv(single_valued_path, index=False)
 
+    # the names of the certificates, sorted by the name like the tables of the inputs
+    combine_side_tables(
+        input_files, output, "names", NAMES_FILENAME,
+        merge_sorted_runs, sort_columns=['name', 'id', 'name_type']
+    )
+
+    # the issuer ids are derived from the hash of the issuer names, the same issuer has the
+    # same id in every input. merging the tables by the id is all it takes to remap them
+    combine_side_tables(
+        input_files, output, "issuers", ISSUERS_FILENAME,
+        merge_issuers, unique_columns=['issuer_id']
+    )
+
+    # the certificates of the chains, the same intermediates are part of most inputs
+    combine_side_tables(
+        input_files, output, "intermediates", INTERMEDIATES_FILENAME,
+        merge_intermediates, unique_columns=['fingerprint']
+    )
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,143 @@
+import os
+import glob
+import json
+import hashlib
+import shutil
+from typing import Tuple, List, Dict, Any
+
+# the manifest and the invalid certificates are prefixed with an underscore, this way
+# they are ignored when the dataset is read with pyarrow / pandas
+# (https://arrow.apache.org/docs/python/generated/pyarrow.dataset.dataset.html)
+MANIFEST_FILENAME = "_manifest.json"
+
+# the names of all parts, sorted by the name, see names.py
+NAMES_FILENAME = "_names.parquet"
+
+# the distinct certificates of the chains of all parts, see intermediates.py
+INTERMEDIATES_FILENAME = "_intermediates.parquet"
+
+# the names of the issuers of all parts, see issuers.py
+ISSUERS_FILENAME = "_issuers.parquet"
+
+# the columns referencing the rows of a dimension table, they are kept even if they only
+# consist of a single value, otherwise the certificates could not be joined with them
+key_columns = ['issuer_id']
+
+
+def is_dataset(path: str) -> bool:
+    "Checks whether the path points to a partitioned dataset written by the extraction"
+    return os.path.isdir(path) and os.path.isfile(f"{path}/{MANIFEST_FILENAME}")
+
+
+def side_table_path(input_path: str, suffix: str, dataset_filename: str) -> str:
+    "Returns the path of a table written along with an extraction output or dataset, e.g. its issuers"
+    if is_dataset(input_path):
+        return f"{input_path}/{dataset_filename}"
+
+    for extension in [".parquet", ".csv"]:
+        if input_path.endswith(extension):
+            return input_path.removesuffix(extension) + f"-{suffix}" + extension
+
+    raise Exception(
+        f"Expected a .parquet or .csv extraction output or a partitioned dataset, got '{input_path}'"
+    )
+
+
+def file_checksum(path: str) -> str:
+    "Computes the sha256 checksum of a file without reading it into memory at once"
+    checksum = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            checksum.update(block)
+
+    return checksum.hexdigest()
+
+
+def input_key(input_file: str) -> str:
+    "Derives the name of the directory holding the parts of an input file"
+    # the hash of the full path avoids collisions of equally named files in different directories
+    return os.path.basename(input_file).removesuffix(".gz") + "-" + \
+        hashlib.sha1(input_file.encode()).hexdigest()[:8]
+
+
+def create_manifest_entry(input_file: str, chunk_size: int) -> Dict[str, Any]:
+    stat = os.stat(input_file)
+
+    return {
+        'key': input_key(input_file),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'checksum': file_checksum(input_file),
+        # the parts are written per chunk, resuming requires the same chunk size
+        'chunk_size': chunk_size,
+        'parts': [],
+        'complete': False,
+    }
+
+
+def is_input_unchanged(entry: Dict[str, Any], input_file: str) -> bool:
+    "Checks whether an input file still matches its manifest entry, updating the entry's mtime if only it changed"
+    stat = os.stat(input_file)
+
+    if stat.st_size != entry['size']:
+        return False
+
+    if stat.st_mtime == entry['mtime']:
+        return True
+
+    # the file might have been touched or copied, only the content matters
+    if file_checksum(input_file) == entry['checksum']:
+        entry['mtime'] = stat.st_mtime
+        return True
+
+    return False
+
+
+def load_manifest(dataset_dir: str) -> Dict[str, Any]:
+    path = f"{dataset_dir}/{MANIFEST_FILENAME}"
+
+    if not os.path.isfile(path):
+        return {'version': None, 'inputs': {}}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(dataset_dir: str, manifest: Dict[str, Any]):
+    # write to a temporary file first such that an interrupted write doesn't
+    # corrupt the manifest
+    path = f"{dataset_dir}/{MANIFEST_FILENAME}"
+
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    os.replace(f"{path}.tmp", path)
+
+
+def remove_parts(dataset_dir: str, entry: Dict[str, Any]):
+    "Removes all parts that were written for a manifest entry"
+    shutil.rmtree(f"{dataset_dir}/{entry['key']}", ignore_errors=True)
+
+
+def temporary_path(path: str) -> str:
+    "Returns the path a part is written to before it is complete, prefixed such that it is not read as a part"
+    return os.path.join(os.path.dirname(path), f"_{os.path.basename(path)}.tmp")
+
+
+def remove_temporary_parts(dataset_dir: str, entry: Dict[str, Any]):
+    "Removes the incomplete parts of a manifest entry left behind by an interrupted run"
+    for path in glob.glob(f"{dataset_dir}/{entry['key']}/*.tmp"):
+        os.remove(path)
+
+
+def part_paths(entry: Dict[str, Any], index: int) -> Tuple[str, str, str, str, str, str]:
+    "Returns the paths, relative to the dataset, of the i-th part, its invalid certificates, its names, its errors, its intermediates and its issuers"
+    return (
+        f"{entry['key']}/part-{index:05d}.parquet",
+        f"{entry['key']}/_invalid-{index:05d}.csv",
+        f"{entry['key']}/_names-{index:05d}.parquet",
+        f"{entry['key']}/_errors-{index:05d}.csv",
+        f"{entry['key']}/_intermediates-{index:05d}.parquet",
+        f"{entry['key']}/_issuers-{index:05d}.parquet",
+    )
@@ -0,0 +1,374 @@
+import os
+import re
+import json
+import bisect
+import click
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Tuple, List, Dict, Any, Optional, Set
+
+# custom imports
+from dataset import is_dataset, NAMES_FILENAME
+
+# the public suffix list shipped by most linux distributions (the `publicsuffix` package)
+# (https://publicsuffix.org/list/)
+DEFAULT_PUBLIC_SUFFIX_LIST = "/usr/share/publicsuffix/public_suffix_list.dat"
+
+# names that look like host names, other subject alternative names (emails, uris, ..)
+# don't have a registrable domain
+host_name_pattern = re.compile(r"(\*\.)?[a-z0-9_-]+(\.[a-z0-9_-]+)+")
+
+
+class PublicSuffixList:
+    "The rules of the public suffix list, used to derive the registrable domain of a name"
+
+    def __init__(self, path: Optional[str] = None):
+        self.rules: Set[str] = set()
+        self.exceptions: Set[str] = set()
+
+        if path is None:
+            return
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                # the rule is the first word of a line, comments start with //
+                rule = line.strip().split(" ")[0].lower()
+
+                if rule == "" or rule.startswith("//"):
+                    continue
+
+                if rule.startswith("!"):
+                    self.exceptions.add(rule[1:])
+                else:
+                    self.rules.add(rule)
+
+    def public_suffix_length(self, labels: List[str]) -> int:
+        "Returns the number of trailing labels that are a public suffix"
+        # the first matching suffix is the longest one
+        for i in range(len(labels)):
+            suffix = ".".join(labels[i:])
+
+            if suffix in self.exceptions:
+                return len(labels) - i - 1
+
+            if suffix in self.rules or "*." + ".".join(labels[i + 1:]) in self.rules:
+                return len(labels) - i
+
+        # the implicit rule "*", every top level domain is a public suffix
+        return 1
+
+    def registrable_domain(self, name: str) -> Optional[str]:
+        "Returns the public suffix of a normalized host name plus one more label, None if there is none"
+        if not host_name_pattern.fullmatch(name):
+            return None
+
+        labels = name.removeprefix("*.").split(".")
+
+        # ip addresses
+        if labels[-1].isdigit():
+            return None
+
+        length = self.public_suffix_length(labels) + 1
+
+        if length > len(labels):
+            return None
+
+        return ".".join(labels[-length:])
+
+
+def normalize_name(name: str) -> str:
+    return name.strip().lower().removesuffix(".")
+
+
+def reverse_labels(name: str) -> str:
+    "Reverses the labels of a name, e.g. www.example.com becomes com.example.www"
+    # names sharing a suffix share a prefix once reversed, so suffix lookups are ranges
+    return ".".join(reversed(name.split(".")))
+
+
+class SortedStrings:
+    "Sorted strings stored as concatenated utf-8 bytes and their offsets, supports binary search through `bisect`"
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    @staticmethod
+    def save(strings: List[str], path: str):
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(s) for s in encoded])
+
+        np.save(f"{path}-data.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        np.save(f"{path}-offsets.npy", offsets)
+
+    @staticmethod
+    def load(path: str) -> 'SortedStrings':
+        return SortedStrings(
+            np.load(f"{path}-data.npy", mmap_mode='r'),
+            np.load(f"{path}-offsets.npy", mmap_mode='r')
+        )
+
+
+class PostingLists:
+    "Maps sorted keys to sorted lists of certificate ids, memory mapped such that a lookup only touches a few pages"
+
+    def __init__(self, path: str):
+        self.keys = SortedStrings.load(f"{path}-keys")
+        self.ids = np.load(f"{path}-ids.npy", mmap_mode='r')
+        self.offsets = np.load(f"{path}-id-offsets.npy", mmap_mode='r')
+
+    def find(self, key: str) -> Optional[int]:
+        "Returns the position of the key, None if it doesn't exist"
+        i = bisect.bisect_left(self.keys, key)
+
+        if i < len(self.keys) and self.keys[i] == key:
+            return i
+
+        return None
+
+    def range(self, start: str, end: str) -> Tuple[int, int]:
+        "Returns the positions of the keys in [start, end)"
+        return bisect.bisect_left(self.keys, start), bisect.bisect_left(self.keys, end)
+
+    def postings(self, positions: List[int]) -> np.ndarray:
+        "Returns the sorted, distinct ids of the keys at the given positions"
+        return np.unique(np.concatenate(
+            [np.asarray(self.ids[self.offsets[i]:self.offsets[i + 1]]) for i in positions] +
+            [np.array([], dtype=np.int64)]
+        ))
+
+    @staticmethod
+    def save(keys: List[str], key_index: np.ndarray, ids: np.ndarray, path: str):
+        """
+        Writes the posting lists of the (key, id) rows, `keys` are the sorted distinct keys
+        and `key_index` the position of the key of every row within them
+        """
+        # sort by key and id and drop duplicate rows
+        order = np.lexsort((ids, key_index))
+        key_index = key_index[order]
+        ids = ids[order]
+
+        is_distinct = np.ones(len(ids), dtype=bool)
+        is_distinct[1:] = (key_index[1:] != key_index[:-1]) | (ids[1:] != ids[:-1])
+        key_index = key_index[is_distinct]
+        ids = ids[is_distinct]
+
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(key_index, minlength=len(keys)))
+
+        SortedStrings.save(keys, f"{path}-keys")
+        np.save(f"{path}-ids.npy", ids.astype(np.int64))
+        np.save(f"{path}-id-offsets.npy", offsets)
+
+
+def find_names_table(path: str) -> str:
+    "Returns the names table of an extraction output, see names.py"
+    if is_dataset(path):
+        return f"{path}/{NAMES_FILENAME}"
+
+    if path.endswith("-names.parquet"):
+        return path
+
+    if path.endswith(".parquet"):
+        return path.removesuffix(".parquet") + "-names.parquet"
+
+    raise Exception(
+        f"Expected a .parquet extraction output, its names table or a partitioned dataset, got '{path}'"
+    )
+
+
+def read_names(names_path: str) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    "Reads the distinct names of a names table, the position of the name of every row within them and the ids"
+    table = pq.read_table(names_path, columns=['id', 'name']).unify_dictionaries()
+
+    if table.num_rows == 0:
+        return [], np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    # all chunks share the same dictionary now
+    chunks = table['name'].chunks
+
+    return (
+        chunks[0].dictionary.to_pylist(),
+        np.concatenate([chunk.indices.to_numpy(zero_copy_only=False) for chunk in chunks]).astype(np.int64),
+        table['id'].to_numpy()
+    )
+
+
+def load_index(index_dir: str) -> Tuple[Dict[str, Any], PostingLists, PostingLists]:
+    with open(f"{index_dir}/index.json") as f:
+        info = json.load(f)
+
+    # check that the names didn't change since the index was built
+    if not os.path.isfile(info['path']) or \
+            os.path.getsize(info['path']) != info['size'] or \
+            os.path.getmtime(info['path']) != info['mtime']:
+        raise Exception(
+            f"Names table '{info['path']}' changed since the index was built, rebuild the index"
+        )
+
+    return info, PostingLists(f"{index_dir}/names"), PostingLists(f"{index_dir}/domains")
+
+
+def query_ids(names: PostingLists, domains: PostingLists, name: str, mode: str) -> np.ndarray:
+    "Returns the ids of the certificates matching the query"
+    name = normalize_name(name)
+    key = reverse_labels(name)
+
+    if mode == 'exact':
+        position = names.find(key)
+        return names.postings([] if position is None else [position])
+
+    if mode == 'covers':
+        # the name itself or a wildcard for its parent domain
+        positions = [names.find(key)]
+
+        if "." in name:
+            positions.append(names.find(reverse_labels("*." + name.split(".", 1)[1])))
+
+        return names.postings([p for p in positions if p is not None])
+
+    if mode == 'wildcard':
+        # *.example.com matches exactly one label in front of example.com
+        if not name.startswith("*."):
+            raise Exception(f"Wildcard queries have to start with '*.', got '{name}'")
+
+        prefix = reverse_labels(name[2:]) + "."
+        start, end = names.range(prefix, prefix[:-1] + "/")
+
+        return names.postings([
+            i for i in range(start, end) if "." not in names.keys[i][len(prefix):]
+        ])
+
+    if mode == 'suffix':
+        # the name and all of its subdomains, "/" is the character following "."
+        start, end = names.range(key + ".", key + "/")
+        position = names.find(key)
+
+        return names.postings(
+            list(range(start, end)) + ([] if position is None else [position])
+        )
+
+    if mode == 'domain':
+        position = domains.find(name)
+        return domains.postings([] if position is None else [position])
+
+    raise Exception(f"Unknown query mode '{mode}'")
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+# positional arguments
+# the extraction output, either a .parquet file, its -names.parquet table or a dataset
+@click.argument('input_path', type=click.Path(exists=True))
+# the directory the index is written to
+@click.argument('index_dir', type=click.Path(file_okay=False))
+# flags / options
+@click.option(
+    '--public-suffix-list',
+    type=click.Path(dir_okay=False),
+    default=DEFAULT_PUBLIC_SUFFIX_LIST if os.path.isfile(DEFAULT_PUBLIC_SUFFIX_LIST) else None
+)
+def index(input_path: str, index_dir: str, public_suffix_list: Optional[str]):
+    "Builds posting lists of the certificate ids per name and per registrable domain"
+    names_path = find_names_table(input_path)
+
+    if not os.path.isfile(names_path):
+        raise Exception(f"Did not find the names table '{names_path}'")
+
+    if public_suffix_list is None:
+        print(
+            "No public suffix list given, using the last two labels of a name as its registrable domain"
+        )
+
+    psl = PublicSuffixList(public_suffix_list)
+
+    print(f"Reading names table '{names_path}'..")
+    distinct_names, name_index, ids = read_names(names_path)
+
+    # the distinct names are usually much fewer than the rows, only they are processed in python
+    normalized_names = [normalize_name(name) for name in distinct_names]
+
+    name_keys = [reverse_labels(name) for name in normalized_names]
+    keys = sorted(set(name_keys))
+    key_positions = {key: i for i, key in enumerate(keys)}
+
+    name_domains = [psl.registrable_domain(name) for name in normalized_names]
+    domains = sorted(set(domain for domain in name_domains if domain is not None))
+    domain_positions = {domain: i for i, domain in enumerate(domains)}
+
+    # the positions of the key / domain of every row, -1 for names without a domain
+    row_key_index = np.array(
+        [key_positions[key] for key in name_keys], dtype=np.int64
+    )[name_index]
+    row_domain_index = np.array(
+        [-1 if domain is None else domain_positions[domain] for domain in name_domains],
+        dtype=np.int64
+    )[name_index]
+    has_domain = row_domain_index >= 0
+
+    os.makedirs(index_dir, exist_ok=True)
+
+    PostingLists.save(keys, row_key_index, ids, f"{index_dir}/names")
+    PostingLists.save(
+        domains, row_domain_index[has_domain], ids[has_domain], f"{index_dir}/domains"
+    )
+
+    with open(f"{index_dir}/index.json", 'w') as f:
+        json.dump({
+            'path': os.path.abspath(names_path),
+            'size': os.path.getsize(names_path),
+            'mtime': os.path.getmtime(names_path),
+            'public_suffix_list': public_suffix_list,
+            'names': len(keys),
+            'domains': len(domains),
+            'rows': len(ids),
+        }, f, indent=2)
+
+    print(
+        f"Indexed {len(ids)} rows, {len(keys)} distinct names and {len(domains)} registrable domains"
+    )
+
+
+@main.command()
+# positional arguments
+# the directory containing the index
+@click.argument('index_dir', type=click.Path(exists=True, file_okay=False))
+@click.argument('name')
+# flags / options
+# exact: the name itself
+# covers: the certificates valid for the name, i.e. the name or a wildcard of its parent
+# wildcard: names matching a *.example.com pattern (one label)
+# suffix: the name and all of its subdomains
+# domain: all names of a registrable domain (e.g. example.co.uk)
+@click.option(
+    '--mode',
+    type=click.Choice(['exact', 'covers', 'wildcard', 'suffix', 'domain']),
+    default='exact'
+)
+def query(index_dir: str, name: str, mode: str):
+    "Prints the ids of the certificates matching a name as csv, usable as --ids-file of cherry-pick.py"
+    info, names, domains = load_index(index_dir)
+
+    ids = query_ids(names, domains, name, mode)
+
+    print("id")
+    for id in ids:
+        print(id)
+
+    click.echo(f"Found {len(ids)} certificates", err=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,86 @@
 import os
+import gzip
+import time
+import contextlib
 import pandas as pd
 import numpy as np
 import click
-from typing import Tuple, List, Dict, Any
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+from multiprocessing import Pool
+from typing import Tuple, List, Dict, Any, Optional
 from tqdm import tqdm
 
 # custom imports
-from extraction_helpers import is_valid_input_file, map_certificate_row
+from extraction_helpers import is_valid_input_file, map_certificate_chunk, certificate_column_types, flags_metadata, issuer_name_cache, public_key_cache, extraction_version, profile, error_log
+from extraction_helpers import map_certificate_chains, chain_column_types, intermediate_cache, intermediates, issuers
+from profiling import TimedFile
+from parse_cache import ParseCache
+from dataset import load_manifest, save_manifest, create_manifest_entry, is_input_unchanged, remove_parts, remove_temporary_parts, temporary_path, part_paths, key_columns, NAMES_FILENAME, INTERMEDIATES_FILENAME, ISSUERS_FILENAME
+from names import name_columns, build_names_table, merge_sorted_runs, names_schema
+from intermediates import build_intermediates_table, referenced_fingerprints, merge_intermediates
+from issuers import build_issuers_table, referenced_issuers, merge_issuers
 
 # Create new `pandas` methods which use `tqdm` progress
 # (can use tqdm_gui, optional kwargs, etc.)
 # (https://stackoverflow.com/a/34365537/2897827)
 tqdm.pandas()
 
+# the columns of the gzipped input csv files
+input_columns = [
+    'log_url',
+    'id',
+    'hash',
+    'certificate_base64',
+    'certificate_chain_base64',
+    'domains',
+    'ts1',
+    'ts2'
+]
+
+# the columns of the input files that are required for the extraction
+required_input_columns = ['id', 'hash', 'certificate_base64', 'certificate_chain_base64']
+
+# the columns of the input files that are stored for invalid certificates
+invalid_output_columns = ['id', 'certificate_base64', 'certificate_chain_base64']
+
+# the columns of the errors of the certificates that could not be mapped, see ErrorLog
+error_output_columns = ['id', 'stage', 'extension', 'error']
+
+# maps the column types of `column_types` to arrow types
+arrow_types = {
+    'int': pa.int64(),
+    'bool': pa.bool_(),
+    'string': pa.string(),
+    'list': pa.list_(pa.string()),
+    'binary_list': pa.list_(pa.binary()),
+}
+
+# the columns mapped from the certificates themselves
+parsed_columns = sorted(certificate_column_types.keys())
+
+# the columns stored in the parse cache. the id is the id of the log entry, the same
+# certificate has a different one in every log or dump it is part of
+cached_columns = [column for column in parsed_columns if column != 'id']
+
+# the type of every output column, the chain columns are mapped from the chain of a
+# certificate which might differ between log entries of the same certificate
+column_types = {**certificate_column_types, **chain_column_types}
+
+# the schema of the parsed certificates, the columns are sorted the same way pandas
+# sorts them when expanding rows with differing columns. the metadata names the bits
+# of the bitmask columns
+certificate_schema = pa.schema([
+    (column, arrow_types[column_types[column]])
+    for column in sorted(column_types.keys())
+], metadata=flags_metadata())
+
+# the columns of the parsed certificates the names table is built from
+names_source_schema = pa.schema([
+    certificate_schema.field(column) for column in ['id'] + list(name_columns.keys())
+])
+
 # check which columns only consist of one single value
 # (https://stackoverflow.com/a/54405767/2897827)
 
@@ -37,19 +105,738 @@ def derive_output(output: str, suffix: str, output_extension: str, new_extension
         f"-{suffix}{new_extension}"
 
 
+@contextlib.contextmanager
+def read_input_file(input_file: str, chunk_size: Optional[int] = None):
+    "Reads a gzipped csv input file, either at once or as an iterator over chunks of `chunk_size` rows"
+    # when profiling, the file is decompressed here to measure the decompression. pandas
+    # only closes the files it opened itself, the timed file is closed when done reading
+    with (
+        TimedFile(gzip.open(input_file), profile, "read_csv.decompress")
+        if profile.enabled else contextlib.nullcontext(input_file)
+    ) as file:
+        result = pd.read_csv(
+            file,
+            # inputs do not contain any headers
+            header=None,
+            # name columns manually
+            names=input_columns,
+            # files are gzipped
+            compression=None if profile.enabled else 'gzip',
+            chunksize=chunk_size
+        )
+
+        if chunk_size is None:
+            yield result
+        else:
+            with result as reader:
+                yield reader
+
+
+def prepare_input(df: pd.DataFrame) -> pd.DataFrame:
+    "Reduces the input to the required columns and splits the certificate chain"
+    # reduce dataframe to required columns, https://stackoverflow.com/a/45846315/2897827
+    df = df.drop(
+        df.columns.difference(required_input_columns),
+        axis=1
+    )
+    # convert certificate chain to list column
+    df['certificate_chain_base64'] = df['certificate_chain_base64'].apply(
+        lambda chain: chain.split(";")
+    )
+
+    return df
+
+
+def initialize_worker(issuer_cache_size: int, public_key_cache_size: int, profiling: bool = False):
+    "Configures the caches and the profile of the current process, this is run once in every worker process"
+    issuer_name_cache.resize(issuer_cache_size)
+    public_key_cache.resize(public_key_cache_size)
+    profile.enabled = profiling
+
+
+def print_statistics(statistics: Dict[str, int]):
+    for cache, key in [
+        ('Parse cache', 'parse_cache'),
+        ('Issuer name cache', 'issuer_name_cache'),
+        ('Public key cache', 'public_key_cache'),
+        ('Intermediate cache', 'intermediate_cache'),
+    ]:
+        hits = statistics.get(f"{key}_hits", 0)
+        misses = statistics.get(f"{key}_misses", 0)
+
+        if hits + misses == 0:
+            continue
+
+        print(
+            f"{cache}: {hits} hits, {misses} misses, {hits / (hits + misses) * 100:.2f}% hit rate"
+        )
+
+
+def print_errors(counts: Dict[Tuple[str, Optional[str], str], int]):
+    "Prints the number of errors by stage, extension and error class, the most frequent first"
+    for (stage, extension, error), count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"{count} certificates with {error} in {extension or stage}")
+
+
+def errors_frame(rows: List[Tuple[int, str, Optional[str], str]]) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=error_output_columns)
+
+
+def parse_certificates(df: pd.DataFrame, pool: Optional[Pool], chunk_size: int, progress: tqdm, statistics: Dict[str, int]) -> Dict[str, List[Any]]:
+    "Parses every certificate row into column buffers, either on the current core or spread over a pool of worker processes"
+
+    # split the dataframe into chunks, each chunk is parsed by one of the workers
+    chunks = [
+        df.iloc[start:start + chunk_size][['id', 'certificate_base64']]
+        for start in range(0, len(df), chunk_size)
+    ]
+
+    # imap returns the chunks in the order they were submitted, so the row order
+    # is preserved even though the chunks might finish out of order
+    mapped_chunks = map(map_certificate_chunk, chunks) if pool is None else \
+        pool.imap(map_certificate_chunk, chunks)
+
+    columns: Dict[str, List[Any]] = {
+        column: [] for column in parsed_columns
+    }
+
+    for chunk, (mapped_chunk, chunk_statistics, chunk_profile, chunk_errors, chunk_issuers) in zip(chunks, mapped_chunks):
+        for column, values in columns.items():
+            values += mapped_chunk[column]
+
+        # sum up the statistics, the profiles and the errors of all chunks and collect
+        # the issuers they mapped
+        for key, value in chunk_statistics.items():
+            statistics[key] = statistics.get(key, 0) + value
+
+        profile.merge(chunk_profile)
+        error_log.merge(chunk_errors)
+        issuers.update(chunk_issuers)
+
+        progress.update(len(chunk))
+
+    return columns
+
+
+def map_certificates(df: pd.DataFrame, pool: Optional[Pool], chunk_size: int, progress: tqdm, statistics: Dict[str, int], cache: Optional[ParseCache]) -> Dict[str, List[Any]]:
+    "Maps every certificate row into column buffers, certificates found in the parse cache are not parsed again"
+    if cache is None:
+        with profile.stage("parse", len(df)):
+            return parse_certificates(df, pool, chunk_size, progress, statistics)
+
+    hashes = df['hash'].tolist()
+    ids = df['id'].tolist()
+
+    with profile.stage("parse_cache", len(hashes)):
+        cached_rows = cache.lookup(hashes)
+
+    # positions of the rows that have to be parsed
+    missing = [i for i, hash in enumerate(hashes) if hash not in cached_rows]
+
+    statistics['parse_cache_hits'] = statistics.get('parse_cache_hits', 0) + \
+        len(hashes) - len(missing)
+    statistics['parse_cache_misses'] = statistics.get('parse_cache_misses', 0) + \
+        len(missing)
+    progress.update(len(hashes) - len(missing))
+
+    logged_errors = len(error_log.rows)
+
+    with profile.stage("parse", len(missing)):
+        parsed = parse_certificates(
+            df.iloc[missing], pool, chunk_size, progress, statistics
+        )
+
+    # the errors of the parsed rows by their id, without the id
+    parsed_errors: Dict[Any, List[Tuple[str, Optional[str], str]]] = {}
+    for id, stage, extension, error in error_log.rows[logged_errors:]:
+        parsed_errors.setdefault(id, []).append((stage, extension, error))
+
+    # persist the newly parsed rows, invalid certificates are stored as well
+    # such that they are not parsed over and over again. the issuers come first,
+    # every cached row refers to a cached issuer
+    with profile.stage("parse_cache", len(missing)):
+        cache.store_issuers({
+            id: issuers[id] for id in set(parsed['issuer_id']) if id is not None
+        })
+        cache.store([
+            (
+                hashes[position],
+                None if parsed['id'][i] is None else
+                tuple(parsed[column][i] for column in cached_columns)
+            )
+            for i, position in enumerate(missing)
+        ])
+        cache.store_errors({
+            hashes[position]: parsed_errors[ids[position]]
+            for position in missing if ids[position] in parsed_errors
+        })
+
+    if len(missing) == len(hashes):
+        return parsed
+
+    # the issuers of the cached rows might not have been seen in this run
+    issuer_position = cached_columns.index('issuer_id')
+
+    with profile.stage("parse_cache", len(cached_rows)):
+        issuers.update(cache.lookup_issuers([
+            row[issuer_position] for row in cached_rows.values()
+            if row is not None and row[issuer_position] not in issuers
+        ]))
+        cached_errors = cache.lookup_errors(list(cached_rows.keys()))
+
+    # merge the cached and the parsed rows while keeping the original row order
+    columns: Dict[str, List[Any]] = {
+        column: [None] * len(hashes) for column in parsed_columns
+    }
+
+    for position, hash in enumerate(hashes):
+        row = cached_rows.get(hash)
+
+        # the id of invalid rows stays None
+        if row is not None:
+            for column, value in zip(cached_columns, row):
+                columns[column][position] = value
+
+            columns['id'][position] = ids[position]
+
+    for column, values in columns.items():
+        for position, value in zip(missing, parsed[column]):
+            values[position] = value
+
+    # replay the errors of the cached rows with the ids of this run, the errors
+    # are logged in the order of the rows like in a run without the cache
+    errors: List[Tuple[Any, str, Optional[str], str]] = []
+
+    for position, hash in enumerate(hashes):
+        if hash in cached_rows:
+            replayed = [(ids[position], *error) for error in cached_errors.get(hash, [])]
+            error_log.count(replayed)
+            errors += replayed
+        else:
+            errors += [(ids[position], *error) for error in parsed_errors.pop(ids[position], [])]
+
+    error_log.rows[logged_errors:] = errors
+
+    return columns
+
+
+def map_chains(df: pd.DataFrame, columns: Dict[str, List[Any]], statistics: Dict[str, int]):
+    "Adds the fingerprints of the chain of every parsed certificate to the column buffers, see map_certificate_chain"
+    # the errors of the chains are added to the log of the main process directly
+    logged_errors = len(error_log.rows)
+
+    with profile.stage("chains", len(df)):
+        columns['chain_fingerprints'] = map_certificate_chains(
+            columns['id'], df['certificate_chain_base64'].tolist()
+        )
+
+    error_log.count(error_log.rows[logged_errors:])
+
+    # the chains are mapped in the main process, its cache is not part of the chunk statistics
+    hits, misses = intermediate_cache.collect_statistics()
+    statistics['intermediate_cache_hits'] = statistics.get('intermediate_cache_hits', 0) + hits
+    statistics['intermediate_cache_misses'] = statistics.get('intermediate_cache_misses', 0) + misses
+
+
+def write_intermediates(output: str, intermediates_output: str):
+    "Writes all certificates found in the chains, in the format of the output"
+    with profile.stage("write", len(intermediates)):
+        write_table(build_intermediates_table(intermediates), output, intermediates_output)
+
+
+def write_issuers(output: str, issuers_output: str):
+    "Writes the names of all issuers, in the format of the output"
+    with profile.stage("write", len(issuers)):
+        write_table(build_issuers_table(issuers), output, issuers_output)
+
+
+def write_table(table: pa.Table, output: str, table_output: str):
+    if output.endswith(".parquet"):
+        pq.write_table(table, table_output)
+    else:
+        table.to_pandas().to_csv(table_output, index=False)
+
+
+def valid_rows(columns: Dict[str, List[Any]]) -> np.ndarray:
+    "Returns a mask of the rows whose certificate could be parsed, the rows of all other certificates are empty"
+    return np.array([id is not None for id in columns['id']], dtype=bool)
+
+
+def extract_in_memory(input_files: List[str], output: str, single_valued_output: str, invalid_output: str, names_output: str, errors_output: str, intermediates_output: str, issuers_output: str, pool: Optional[Pool], chunk_size: int, statistics: Dict[str, int], cache: Optional[ParseCache]):
+    df = None
+
+    # read all input files, parse them and extract all useful data
+    for i, input_file in enumerate(input_files):
+        print(f"Reading compressed csv '{input_file}'")
+
+        with profile.stage("read_csv"), read_input_file(input_file) as df_in:
+            if i == 0:
+                df = df_in
+            else:
+                df = pd.concat([df, df_in], ignore_index=True)
+
+        profile.count("read_csv", len(df_in))
+
+    with profile.stage("prepare_input", len(df)):
+        df = prepare_input(df)
+
+    # reduce dataset for testing purposes
+    # df = df.head(100)
+
+    # extract the certificate data and show a loading bar as it might take a minute
+    with tqdm(total=len(df)) as progress:
+        columns = map_certificates(
+            df, pool, chunk_size, progress, statistics, cache
+        )
+
+    map_chains(df, columns, statistics)
+
+    # find all rows that are empty
+    is_valid = valid_rows(columns)
+
+    # invalid certificates and errors are always stored as csv, they are usually small.
+    # they are written right away, the input is not needed any longer afterwards
+    with profile.stage("write", int((~is_valid).sum())):
+        df[~is_valid][invalid_output_columns].to_csv(invalid_output, index=False)
+        errors_frame(error_log.collect()).to_csv(errors_output, index=False)
+
+    del df
+
+    with profile.stage("names", int(is_valid.sum())):
+        names = build_names_table(
+            to_arrow_table(columns, names_source_schema).filter(is_valid)
+        )
+
+    with profile.stage("expand", int(is_valid.sum())):
+        # build the dataframe from the valid rows only, the columns are kept as objects
+        # such that e.g. integer columns with missing values are not turned into floats.
+        # the columns are ordered like the schema, the chain columns are added last
+        df = pd.DataFrame(columns, columns=certificate_schema.names, dtype=object)[is_valid]\
+            .reset_index(drop=True)
+
+        # drop all columns where all entries are empty / None
+        df = df.dropna(axis=1, how='all')
+
+        # array of booleans indicating whether a column only contains a single value
+        is_single_value_col = single_value_cols(df)
+        # list of column names that are single-valued, will be populated in the loop below
+        single_valued_columns: List[str] = []
+        # create a dictionary mapping from column name to value for the columns that
+        # only contain a single value. will be populated in the loop below
+        single_valued: Dict[str, Any] = {}
+
+        # get any row to retrieve that one value
+        first_row = df.iloc[0]
+
+        # fill 'single_valued_columns' and 'single_valued' by iterating over the
+        # set of all column names and the is_single_value_col array
+        for single_value, column_name in zip(is_single_value_col, df.columns):
+            if single_value and column_name not in key_columns:
+                single_valued_columns.append(column_name)
+                single_valued[column_name] = first_row[column_name]
+
+        # drop all single-valued columns
+        df = df.drop(single_valued_columns, axis=1)
+
+    with profile.stage("write", len(df)):
+        # store all of the computed data on disk in the given format
+        if output.endswith(".parquet"):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            pq.write_table(
+                table.replace_schema_metadata({**table.schema.metadata, **flags_metadata()}),
+                output
+            )
+            pq.write_table(names, names_output)
+        elif output.endswith(".csv"):
+            df.to_csv(output, index=False)
+            names.to_pandas().to_csv(names_output, index=False)
+        else:
+            raise Exception(f"Unkown output format '{output}'")
+
+        # single valued output is always stored as csv, it is tiny
+        pd.DataFrame([single_valued]).to_csv(single_valued_output, index=False)
+
+    write_intermediates(output, intermediates_output)
+    write_issuers(output, issuers_output)
+
+
+def to_arrow_table(columns: Dict[str, List[Any]], schema: pa.Schema) -> pa.Table:
+    "Converts the column buffers of the parsed certificates into a table with the given schema"
+    return pa.Table.from_arrays(
+        [
+            pa.array(columns[field.name], type=field.type)
+            for field in schema
+        ],
+        schema=schema
+    )
+
+
+def update_column_statistics(table: pa.Table, non_empty_columns: set, single_valued: Dict[str, Any], multi_valued_columns: set):
+    "Updates the running column statistics with the parsed rows of one chunk"
+    if table.num_rows == 0:
+        return
+
+    for column in table.column_names:
+        values = table[column]
+
+        if values.null_count < len(values):
+            non_empty_columns.add(column)
+
+        # lists cannot be compared, so they are never single-valued
+        if column in multi_valued_columns or column_types[column] in ['list', 'binary_list']:
+            continue
+
+        if column in key_columns:
+            continue
+
+        # a column with missing values or with multiple values in this chunk cannot be single-valued
+        if values.null_count > 0 or pc.count_distinct(values).as_py() != 1:
+            multi_valued_columns.add(column)
+            continue
+
+        value = values[0].as_py()
+
+        if column not in single_valued:
+            single_valued[column] = value
+        elif single_valued[column] != value:
+            multi_valued_columns.add(column)
+
+
+def extract_chunk(df: pd.DataFrame, pool: Optional[Pool], chunk_size: int, progress: tqdm, statistics: Dict[str, int], cache: Optional[ParseCache]) -> Tuple[pa.Table, pd.DataFrame]:
+    "Extracts the certificates of one chunk of an input file, returns the parsed certificates and the invalid input rows"
+    with profile.stage("prepare_input", len(df)):
+        df = prepare_input(df)
+
+    columns = map_certificates(
+        df, pool, chunk_size, progress, statistics, cache
+    )
+
+    map_chains(df, columns, statistics)
+
+    # rows where the certificate could not be parsed are completely empty
+    is_valid = valid_rows(columns)
+
+    with profile.stage("expand", int(is_valid.sum())):
+        table = to_arrow_table(columns, certificate_schema)\
+            .filter(is_valid)
+
+    return table, df[~is_valid][invalid_output_columns]
+
+
+def extract_streaming(input_files: List[str], output: str, single_valued_output: str, invalid_output: str, names_output: str, errors_output: str, intermediates_output: str, issuers_output: str, pool: Optional[Pool], workers: int, chunk_size: int, statistics: Dict[str, int], cache: Optional[ParseCache]):
+    # the parsed chunks are first written with all possible columns, the empty and
+    # single-valued columns are only known at the very end and are dropped in a second
+    # pass over the row groups
+    partial_output = f"{output}.partial"
+    # the names of every chunk are sorted and written as a row group, the sorted row
+    # groups are merged at the end
+    partial_names_output = f"{names_output}.partial"
+
+    # running statistics replacing the full-frame passes of the in-memory extraction
+    non_empty_columns: set = set()
+    single_valued: Dict[str, Any] = {}
+    multi_valued_columns: set = set()
+
+    # the invalid certificates and the errors of every chunk are appended as they occur
+    pd.DataFrame(columns=invalid_output_columns).to_csv(invalid_output, index=False)
+    errors_frame([]).to_csv(errors_output, index=False)
+
+    # read enough rows at once such that every worker gets a chunk
+    read_chunk_size = chunk_size * max(workers, 1)
+
+    with pq.ParquetWriter(partial_output, certificate_schema) as writer, \
+            pq.ParquetWriter(partial_names_output, names_schema) as names_writer:
+        for input_file in input_files:
+            print(f"Streaming compressed csv '{input_file}'")
+
+            with read_input_file(input_file, read_chunk_size) as reader, tqdm(unit="certs") as progress:
+                for df in profile.iterate("read_csv", reader):
+                    table, invalid_certificates = extract_chunk(
+                        df, pool, chunk_size, progress, statistics, cache
+                    )
+
+                    with profile.stage("expand"):
+                        update_column_statistics(
+                            table, non_empty_columns, single_valued, multi_valued_columns
+                        )
+
+                    with profile.stage("write", table.num_rows):
+                        invalid_certificates.to_csv(
+                            invalid_output, mode='a', header=False, index=False
+                        )
+                        errors_frame(error_log.collect()).to_csv(
+                            errors_output, mode='a', header=False, index=False
+                        )
+
+                        writer.write_table(table)
+
+                    with profile.stage("names", table.num_rows):
+                        names_writer.write_table(build_names_table(table))
+
+    single_valued = {
+        column: value for column, value in single_valued.items()
+        if column not in multi_valued_columns
+    }
+
+    kept_columns = [
+        column for column in certificate_schema.names
+        if column in non_empty_columns and column not in single_valued
+    ]
+
+    # copy the kept columns row group by row group, this keeps the memory bounded
+    partial = pq.ParquetFile(partial_output)
+
+    kept_schema = pa.schema([
+        certificate_schema.field(column) for column in kept_columns
+    ], metadata=certificate_schema.metadata)
+
+    with profile.stage("write", partial.metadata.num_rows), \
+            pq.ParquetWriter(output, kept_schema) as writer:
+        for i in range(partial.num_row_groups):
+            writer.write_table(
+                partial.read_row_group(i, columns=kept_columns)
+            )
+
+    os.remove(partial_output)
+
+    with profile.stage("names"):
+        merge_sorted_runs([partial_names_output], names_output)
+
+    os.remove(partial_names_output)
+
+    pd.DataFrame([single_valued]).to_csv(single_valued_output, index=False)
+
+    write_intermediates(output, intermediates_output)
+    write_issuers(output, issuers_output)
+
+
+def write_dataset_names(output_dir: str, manifest: Dict[str, Any]):
+    "Merges the sorted names of all parts of a dataset into a single sorted table"
+    names_parts: List[str] = []
+
+    for entry in manifest['inputs'].values():
+        for i, part in enumerate(entry['parts']):
+            names_part = f"{output_dir}/{part_paths(entry, i)[2]}"
+
+            # parts written before the names were extracted don't have them yet
+            if not os.path.isfile(names_part):
+                pq.write_table(
+                    build_names_table(
+                        pq.read_table(f"{output_dir}/{part}", columns=names_source_schema.names)
+                    ),
+                    names_part
+                )
+
+            names_parts.append(names_part)
+
+    print(f"Merging the names of {len(names_parts)} parts")
+    merge_sorted_runs(names_parts, f"{output_dir}/{NAMES_FILENAME}")
+
+
+def write_dataset_intermediates(output_dir: str, manifest: Dict[str, Any]):
+    "Merges the intermediates of all parts of a dataset into a single table"
+    intermediates_parts = [
+        f"{output_dir}/{part_paths(entry, i)[4]}"
+        for entry in manifest['inputs'].values()
+        for i in range(len(entry['parts']))
+    ]
+
+    print(f"Merging the intermediates of {len(intermediates_parts)} parts")
+    merge_intermediates(
+        # parts written before the chains were extracted don't have them
+        [path for path in intermediates_parts if os.path.isfile(path)],
+        f"{output_dir}/{INTERMEDIATES_FILENAME}"
+    )
+
+
+def write_dataset_issuers(output_dir: str, manifest: Dict[str, Any]):
+    "Merges the issuers of all parts of a dataset into a single table"
+    issuers_parts = [
+        f"{output_dir}/{part_paths(entry, i)[5]}"
+        for entry in manifest['inputs'].values()
+        for i in range(len(entry['parts']))
+    ]
+
+    print(f"Merging the issuers of {len(issuers_parts)} parts")
+    merge_issuers(
+        [path for path in issuers_parts if os.path.isfile(path)],
+        f"{output_dir}/{ISSUERS_FILENAME}"
+    )
+
+
+def extract_partitioned(input_files: List[str], output_dir: str, pool: Optional[Pool], workers: int, chunk_size: int, statistics: Dict[str, int], cache: Optional[ParseCache]):
+    # every chunk of every input file is written as a separate part of the dataset and
+    # recorded in the manifest, this way an interrupted run can pick up from the last
+    # completed chunk and later runs only extract new or changed input files
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+
+    # whether any parts were added or removed, the names are only merged again if so
+    changed = False
+
+    if manifest['version'] != extraction_version:
+        if len(manifest['inputs']) > 0:
+            print(
+                "Dataset was written by a different extraction version, re-extracting all inputs"
+            )
+
+        for entry in manifest['inputs'].values():
+            remove_parts(output_dir, entry)
+            changed = True
+
+        manifest = {'version': extraction_version, 'inputs': {}}
+        save_manifest(output_dir, manifest)
+
+    # every part consists of `chunk_size` input rows, independent of the number of
+    # workers. the rows of a part are spread over the workers in smaller chunks, this
+    # way a run with a different number of workers resumes / skips the same parts
+    worker_chunk_size = -(-chunk_size // max(workers, 1))
+
+    for input_file in input_files:
+        path = os.path.abspath(input_file)
+        entry = manifest['inputs'].get(path)
+
+        if entry is not None and (
+            entry['chunk_size'] != chunk_size or
+            not is_input_unchanged(entry, path)
+        ):
+            print(f"Input '{input_file}' changed, extracting it again")
+            remove_parts(output_dir, entry)
+            entry = None
+            changed = True
+
+        if entry is not None and entry['complete']:
+            print(f"Skipping already extracted input '{input_file}'")
+            # the check above might have updated the modification time, save it such
+            # that the checksum is not computed again by every run
+            save_manifest(output_dir, manifest)
+            continue
+
+        if entry is None:
+            entry = create_manifest_entry(path, chunk_size)
+            manifest['inputs'][path] = entry
+            save_manifest(output_dir, manifest)
+
+        os.makedirs(f"{output_dir}/{entry['key']}", exist_ok=True)
+        remove_temporary_parts(output_dir, entry)
+        completed_parts = len(entry['parts'])
+
+        if completed_parts > 0:
+            print(
+                f"Resuming compressed csv '{input_file}' after {completed_parts} completed chunks"
+            )
+        else:
+            print(f"Streaming compressed csv '{input_file}'")
+
+        with read_input_file(input_file, chunk_size) as reader, tqdm(unit="certs") as progress:
+            for i, df in enumerate(profile.iterate("read_csv", reader)):
+                # the chunk was already extracted by a previous run
+                if i < completed_parts:
+                    progress.update(len(df))
+                    continue
+
+                table, invalid_certificates = extract_chunk(
+                    df, pool, worker_chunk_size, progress, statistics, cache
+                )
+
+                part, invalid_part, names_part, errors_part, intermediates_part, issuers_part = part_paths(entry, i)
+                errors = error_log.collect()
+
+                # write to a temporary file and rename it afterwards, a part that exists
+                # is always complete. the names and the dimension tables are written first,
+                # see write_dataset_names
+                with profile.stage("names", table.num_rows):
+                    pq.write_table(build_names_table(table), f"{output_dir}/{names_part}")
+
+                with profile.stage("write", table.num_rows):
+                    # every part lists all certificates of its chains and all of its issuers,
+                    # they are merged into a single table each at the end
+                    pq.write_table(
+                        build_intermediates_table(intermediates, referenced_fingerprints(table)),
+                        f"{output_dir}/{intermediates_part}"
+                    )
+                    pq.write_table(
+                        build_issuers_table(issuers, referenced_issuers(table)),
+                        f"{output_dir}/{issuers_part}"
+                    )
+
+                with profile.stage("write", table.num_rows):
+                    pq.write_table(table, f"{output_dir}/{temporary_path(part)}")
+                    os.replace(f"{output_dir}/{temporary_path(part)}", f"{output_dir}/{part}")
+
+                    if len(invalid_certificates) > 0:
+                        invalid_certificates.to_csv(
+                            f"{output_dir}/{invalid_part}", index=False
+                        )
+
+                    if len(errors) > 0:
+                        errors_frame(errors).to_csv(
+                            f"{output_dir}/{errors_part}", index=False
+                        )
+
+                entry['parts'].append(part)
+                save_manifest(output_dir, manifest)
+                changed = True
+
+        entry['complete'] = True
+        save_manifest(output_dir, manifest)
+
+    extracted_paths = set(os.path.abspath(f) for f in input_files)
+    for path in manifest['inputs'].keys():
+        if path not in extracted_paths:
+            print(
+                f"Keeping parts of '{path}' which is not part of the current input"
+            )
+
+    if changed or not os.path.isfile(f"{output_dir}/{NAMES_FILENAME}"):
+        with profile.stage("names"):
+            write_dataset_names(output_dir, manifest)
+
+    if changed or not os.path.isfile(f"{output_dir}/{INTERMEDIATES_FILENAME}"):
+        with profile.stage("write"):
+            write_dataset_intermediates(output_dir, manifest)
+
+    if changed or not os.path.isfile(f"{output_dir}/{ISSUERS_FILENAME}"):
+        with profile.stage("write"):
+            write_dataset_issuers(output_dir, manifest)
+
+
 @click.command()
 # positional arguments
 # the input path, can either be a directory or a single file
 @click.argument('input', type=click.Path(exists=True))
 @click.argument('output')
-def main(input: str, output: str):
+# flags / options
+# the number of processes used to parse the certificates
+@click.option('--workers', type=int, default=1)
+# the number of certificates handed to a worker at once
+@click.option('--chunk-size', type=int, default=10000)
+# read and write the data in chunks instead of keeping everything in memory
+@click.option('--stream', is_flag=True, default=False)
+# the number of decoded issuer names kept in memory by each process
+@click.option('--issuer-cache-size', type=int, default=4096)
+# the number of mapped public keys kept in memory by each process
+@click.option('--public-key-cache-size', type=int, default=16384)
+# an sqlite file persisting the parsed certificates by their hash across runs
+@click.option('--cache', 'cache_path', type=click.Path(dir_okay=False), default=None)
+# write the time, the CPU time, the items and the peak memory of every stage as a json report
+@click.option('--profile', 'profiling', is_flag=True, default=False)
+def main(input: str, output: str, workers: int, chunk_size: int, stream: bool, issuer_cache_size: int, public_key_cache_size: int, cache_path: Optional[str], profiling: bool):
+    start = time.perf_counter()
+
     if output.endswith('.parquet'):
         extension = '.parquet'
     elif output.endswith(".csv"):
         extension = ".csv"
+    elif os.path.splitext(output)[1] == "" or os.path.isdir(output):
+        # without an extension the output is a partitioned dataset directory
+        extension = None
     else:
         raise Exception(f"Unkown output format '{output}'")
 
+    if stream and extension != '.parquet':
+        raise Exception(f"Streaming extraction requires a .parquet output")
+
     # first validate the arguments
     input_files = []
     # check if the input is a single file or a directory
@@ -72,116 +859,94 @@ def main(input: str, output: str):
             f"Did not find any valid input files given the path '{input}'"
         )
 
-    df = None
-
-    # read all input files, parse them and extract all useful data
-    for i, input_file in enumerate(input_files):
-        print(f"Reading compressed csv '{input_file}'")
-        df_in = pd.read_csv(
-            input_file,
-            # inputs do not contain any headers
-            header=None,
-            # name columns manually
-            names=[
-                'log_url',
-                'id',
-                'hash',
-                'certificate_base64',
-                'certificate_chain_base64',
-                'domains',
-                'ts1',
-                'ts2'
-            ],
-            # files are gzipped
-            compression='gzip'
+    # derive output paths for the single-valued entries and the invalid certificate
+    # by appending a suffix to the filename
+    if extension is not None:
+        single_valued_output = derive_output(
+            output,
+            "single-valued",
+            extension,
+            ".csv"
+        )
+        invalid_output = derive_output(
+            output,
+            "invalid",
+            extension,
+            ".csv"
+        )
+        # the (id, name_type, name) rows of all certificates, see names.py
+        names_output = derive_output(
+            output,
+            "names",
+            extension,
+            extension
+        )
+        # the errors of the certificates that could not be mapped, see ErrorLog
+        errors_output = derive_output(
+            output,
+            "errors",
+            extension,
+            ".csv"
+        )
+        # the distinct certificates of all chains, see intermediates.py
+        intermediates_output = derive_output(
+            output,
+            "intermediates",
+            extension,
+            extension
+        )
+        # the names of all issuers, see issuers.py
+        issuers_output = derive_output(
+            output,
+            "issuers",
+            extension,
+            extension
         )
 
-        if i == 0:
-            df = df_in
-        else:
-            df = pd.concat([df, df_in], ignore_index=True)
-
-    # reduce dataframe to required columns, https://stackoverflow.com/a/45846315/2897827
-    df = df.drop(
-        df.columns.difference(
-            ['id', 'certificate_base64', 'certificate_chain_base64']
-        ),
-        axis=1
-    )
-    # convert certificate chain to list column
-    df['certificate_chain_base64'] = df['certificate_chain_base64'].apply(
-        lambda chain: chain.split(";")
-    )
-
-    # store copy of original df with whole certificates
-    cert_df = df
-
-    # reduce dataset for testing purposes
-    # df = df.head(100)
-
-    # extract the certificate data and show a loading bar as it might take a minute
-    df: pd.DataFrame = df.progress_apply(
-        map_certificate_row,
-        axis=1,
-        result_type='expand'
-    )
-
-    # drop all columns where all entries are empty / None
-    df = df.dropna(axis=1, how='all')
+    initialize_worker(issuer_cache_size, public_key_cache_size, profiling)
+    pool = Pool(
+        workers,
+        initializer=initialize_worker,
+        initargs=(issuer_cache_size, public_key_cache_size, profiling)
+    ) if workers > 1 else None
 
-    # find all rows that are empty
-    empty_row_indices = df.index[df.isna().all(axis=1)].tolist()
-    invalid_certificates = cert_df.iloc[empty_row_indices]
-    # drop all of the empty rows
-    df = df.drop(index=empty_row_indices)
-
-    # array of booleans indicating whether a column only contains a single value
-    is_single_value_col = single_value_cols(df)
-    # list of column names that are single-valued, will be populated in the loop below
-    single_valued_columns: List[str] = []
-    # create a dictionary mapping from column name to value for the columns that
-    # only contain a single value. will be populated in the loop below
-    single_valued: Dict[str, Any] = {}
+    cache = ParseCache(
+        cache_path, extraction_version, cached_columns
+    ) if cache_path is not None else None
 
-    # get any row to retrieve that one value
-    first_row = df.iloc[0]
+    # counters collected while parsing, e.g. the cache hits and misses
+    statistics: Dict[str, int] = {}
 
-    # fill 'single_valued_columns' and 'single_valued' by iterating over the
-    # set of all column names and the is_single_value_col array
-    for single_value, column_name in zip(is_single_value_col, df.columns):
-        if single_value:
-            single_valued_columns.append(column_name)
-            single_valued[column_name] = first_row[column_name]
+    try:
+        if extension is None:
+            extract_partitioned(
+                input_files, output, pool, workers, chunk_size, statistics, cache
+            )
+        elif stream:
+            extract_streaming(
+                input_files, output, single_valued_output, invalid_output, names_output, errors_output, intermediates_output, issuers_output, pool, workers, chunk_size, statistics, cache
+            )
+        else:
+            extract_in_memory(
+                input_files, output, single_valued_output, invalid_output, names_output, errors_output, intermediates_output, issuers_output, pool, chunk_size, statistics, cache
+            )
+    finally:
+        if pool is not None:
+            pool.close()
 
-    # drop all single-valued columns
-    df = df.drop(single_valued_columns, axis=1)
+        if cache is not None:
+            cache.close()
 
-    # derive output paths for the single-valued entries and the invalid certificate
-    # by appending a suffix to the filename
-    single_valued_output = derive_output(
-        output,
-        "single-valued",
-        extension,
-        ".csv"
-    )
-    invalid_output = derive_output(
-        output,
-        "invalid",
-        extension,
-        ".csv"
-    )
+    print_statistics(statistics)
+    print_errors(error_log.counts)
 
-    # store all of the computed data on disk in the given format
-    if output.endswith(".parquet"):
-        df.to_parquet(output, index=False)
-    elif output.endswith(".csv"):
-        df.to_csv(output, index=False)
-    else:
-        raise Exception(f"Unkown output format '{output}'")
+    if profiling:
+        # the report of a dataset is ignored when reading it, like the manifest
+        profile_output = f"{output}/_profile.json" if extension is None else \
+            derive_output(output, "profile", extension, ".json")
 
-    # single valued output and invalid certificates are always stored as csv, they are usually small
-    pd.DataFrame([single_valued]).to_csv(single_valued_output, index=False)
-    invalid_certificates.to_csv(invalid_output, index=False)
+        profile.write(profile_output, time.perf_counter() - start, statistics)
+        print(f"Wrote the profile to '{profile_output}'")
 
 
 if __name__ == '__main__':
@@ -1,8 +1,28 @@
 import pandas as pd
+import cryptography
 from cryptography import x509
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, dsa, ed25519, ed448
+from cryptography.exceptions import UnsupportedAlgorithm
+from collections import OrderedDict
+import base64
+import hashlib
+import ipaddress
+import json
 import time
 import datetime
-from typing import Tuple, List, Any
+from typing import Tuple, List, Dict, Any, Callable, Optional
+
+# custom imports
+from profiling import Profile
+
+
+# identifies the version of the extraction, rows persisted by a different version are
+# stale. it changes whenever this file or the version of the cryptography library changes
+with open(__file__, 'rb') as f:
+    extraction_version = hashlib.sha256(
+        f.read() + cryptography.__version__.encode()
+    ).hexdigest()
 
 
 def is_valid_input_file(filename: str):
@@ -18,6 +38,159 @@ def is_valid_input_file(filename: str):
     return True
 
 
+def load_pem_certificate(certificate_base64: str) -> x509.Certificate:
+    pem_cert = "" + \
+        "-----BEGIN CERTIFICATE-----\n" +\
+        certificate_base64 +\
+        "\n-----END CERTIFICATE-----"
+    # parse PEM certificate format
+    return x509.load_pem_x509_certificate(
+        # decode ascii string to bytes
+        pem_cert.encode("ascii")
+    )
+
+
+def load_certificate(certificate_base64: str) -> Tuple[x509.Certificate, bytes]:
+    "Loads a base64 encoded certificate and returns it together with its DER encoding"
+    try:
+        # decode the base64 string directly to the DER bytes, this skips wrapping the
+        # certificate into PEM armor just for the library to strip it again. characters
+        # that are not base64 are rejected instead of dropped, like the PEM parser does
+        der = base64.b64decode(certificate_base64, validate=True)
+        return x509.load_der_x509_certificate(der), der
+    except ValueError:
+        # fall back to the PEM parser, it is more lenient with e.g. line breaks
+        # (binascii.Error is a subclass of ValueError)
+        cert = load_pem_certificate(certificate_base64)
+        return cert, cert.public_bytes(Encoding.DER)
+
+
+class BoundedCache:
+    "A least recently used cache holding at most `size` entries that counts its hits and misses"
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Any]:
+        value = self.entries.get(key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+
+        if len(self.entries) > self.size:
+            # evict the least recently used entry
+            self.entries.popitem(last=False)
+
+    def resize(self, size: int):
+        self.size = size
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def collect_statistics(self) -> Tuple[int, int]:
+        "Returns the hits and misses since the last call and resets them"
+        statistics = (self.hits, self.misses)
+        self.hits = 0
+        self.misses = 0
+        return statistics
+
+
+class ErrorLog:
+    """
+    Collects the errors of the certificates that could not be mapped, completely or just
+    one of their extensions, as rows of (id, stage, extension, error class). The rows of
+    every chunk are collected in the process mapping it and merged into the log of the
+    main process, which counts them by error type.
+    """
+
+    def __init__(self):
+        self.rows: List[Tuple[int, str, Optional[str], str]] = []
+        self.counts: Dict[Tuple[str, Optional[str], str], int] = {}
+
+    def add(self, id: int, stage: str, extension: Optional[str], error: Exception):
+        self.rows.append((id, stage, extension, type(error).__name__))
+
+    def merge(self, rows: List[Tuple[int, str, Optional[str], str]]):
+        "Adds the rows collected by the process that mapped a chunk and counts them"
+        self.rows += rows
+        self.count(rows)
+
+    def count(self, rows: List[Tuple[int, str, Optional[str], str]]):
+        "Counts the rows by stage, extension and error class"
+        for _, stage, extension, error in rows:
+            key = (stage, extension, error)
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def collect(self) -> List[Tuple[int, str, Optional[str], str]]:
+        "Returns the rows since the last call and resets them, the counts are kept"
+        rows = self.rows
+        self.rows = []
+        return rows
+
+
+def read_der_element(der: bytes, offset: int) -> Tuple[int, int]:
+    "Returns the offsets where the content and the whole DER element starting at `offset` end"
+    length = der[offset + 1]
+    content = offset + 2
+
+    # long form, the lower bits contain the number of length bytes
+    # (https://learn.microsoft.com/en-us/windows/win32/seccertenroll/about-encoded-length-and-value-bytes)
+    if length & 0x80:
+        length_bytes = length & 0x7f
+        length = int.from_bytes(der[content:content + length_bytes], 'big')
+        content += length_bytes
+
+    return content, content + length
+
+
+def certificate_issuer_offset(der: bytes) -> int:
+    "Returns the offset of the issuer name within a DER encoded certificate"
+    # Certificate ::= SEQUENCE { tbsCertificate, signatureAlgorithm, signatureValue }
+    offset, _ = read_der_element(der, 0)
+    # TBSCertificate ::= SEQUENCE { [0] version OPTIONAL, serialNumber, signature, issuer, ... }
+    # (https://www.rfc-editor.org/rfc/rfc5280#section-4.1)
+    offset, _ = read_der_element(der, offset)
+
+    # skip the optional explicitly tagged version
+    if der[offset] == 0xa0:
+        offset = read_der_element(der, offset)[1]
+
+    # skip the serial number and the signature algorithm
+    offset = read_der_element(der, offset)[1]
+    offset = read_der_element(der, offset)[1]
+
+    return offset
+
+
+def certificate_issuer_der(der: bytes) -> bytes:
+    "Extracts the DER encoded issuer name from a DER encoded certificate without decoding it"
+    offset = certificate_issuer_offset(der)
+
+    return der[offset:read_der_element(der, offset)[1]]
+
+
+def certificate_public_key_der(der: bytes) -> bytes:
+    "Extracts the DER encoded SubjectPublicKeyInfo from a DER encoded certificate without decoding it"
+    offset = certificate_issuer_offset(der)
+
+    # TBSCertificate ::= SEQUENCE { ..., issuer, validity, subject, subjectPublicKeyInfo, ... }
+    for _ in range(3):
+        offset = read_der_element(der, offset)[1]
+
+    return der[offset:read_der_element(der, offset)[1]]
+
+
 def map_certificate_version(cert: x509.Certificate):
     try:
         if cert.version == x509.Version.v1:
@@ -43,13 +216,24 @@ names_object_identifier_names = [
 ]
 
 
+# maps the object identifier of each name attribute to its position in names_object_identifier_names
+name_attribute_indices: Dict[x509.ObjectIdentifier, int] = {
+    getattr(x509.NameOID, n): i for i, n in enumerate(names_object_identifier_names)
+}
+
+
 def map_certificate_name(name: x509.Name):
 
-    # then extract all name attribures from the x509.Name
-    name_attributes = [
-        name.get_attributes_for_oid(getattr(x509.NameOID, n))
-        for n in names_object_identifier_names
-    ]
+    # then extract all name attribures from the x509.Name, the attributes of all
+    # relative distinguished names are visited once and sorted into their slot
+    name_attributes: List[Any] = [[] for _ in names_object_identifier_names]
+
+    for attribute in name:
+        index = name_attribute_indices.get(attribute.oid)
+
+        # attributes without a name in x509.NameOID are not extracted
+        if index is not None:
+            name_attributes[index].append(attribute)
 
     # check if for one of the object identifiers there are multiple values
     # there a are some for organizational unit.. ignore them?
@@ -71,6 +255,93 @@ def map_certificate_name(name: x509.Name):
     return name_attributes
 
 
+# the ids of the issuers whose names were mapped by their DER encoding. a few hundred
+# issuers account for almost all certificates in the CT logs, so most lookups are hits
+issuer_name_cache = BoundedCache(4096)
+
+# the issuer names mapped by this process since the last call of collect_issuers, by
+# issuer id. they are returned with every chunk and become the rows of the issuers table
+mapped_issuers: Dict[int, List[Any]] = {}
+
+# the issuer names of all certificates by issuer id, the rows of the issuers table. they
+# are collected in the main process from the issuers returned with every chunk
+issuers: Dict[int, List[Any]] = {}
+
+# the mapped public keys by their DER encoded SubjectPublicKeyInfo. renewed certificates
+# often keep their key, loading it is one of the more expensive steps of the mapping
+public_key_cache = BoundedCache(16384)
+
+# the time spent in the stages of the mapping, only recorded if enabled (`--profile`)
+profile = Profile()
+
+# the errors of the certificates that could not be mapped
+error_log = ErrorLog()
+
+
+def issuer_id(issuer_der: bytes) -> int:
+    "Derives the id of an issuer from its DER encoded name, the id is the same in every process and run"
+    # the first 64 bits of the hash, as a signed integer such that it fits an int64 column
+    return int.from_bytes(hashlib.sha256(issuer_der).digest()[:8], 'big', signed=True)
+
+
+def map_certificate_issuer(cert: x509.Certificate, der: bytes) -> int:
+    "Returns the id of the issuer of a certificate, its names are only mapped the first time it is seen"
+    key = certificate_issuer_der(der)
+    id = issuer_name_cache.get(key)
+
+    if id is None:
+        id = issuer_id(key)
+        mapped_issuers[id] = map_certificate_name(cert.issuer)
+        issuer_name_cache.put(key, id)
+
+    return id
+
+
+def collect_issuers() -> Dict[int, List[Any]]:
+    "Returns the issuers mapped since the last call and resets them"
+    global mapped_issuers
+
+    collected = mapped_issuers
+    mapped_issuers = {}
+    return collected
+
+
+# the columns of the public key in the order map_public_key returns their values
+public_key_columns = ['public_key_type', 'public_key_size', 'public_key_curve']
+
+
+def map_public_key(key: Any) -> Tuple[str, Optional[int], Optional[str]]:
+    "Maps a public key to its type, its size in bits and its curve (EC keys only)"
+    if isinstance(key, rsa.RSAPublicKey):
+        return ("RSA", key.key_size, None)
+    elif isinstance(key, ec.EllipticCurvePublicKey):
+        return ("EC", key.key_size, key.curve.name)
+    elif isinstance(key, ed25519.Ed25519PublicKey):
+        return ("Ed25519", 256, None)
+    elif isinstance(key, ed448.Ed448PublicKey):
+        return ("Ed448", 456, None)
+    elif isinstance(key, dsa.DSAPublicKey):
+        return ("DSA", key.key_size, None)
+    else:
+        return ("unknown", None, None)
+
+
+def map_certificate_public_key(cert: x509.Certificate, der: bytes) -> Tuple[str, Optional[int], Optional[str]]:
+    key = certificate_public_key_der(der)
+    values = public_key_cache.get(key)
+
+    if values is None:
+        try:
+            values = map_public_key(cert.public_key())
+        except UnsupportedAlgorithm:
+            # e.g. GOST keys, the library can't load them
+            values = ("unknown", None, None)
+
+        public_key_cache.put(key, values)
+
+    return values
+
+
 # get all signature algorithm object identifier names
 signature_algorithm_object_identifier_names = [
     a for a in dir(x509.SignatureAlgorithmOID)
@@ -101,6 +372,39 @@ extended_key_usage_object_identifier_names = [
     isinstance(getattr(x509.ExtendedKeyUsageOID, a), x509.ObjectIdentifier)
 ]
 
+# the names of the bits of the key usage bitmask, in the order of RFC 5280, 4.2.1.3
+key_usage_flags = [
+    'DIGITAL_SIGNATURE',
+    'CONTENT_COMMITMENT',
+    'KEY_ENCIPHERMENT',
+    'DATA_ENCIPHERMENT',
+    'KEY_AGREEMENT',
+    'KEY_CERT_SIGN',
+    'CRL_SIGN',
+    'ENCIPHER_ONLY',
+    'DECIPHER_ONLY',
+]
+
+# the names of the bits of the extended key usage bitmask
+extended_key_usage_flags = extended_key_usage_object_identifier_names
+
+# maps the bitmask columns to the names of their bits, the names are stored in the
+# metadata of the output (see flags_metadata) since the extended key usages depend on
+# the version of the cryptography library
+flag_columns: Dict[str, List[str]] = {
+    'EXTENSION_KEY_USAGE': key_usage_flags,
+    'EXTENSION_EXTENDED_KEY_USAGE': extended_key_usage_flags,
+}
+
+# the key of the names of the bits in the metadata of the output schema
+FLAGS_METADATA_KEY = b'flags'
+
+
+def flags_metadata() -> Dict[bytes, bytes]:
+    "Returns the schema metadata mapping the bitmask columns to the names of their bits"
+    return {FLAGS_METADATA_KEY: json.dumps(flag_columns).encode()}
+
+
 # obtained from the firefox source code
 # https://hg.mozilla.org/mozilla-central/file/tip/security/certverifier/ExtendedValidation.cpp
 # JSON.stringify([...document.querySelectorAll("span.s")].map(el => el.textContent.slice(1,-1)).filter(txt => (/^([0-9]*\.)+[0-9]*$/).test(txt)))
@@ -111,387 +415,665 @@ ev_identifiers = set([
 ])
 
 
-def map_certificate_extension(name: str, extensions: x509.Extensions, oid: x509.ObjectIdentifier) -> List[Tuple[str, Any]]:
-    try:
-        extension = extensions.get_extension_for_oid(oid).value
-        if isinstance(extension, x509.BasicConstraints):
-          # Basic constraints is an X.509 extension type that defines whether a
-          # given certificate is allowed to sign additional certificates and
-          # what path length restrictions may exist.
-          # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.BasicConstraints)
-            return [
-                (name + "_CA", extension.ca),
-                (name + "_PATH_LENGTH", extension.path_length),
-            ]
-        elif isinstance(extension, x509.KeyUsage):
-          # The key usage extension defines the purpose of the key contained in
-          # the certificate. The usage restriction might be employed when a key
-          # that could be used for more than one operation is to be restricted.
-          # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.KeyUsage)
-            return [
-                (name + "_DIGITAL_SIGNATURE", extension.digital_signature),
-                (name + "_CONTENT_COMMITMENT", extension.content_commitment),
-                (name + "_KEY_ENCIPHERMENT", extension.key_encipherment),
-                (name + "_DATA_ENCIPHERMENT", extension.data_encipherment),
-                (name + "_KEY_AGREEMENT", extension.key_agreement),
-                (name + "_KEY_CERT_SIGN", extension.key_cert_sign),
-                (name + "_CRL_SIGN", extension.crl_sign),
-                # encipher_only is undefined unless key_agreement is true
-                (
-                    name + "_ENCIPHER_ONLY",
-                    extension.encipher_only if extension.key_agreement else False
-                ),
-                # decipher_only is undefined unless key_agreement is true
-                (
-                    name + "_DECIPHER_ONLY",
-                    extension.decipher_only if extension.key_agreement else False
-                ),
-            ]
-        elif isinstance(extension, x509.SubjectAlternativeName) or isinstance(extension, x509.IssuerAlternativeName):
-            # Subject alternative name is an X.509 extension that provides a list
-            # of general name instances that provide a set of identities for which
-            # the certificate is valid. The object is iterable to get every
-            # element.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.SubjectAlternativeName)
-
-            # stringify all the names to make the data format consistent
-            return [(name, [str(n) for n in extension.get_values_for_type(x509.GeneralName)])]
-        elif isinstance(extension, x509.IssuerAlternativeName):
-            # Issuer alternative name is an X.509 extension that provides a list of
-            # general name instances that provide a set of identities for the
-            # certificate issuer. The object is iterable to get every element.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.IssuerAlternativeName)
-
-            # stringify all the names to make the data format consistent
-            return [(name, [str(n) for n in extension.get_values_for_type(x509.GeneralName)])]
-        elif isinstance(extension, x509.SubjectKeyIdentifier):
-            # The subject key identifier extension provides a means of
-            # identifying certificates that contain a particular public key.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.SubjectKeyIdentifier)
-
-            # just a byte value encoding the key -> no interesting for us
-            return []
-        elif isinstance(extension, x509.NameConstraints):
-            # The name constraints extension, which only has meaning in a CA
-            # certificate, defines a name space within which all subject names
-            # in certificates issued beneath the CA certificate must (or must
-            # not) be in. For specific details on the way this extension should
-            # be processed see RFC 5280.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.NameConstraints)
-
-            # restricts how a CA certificate can be used -> not interesting for us
-            return []
-        elif isinstance(extension, x509.CRLDistributionPoints):
-            # The CRL distribution points extension identifies how CRL information
-            # is obtained. It is an iterable, containing one or more
-            # DistributionPoint instances.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.CRLDistributionPoints)
-
-            # the actual distribution points are not interesting to us but count might be
-            return [(name + "_COUNT", len(extension._distribution_points))]
-        elif isinstance(extension, x509.CertificatePolicies):
-            # The certificate policies extension is an iterable, containing one or
-            # more PolicyInformation instances.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.CertificatePolicies)
-
-            # check if the certificate is EV
-            is_ca_enabled = False
-            for policy in extension._policies:
-                # print(policy.policy_qualifiers)
-                if policy.policy_identifier in ev_identifiers:
-                    is_ca_enabled = True
-                    break
-                    # print("found ca certificate")
-                    # exit()
-
-            # most policies are not of interest but maybe the count is
-            return [
-                (name + "_COUNT", len(extension._policies)),
-                (name + "_EV", is_ca_enabled),
-            ]
-        elif isinstance(extension, x509.AuthorityKeyIdentifier):
-            # The authority key identifier extension provides a means of
-            # identifying the public key corresponding to the private key used
-            # to sign a certificate. This extension is typically used to assist
-            # in determining the appropriate certificate chain. For more
-            # information about generation and use of this extension see RFC
-            # 5280 section 4.2.1.1.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.AuthorityKeyIdentifier)
-
-            # again a key identifier -> not interesting to us
-            return []
-        elif isinstance(extension, x509.ExtendedKeyUsage):
-            # This extension indicates one or more purposes for which the
-            # certified public key may be used, in addition to or in place of the
-            # basic purposes indicated in the key usage extension. The object is
-            # iterable to obtain the list of ExtendedKeyUsageOID OIDs present.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.ExtendedKeyUsage)
-
-            # for each possible extended key usage return a true / false flag
-            return [
-                (name + "_" + oid, getattr(x509.ExtendedKeyUsageOID, oid)
-                 in extension._usages)
-                for oid in extended_key_usage_object_identifier_names
-            ]
-        elif isinstance(extension, x509.AuthorityInformationAccess):
-            # The authority information access extension indicates how to access
-            # information and services for the issuer of the certificate in
-            # which the extension appears. Information and services may include
-            # online validation services (such as OCSP) and issuer data. It is
-            # an iterable, containing one or more AccessDescription instances.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.AuthorityInformationAccess)
-
-            # the values are not interesting and probably neither their existence
-            return []
-            # return [
-            #     (name + "_OSCP", x509.AuthorityInformationAccessOID.OCSP in extension._descriptions),
-            #     (name + "_CA_ISSUERS",
-            #      x509.AuthorityInformationAccessOID.CA_ISSUERS in extension._descriptions),
-            # ]
-        elif isinstance(extension, x509.SubjectInformationAccess):
-            # The subject information access extension indicates how to access
-            # information and services for the subject of the certificate in
-            # which the extension appears. When the subject is a CA, information
-            # and services may include certificate validation services and CA
-            # policy data. When the subject is an end entity, the information
-            # describes the type of services offered and how to access them. It
-            # is an iterable, containing one or more AccessDescription
-            # instances.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.SubjectInformationAccess)
-
-            # according to https://cryptography.io/en/latest/x509/reference/#cryptography.x509.AccessDescription
-            # this can only contain one possible value, it's value is certainly not interesting and probably neither
-            # it's existence
-            return []
-        elif isinstance(extension, x509.InhibitAnyPolicy):
-            # The inhibit anyPolicy extension indicates that the special OID
-            # ANY_POLICY, is not considered an explicit match for other
-            # CertificatePolicies except when it appears in an intermediate
-            # self-issued CA certificate. The value indicates the number of
-            # additional non-self-issued certificates that may appear in the path
-            # before ANY_POLICY is no longer permitted. For example, a value of
-            # one indicates that ANY_POLICY may be processed in certificates
-            # issued by the subject of this certificate, but not in additional
-            # certificates in the path.
-
-            # maybe interesting?
-            return [(name, extension.skip_certs)]
-        elif isinstance(extension, x509.OCSPNoCheck):
-            # This presence of this extension indicates that an OCSP client can
-            # trust a responder for the lifetime of the responder’s certificate.
-            # CAs issuing such a certificate should realize that a compromise of
-            # the responder’s key is as serious as the compromise of a CA key
-            # used to sign CRLs, at least for the validity period of this
-            # certificate. CA’s may choose to issue this type of certificate
-            # with a very short lifetime and renew it frequently. This extension
-            # is only relevant when the certificate is an authorized OCSP
-            # responder.
-
-            # most certainly interesting!
-            return [(name, True)]
-        elif isinstance(extension, x509.TLSFeature):
-            # The TLS Feature extension is defined in RFC 7633 and is used in
-            # certificates for OCSP Must-Staple. The object is iterable to get
-            # every element.
-
-            # existence might be interesting to check how many use stapling
-            # https://www.rfc-editor.org/rfc/rfc7633
-            return [
-                (name, True),
+def map_basic_constraints(name: str, extension: x509.BasicConstraints) -> List[Tuple[str, Any]]:
+    # Basic constraints is an X.509 extension type that defines whether a
+    # given certificate is allowed to sign additional certificates and
+    # what path length restrictions may exist.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.BasicConstraints)
+    return [
+        (name + "_CA", extension.ca),
+        (name + "_PATH_LENGTH", extension.path_length),
+    ]
+
+
+def flags_to_bitmask(flags: List[bool]) -> int:
+    "Packs a list of flags into an integer, the first flag is the lowest bit"
+    bitmask = 0
+
+    for bit, flag in enumerate(flags):
+        if flag:
+            bitmask |= 1 << bit
+
+    return bitmask
+
+
+def map_key_usage(name: str, extension: x509.KeyUsage) -> List[Tuple[str, Any]]:
+    # The key usage extension defines the purpose of the key contained in
+    # the certificate. The usage restriction might be employed when a key
+    # that could be used for more than one operation is to be restricted.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.KeyUsage)
+
+    # the flags are packed into a bitmask, in the order of `key_usage_flags`
+    return [
+        (name, flags_to_bitmask([
+            extension.digital_signature,
+            extension.content_commitment,
+            extension.key_encipherment,
+            extension.data_encipherment,
+            extension.key_agreement,
+            extension.key_cert_sign,
+            extension.crl_sign,
+            # encipher_only and decipher_only are undefined unless key_agreement is true
+            extension.encipher_only if extension.key_agreement else False,
+            extension.decipher_only if extension.key_agreement else False,
+        ])),
+    ]
+
+
+def map_alternative_name(name: str, extension: x509.SubjectAlternativeName) -> List[Tuple[str, Any]]:
+    # Subject alternative name is an X.509 extension that provides a list
+    # of general name instances that provide a set of identities for which
+    # the certificate is valid. The object is iterable to get every
+    # element.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.SubjectAlternativeName)
+
+    # Issuer alternative name is an X.509 extension that provides a list of
+    # general name instances that provide a set of identities for the
+    # certificate issuer. The object is iterable to get every element.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.IssuerAlternativeName)
+
+    # sort the names into a column per type, the values are stored as the library
+    # decoded them. the DNS names are kept in the column of the extension itself
+    dns_names: List[str] = []
+    ip_addresses: List[bytes] = []
+    emails: List[str] = []
+    uris: List[str] = []
+    others: List[str] = []
+
+    for general_name in extension:
+        if isinstance(general_name, x509.DNSName):
+            dns_names.append(general_name.value)
+        elif isinstance(general_name, x509.IPAddress):
+            ip_addresses.append(pack_ip_address(general_name.value))
+        elif isinstance(general_name, x509.RFC822Name):
+            emails.append(general_name.value)
+        elif isinstance(general_name, x509.UniformResourceIdentifier):
+            uris.append(general_name.value)
+        else:
+            # directory names, registered ids and other names are rare, stringify them
+            others.append(str(general_name))
+
+    # the columns of the other types are left empty if there are no such names
+    return [
+        (name, dns_names),
+        (name + "_IP", ip_addresses if len(ip_addresses) > 0 else None),
+        (name + "_EMAIL", emails if len(emails) > 0 else None),
+        (name + "_URI", uris if len(uris) > 0 else None),
+        (name + "_OTHER", others if len(others) > 0 else None),
+    ]
+
+
+def pack_ip_address(address: Any) -> bytes:
+    "Returns the 4 or 16 bytes of an IP address, networks are followed by the bytes of their netmask"
+    if isinstance(address, ipaddress.IPv4Network) or isinstance(address, ipaddress.IPv6Network):
+        return address.network_address.packed + address.netmask.packed
+
+    return address.packed
+
+
+def map_crl_distribution_points(name: str, extension: x509.CRLDistributionPoints) -> List[Tuple[str, Any]]:
+    # The CRL distribution points extension identifies how CRL information
+    # is obtained. It is an iterable, containing one or more
+    # DistributionPoint instances.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.CRLDistributionPoints)
+
+    # the actual distribution points are not interesting to us but count might be
+    return [(name + "_COUNT", len(extension._distribution_points))]
+
+
+def map_certificate_policies(name: str, extension: x509.CertificatePolicies) -> List[Tuple[str, Any]]:
+    # The certificate policies extension is an iterable, containing one or
+    # more PolicyInformation instances.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.CertificatePolicies)
+
+    # check if the certificate is EV
+    is_ca_enabled = False
+    for policy in extension._policies:
+        # print(policy.policy_qualifiers)
+        if policy.policy_identifier in ev_identifiers:
+            is_ca_enabled = True
+            break
+            # print("found ca certificate")
+            # exit()
+
+    # most policies are not of interest but maybe the count is
+    return [
+        (name + "_COUNT", len(extension._policies)),
+        (name + "_EV", is_ca_enabled),
+    ]
+
+
+def map_extended_key_usage(name: str, extension: x509.ExtendedKeyUsage) -> List[Tuple[str, Any]]:
+    # This extension indicates one or more purposes for which the
+    # certified public key may be used, in addition to or in place of the
+    # basic purposes indicated in the key usage extension. The object is
+    # iterable to obtain the list of ExtendedKeyUsageOID OIDs present.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.ExtendedKeyUsage)
+
+    # for each possible extended key usage set a bit, in the order of
+    # `extended_key_usage_flags`. other usages are not extracted
+    return [
+        (name, flags_to_bitmask([
+            getattr(x509.ExtendedKeyUsageOID, oid) in extension._usages
+            for oid in extended_key_usage_flags
+        ])),
+    ]
+
+
+def map_inhibit_any_policy(name: str, extension: x509.InhibitAnyPolicy) -> List[Tuple[str, Any]]:
+    # The inhibit anyPolicy extension indicates that the special OID
+    # ANY_POLICY, is not considered an explicit match for other
+    # CertificatePolicies except when it appears in an intermediate
+    # self-issued CA certificate. The value indicates the number of
+    # additional non-self-issued certificates that may appear in the path
+    # before ANY_POLICY is no longer permitted. For example, a value of
+    # one indicates that ANY_POLICY may be processed in certificates
+    # issued by the subject of this certificate, but not in additional
+    # certificates in the path.
+
+    # maybe interesting?
+    return [(name, extension.skip_certs)]
+
+
+def map_tls_feature(name: str, extension: x509.TLSFeature) -> List[Tuple[str, Any]]:
+    # The TLS Feature extension is defined in RFC 7633 and is used in
+    # certificates for OCSP Must-Staple. The object is iterable to get
+    # every element.
+
+    # existence might be interesting to check how many use stapling
+    # https://www.rfc-editor.org/rfc/rfc7633
+    return [
+        (name, True),
+        (
+            # OSCP must-staple: https://scotthelme.co.uk/ocsp-must-staple/
+            # https://www.rfc-editor.org/rfc/rfc6066
+            name + "_STATUS_REQUEST",
+            x509.TLSFeatureType.status_request in extension._features
+        ),
+        (
+            # https://www.rfc-editor.org/rfc/rfc6961
+            name + "_STATUS_REQUEST_2",
+            x509.TLSFeatureType.status_request_v2 in extension._features
+        ),
+    ]
+
+
+def map_crl_number(name: str, extension: x509.CRLNumber) -> List[Tuple[str, Any]]:
+    # The CRL number is a CRL extension that conveys a monotonically
+    # increasing sequence number for a given CRL scope and CRL issuer.
+    # This extension allows users to easily determine when a particular
+    # CRL supersedes another CRL. RFC 5280 requires that this extension
+    # be present in conforming CRLs.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.CRLNumber)
+
+    # interesting -> might be correlated with number of revoked certificates
+    return [(name, extension.crl_number)]
+
+
+def map_precert_signed_certificate_timestamps(name: str, extension: x509.PrecertificateSignedCertificateTimestamps) -> List[Tuple[str, Any]]:
+    # This extension contains SignedCertificateTimestamp instances which
+    # were issued for the pre-certificate corresponding to this
+    # certificate. These can be used to verify that the certificate is
+    # included in a public Certificate Transparency log.
+
+    # given we retrieved the certificates from the CT logs this value should
+    # be an interesting sanity check
+    return [(name, len(extension._signed_certificate_timestamps))]
+
+
+def map_policy_constraints(name: str, extension: x509.PolicyConstraints) -> List[Tuple[str, Any]]:
+    # The policy constraints extension is used to inhibit policy mapping
+    # or require that each certificate in a chain contain an acceptable
+    # policy identifier. For more information about the use of this
+    # extension see RFC 5280.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.PrecertificateSignedCertificateTimestamps)
+
+    return [
+        (
+            name + "_REQUIRE_EXPLICIT_POLICY", extension.require_explicit_policy),
+        (
+            name + "_INHIBIT_POLICY_MAPPING", extension.inhibit_policy_mapping
+        )
+    ]
+
+
+def map_extension_presence(name: str, extension: x509.ExtensionType) -> List[Tuple[str, Any]]:
+    # only the existence of the extension is stored
+    return [(name, True)]
+
+
+def map_ignored_extension(name: str, extension: x509.ExtensionType) -> List[Tuple[str, Any]]:
+    # the extension is not extracted
+    return []
+
+
+# maps the object identifier of each extension to the function extracting its values,
+# the comments describe the extensions and why (or why not) they are of interest
+extension_handlers: Dict[x509.ObjectIdentifier, Callable[[str, Any], List[Tuple[str, Any]]]] = {
+    x509.ExtensionOID.BASIC_CONSTRAINTS: map_basic_constraints,
+    x509.ExtensionOID.KEY_USAGE: map_key_usage,
+    x509.ExtensionOID.SUBJECT_ALTERNATIVE_NAME: map_alternative_name,
+    x509.ExtensionOID.ISSUER_ALTERNATIVE_NAME: map_alternative_name,
+    # The subject key identifier extension provides a means of
+    # identifying certificates that contain a particular public key.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.SubjectKeyIdentifier)
+    # just a byte value encoding the key -> no interesting for us
+    x509.ExtensionOID.SUBJECT_KEY_IDENTIFIER: map_ignored_extension,
+    # The name constraints extension, which only has meaning in a CA
+    # certificate, defines a name space within which all subject names
+    # in certificates issued beneath the CA certificate must (or must
+    # not) be in. For specific details on the way this extension should
+    # be processed see RFC 5280.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.NameConstraints)
+    # restricts how a CA certificate can be used -> not interesting for us
+    x509.ExtensionOID.NAME_CONSTRAINTS: map_ignored_extension,
+    x509.ExtensionOID.CRL_DISTRIBUTION_POINTS: map_crl_distribution_points,
+    x509.ExtensionOID.CERTIFICATE_POLICIES: map_certificate_policies,
+    # The authority key identifier extension provides a means of
+    # identifying the public key corresponding to the private key used
+    # to sign a certificate. This extension is typically used to assist
+    # in determining the appropriate certificate chain. For more
+    # information about generation and use of this extension see RFC
+    # 5280 section 4.2.1.1.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.AuthorityKeyIdentifier)
+    # again a key identifier -> not interesting to us
+    x509.ExtensionOID.AUTHORITY_KEY_IDENTIFIER: map_ignored_extension,
+    x509.ExtensionOID.EXTENDED_KEY_USAGE: map_extended_key_usage,
+    # The authority information access extension indicates how to access
+    # information and services for the issuer of the certificate in
+    # which the extension appears. Information and services may include
+    # online validation services (such as OCSP) and issuer data. It is
+    # an iterable, containing one or more AccessDescription instances.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.AuthorityInformationAccess)
+    # the values are not interesting and probably neither their existence
+    x509.ExtensionOID.AUTHORITY_INFORMATION_ACCESS: map_ignored_extension,
+    # The subject information access extension indicates how to access
+    # information and services for the subject of the certificate in
+    # which the extension appears. When the subject is a CA, information
+    # and services may include certificate validation services and CA
+    # policy data. When the subject is an end entity, the information
+    # describes the type of services offered and how to access them. It
+    # is an iterable, containing one or more AccessDescription
+    # instances.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.SubjectInformationAccess)
+    # according to https://cryptography.io/en/latest/x509/reference/#cryptography.x509.AccessDescription
+    # this can only contain one possible value, it's value is certainly not interesting and probably neither
+    # it's existence
+    x509.ExtensionOID.SUBJECT_INFORMATION_ACCESS: map_ignored_extension,
+    x509.ExtensionOID.INHIBIT_ANY_POLICY: map_inhibit_any_policy,
+    # This presence of this extension indicates that an OCSP client can
+    # trust a responder for the lifetime of the responder’s certificate.
+    # CAs issuing such a certificate should realize that a compromise of
+    # the responder’s key is as serious as the compromise of a CA key
+    # used to sign CRLs, at least for the validity period of this
+    # certificate. CA’s may choose to issue this type of certificate
+    # with a very short lifetime and renew it frequently. This extension
+    # is only relevant when the certificate is an authorized OCSP
+    # responder.
+    # most certainly interesting!
+    x509.ExtensionOID.OCSP_NO_CHECK: map_extension_presence,
+    x509.ExtensionOID.TLS_FEATURE: map_tls_feature,
+    x509.ExtensionOID.CRL_NUMBER: map_crl_number,
+    # The delta CRL indicator is a CRL extension that identifies a CRL
+    # as being a delta CRL. Delta CRLs contain updates to revocation
+    # information previously distributed, rather than all the
+    # information that would appear in a complete CRL.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.DeltaCRLIndicator)
+    # existence might be interesting as it is not expected to show up anywhere
+    x509.ExtensionOID.DELTA_CRL_INDICATOR: map_extension_presence,
+    x509.ExtensionOID.PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS: map_precert_signed_certificate_timestamps,
+    # This extension indicates that the certificate should not be
+    # treated as a certificate for the purposes of validation, but is
+    # instead for submission to a certificate transparency log in order
+    # to obtain SCTs which will be embedded in a
+    # PrecertificateSignedCertificateTimestamps extension on the final
+    # certificate.
+    # I would expect this to be set of all of them since we retrieved them from CT logs
+    # -> verify
+    x509.ExtensionOID.PRECERT_POISON: map_extension_presence,
+    # This extension contains SignedCertificateTimestamp instances.
+    # These can be used to verify that the certificate is included in a
+    # public Certificate Transparency log. This extension is only found
+    # in OCSP responses. For SCTs in an X.509 certificate see
+    # PrecertificateSignedCertificateTimestamps.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.PrecertificateSignedCertificateTimestamps)
+    # accroding to the description this should not be present in any certificates retrieved
+    # from a CT log
+    x509.ExtensionOID.SIGNED_CERTIFICATE_TIMESTAMPS: map_extension_presence,
+    x509.ExtensionOID.POLICY_CONSTRAINTS: map_policy_constraints,
+    # The freshest CRL extension (also known as Delta CRL Distribution
+    # Point) identifies how delta CRL information is obtained. It is an
+    # iterable, containing one or more DistributionPoint instances.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.FreshestCRL)
+    # existence might be interesting?
+    x509.ExtensionOID.FRESHEST_CRL: map_extension_presence,
+    # Issuing distribution point is a CRL extension that identifies the
+    # CRL distribution point and scope for a particular CRL. It
+    # indicates whether the CRL covers revocation for end entity
+    # certificates only, CA certificates only, attribute certificates
+    # only, or a limited set of reason codes. For specific details on
+    # the way this extension should be processed see RFC 5280.
+    # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.IssuingDistributionPoint)
+    # should only be present in CRL certs, hence not in ones retrieved from the CT logs
+    # -> check
+    x509.ExtensionOID.ISSUING_DISTRIBUTION_POINT: map_extension_presence,
+    # not implemented in this library, i.e. x509.PolicyMappings does not exist
+    x509.ExtensionOID.POLICY_MAPPINGS: map_ignored_extension,
+    x509.ExtensionOID.SUBJECT_DIRECTORY_ATTRIBUTES: map_ignored_extension,
+}
+
+# maps the object identifier of each extension to its column name
+extension_column_names: Dict[x509.ObjectIdentifier, str] = {
+    getattr(x509.ExtensionOID, name): f"EXTENSION_{name}"
+    for name in extension_object_identifier_names
+}
+
+
+class UnrecognizedExtensionError(Exception):
+    "The library could not decode the value of an extension, it is recorded in the error log by this name"
+
+
+def map_certificate_extension(name: str, extension: x509.Extension) -> List[Tuple[str, Any]]:
+    map_extension = extension_handlers[extension.oid]
+
+    if isinstance(extension.value, x509.UnrecognizedExtension) and \
+            map_extension is not map_ignored_extension:
+        # the library could not decode the value of the extension. the columns of the
+        # extension have fixed types, so instead of an 'unkown' value the extension is
+        # recorded as an error of the certificate (see map_certificate_extensions)
+        raise UnrecognizedExtensionError(f"Could not decode the value of extension '{name}'")
+
+    return map_extension(name, extension.value)
+
+
+def map_certificate_extensions(extensions: x509.Extensions, id: int) -> List[Tuple[str, Any]]:
+    res: List[Tuple[str, Any]] = []
+    # iterate over the extensions of the certificate once and look up how to map
+    # each of them, instead of searching the certificate for every known extension
+    profiled = profile.enabled
+
+    for extension in extensions:
+        name = extension_column_names.get(extension.oid)
+
+        # extensions without a name in x509.ExtensionOID are not extracted
+        if name is None:
+            continue
+
+        try:
+            if profiled:
+                start = time.perf_counter()
+                res += map_certificate_extension(name, extension)
+                profile.add("parse.certificates.extensions." + name, time.perf_counter() - start)
+            else:
+                res += map_certificate_extension(name, extension)
+        except Exception as e:
+            # record the error and just skip parsing this extension
+            error_log.add(id, 'extension', name, e)
+    return res
+
+
+# the type of every column map_certificate_extension can emit, types are one of
+# 'int', 'bool', 'string', 'list' (a list of strings) or 'binary_list' (a list of
+# bytes). knowing all of them up front allows writing the data in chunks that share
+# one schema
+extension_column_types: Dict[str, str] = {
+    "EXTENSION_BASIC_CONSTRAINTS_CA": "bool",
+    "EXTENSION_BASIC_CONSTRAINTS_PATH_LENGTH": "int",
+    # bitmasks, see flag_columns
+    "EXTENSION_KEY_USAGE": "int",
+    **{
+        name + suffix: column_type
+        for name in ["EXTENSION_SUBJECT_ALTERNATIVE_NAME", "EXTENSION_ISSUER_ALTERNATIVE_NAME"]
+        for suffix, column_type in [
+            ("", "list"), ("_IP", "binary_list"), ("_EMAIL", "list"), ("_URI", "list"), ("_OTHER", "list")
+        ]
+    },
+    "EXTENSION_CRL_DISTRIBUTION_POINTS_COUNT": "int",
+    "EXTENSION_CERTIFICATE_POLICIES_COUNT": "int",
+    "EXTENSION_CERTIFICATE_POLICIES_EV": "bool",
+    "EXTENSION_EXTENDED_KEY_USAGE": "int",
+    "EXTENSION_INHIBIT_ANY_POLICY": "int",
+    "EXTENSION_OCSP_NO_CHECK": "bool",
+    "EXTENSION_TLS_FEATURE": "bool",
+    "EXTENSION_TLS_FEATURE_STATUS_REQUEST": "bool",
+    "EXTENSION_TLS_FEATURE_STATUS_REQUEST_2": "bool",
+    "EXTENSION_CRL_NUMBER": "int",
+    "EXTENSION_DELTA_CRL_INDICATOR": "bool",
+    "EXTENSION_PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS": "int",
+    "EXTENSION_PRECERT_POISON": "bool",
+    "EXTENSION_SIGNED_CERTIFICATE_TIMESTAMPS": "bool",
+    "EXTENSION_POLICY_CONSTRAINTS_REQUIRE_EXPLICIT_POLICY": "int",
+    "EXTENSION_POLICY_CONSTRAINTS_INHIBIT_POLICY_MAPPING": "int",
+    "EXTENSION_FRESHEST_CRL": "bool",
+    "EXTENSION_ISSUING_DISTRIBUTION_POINT": "bool",
+}
+
+# the type of every column map_certificate_row can emit
+certificate_column_types: Dict[str, str] = {
+    'id': 'int',
+    'version': 'string',
+    'not_valid_before': 'int',
+    'not_valid_after': 'int',
+    'validity_time': 'int',
+    # the names of the issuer are part of the issuers table, see map_certificate_issuer
+    'issuer_id': 'int',
+    **{'subject_' + name: 'list' for name in names_object_identifier_names},
+    'signature_hash_algorithm': 'string',
+    'signature_algorithm': 'string',
+    'public_key_type': 'string',
+    'public_key_size': 'int',
+    'public_key_curve': 'string',
+    **extension_column_types,
+}
+
+
+# the issuer and subject columns in the order map_certificate_name returns their values
+issuer_columns = ['issuer_' + name for name in names_object_identifier_names]
+subject_columns = ['subject_' + name for name in names_object_identifier_names]
+
+
+def map_certificate_batch(ids: List[int], certificates_base64: List[str]) -> Dict[str, List[Any]]:
+    # one buffer per column of `certificate_column_types`. all values default to None,
+    # this way missing extensions don't need any work and rows of certificates that
+    # could not be parsed stay empty
+    columns: Dict[str, List[Any]] = {
+        column: [None] * len(ids) for column in certificate_column_types
+    }
+
+    with profile.stage("parse.certificates", len(ids)):
+        map_certificates_into(columns, ids, certificates_base64)
+
+    return columns
+
+
+def map_certificates_into(columns: Dict[str, List[Any]], ids: List[int], certificates_base64: List[str]):
+    "Maps the certificates into the rows of the column buffers, see map_certificate_batch"
+    profiled = profile.enabled
+
+    for i, (id, certificate_base64) in enumerate(zip(ids, certificates_base64)):
+        # the stage the mapping is in, recorded along with errors
+        stage = 'decode'
+
+        try:
+            if profiled:
+                start = time.perf_counter()
+
+            cert, der = load_certificate(certificate_base64)
+            stage = 'fields'
+
+            if profiled:
+                decoded = time.perf_counter()
+                profile.add("parse.certificates.decode", decoded - start)
+
+            not_valid_before = map_certificate_datetime(cert.not_valid_before)
+            not_valid_after = map_certificate_datetime(cert.not_valid_after)
+
+            # map all values before writing any of them, this way a certificate that
+            # fails half-way through does not leave a partially filled row behind
+            values: List[Tuple[str, Any]] = [
+                ('id', id),
+                ('version', map_certificate_version(cert)),
+                ('not_valid_before', not_valid_before),
+                ('not_valid_after', not_valid_after),
+                ('validity_time', not_valid_after - not_valid_before),
                 (
-                    # OSCP must-staple: https://scotthelme.co.uk/ocsp-must-staple/
-                    # https://www.rfc-editor.org/rfc/rfc6066
-                    name + "_STATUS_REQUEST",
-                    x509.TLSFeatureType.status_request in extension._features
+                    'signature_hash_algorithm',
+                    cert.signature_hash_algorithm.name if cert.signature_hash_algorithm != None else None
                 ),
                 (
-                    # https://www.rfc-editor.org/rfc/rfc6961
-                    name + "_STATUS_REQUEST_2",
-                    x509.TLSFeatureType.status_request_v2 in extension._features
+                    'signature_algorithm',
+                    map_certificate_signature_algorithm_oid(
+                        cert.signature_algorithm_oid
+                    )
                 ),
             ]
-        elif isinstance(extension, x509.CRLNumber):
-            # The CRL number is a CRL extension that conveys a monotonically
-            # increasing sequence number for a given CRL scope and CRL issuer.
-            # This extension allows users to easily determine when a particular
-            # CRL supersedes another CRL. RFC 5280 requires that this extension
-            # be present in conforming CRLs.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.CRLNumber)
-
-            # interesting -> might be correlated with number of revoked certificates
-            return [(name, extension.crl_number)]
-        elif isinstance(extension, x509.DeltaCRLIndicator):
-            # The delta CRL indicator is a CRL extension that identifies a CRL
-            # as being a delta CRL. Delta CRLs contain updates to revocation
-            # information previously distributed, rather than all the
-            # information that would appear in a complete CRL.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.DeltaCRLIndicator)
-
-            # existence might be interesting as it is not expected to show up anywhere
-            return [(name, True)]
-        elif isinstance(extension, x509.PrecertificateSignedCertificateTimestamps):
-            # This extension contains SignedCertificateTimestamp instances which
-            # were issued for the pre-certificate corresponding to this
-            # certificate. These can be used to verify that the certificate is
-            # included in a public Certificate Transparency log.
-
-            # given we retrieved the certificates from the CT logs this value should
-            # be an interesting sanity check
-            return [(name, len(extension._signed_certificate_timestamps))]
-        elif isinstance(extension, x509.PrecertPoison):
-            # This extension indicates that the certificate should not be
-            # treated as a certificate for the purposes of validation, but is
-            # instead for submission to a certificate transparency log in order
-            # to obtain SCTs which will be embedded in a
-            # PrecertificateSignedCertificateTimestamps extension on the final
-            # certificate.
-
-            # I would expect this to be set of all of them since we retrieved them from CT logs
-            # -> verify
-            return [(name, True)]
-        elif isinstance(extension, x509.SignedCertificateTimestamps):
-            # This extension contains SignedCertificateTimestamp instances.
-            # These can be used to verify that the certificate is included in a
-            # public Certificate Transparency log. This extension is only found
-            # in OCSP responses. For SCTs in an X.509 certificate see
-            # PrecertificateSignedCertificateTimestamps.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.PrecertificateSignedCertificateTimestamps)
-
-            # accroding to the description this should not be present in any certificates retrieved
-            # from a CT log
-            return [(name, True)]
-        elif isinstance(extension, x509.PolicyConstraints):
-            # The policy constraints extension is used to inhibit policy mapping
-            # or require that each certificate in a chain contain an acceptable
-            # policy identifier. For more information about the use of this
-            # extension see RFC 5280.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.PrecertificateSignedCertificateTimestamps)
-
-            return [
-                (
-                    name + "_REQUIRE_EXPLICIT_POLICY", extension.require_explicit_policy),
-                (
-                    name + "_INHIBIT_POLICY_MAPPING", extension.inhibit_policy_mapping
-                )
-            ]
-        elif isinstance(extension, x509.FreshestCRL):
-            # The freshest CRL extension (also known as Delta CRL Distribution
-            # Point) identifies how delta CRL information is obtained. It is an
-            # iterable, containing one or more DistributionPoint instances.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.FreshestCRL)
-
-            # existence might be interesting?
-            return [(name, True)]
-        elif isinstance(extension, x509.IssuingDistributionPoint):
-            # Issuing distribution point is a CRL extension that identifies the
-            # CRL distribution point and scope for a particular CRL. It
-            # indicates whether the CRL covers revocation for end entity
-            # certificates only, CA certificates only, attribute certificates
-            # only, or a limited set of reason codes. For specific details on
-            # the way this extension should be processed see RFC 5280.
-            # (https://cryptography.io/en/latest/x509/reference/#cryptography.x509.IssuingDistributionPoint)
-
-            # should only be present in CRL certs, hence not in ones retrieved from the CT logs
-            # -> check
-            return [(name, True)]
-        elif name in ["POLICY_MAPPINGS", "SUBJECT_DIRECTORY_ATTRIBUTES"]:
-            # not implemented in this library, i.e. x509.PolicyMappings does not exist
-            return []
-
-        return [(name, "unkown")]
-    except x509.ExtensionNotFound:
-        return []
 
+            if profiled:
+                mapped_fields = time.perf_counter()
+                profile.add("parse.certificates.fields", mapped_fields - decoded)
 
-def map_certificate_extensions(extensions: x509.Extensions, serial_number: int) -> List[Tuple[str, Any]]:
-    res: List[Tuple[str, Any]] = []
-    for name in extension_object_identifier_names:
-        try:
-            res += map_certificate_extension(
-                f"EXTENSION_{name}", extensions, getattr(x509.ExtensionOID, name))
-        except Exception:
-            # ignore the error and just skip parsing this extension
-            print(
-                f"Could not parse extension '{name}' for certificate with id '{serial_number}'"
-            )
-    return res
+            stage = 'names'
+            values.append(('issuer_id', map_certificate_issuer(cert, der)))
+            values += zip(subject_columns, map_certificate_name(cert.subject))
+
+            if profiled:
+                mapped_names = time.perf_counter()
+                profile.add("parse.certificates.names", mapped_names - mapped_fields)
+
+            try:
+                values += zip(public_key_columns, map_certificate_public_key(cert, der))
+            except Exception as e:
+                # keep the certificate, just without its public key
+                error_log.add(id, 'public_key', None, e)
+
+            if profiled:
+                mapped_public_key = time.perf_counter()
+                profile.add("parse.certificates.public_key", mapped_public_key - mapped_names)
+
+            stage = 'extensions'
+            values += map_certificate_extensions(cert.extensions, id)
+
+            if profiled:
+                profile.add("parse.certificates.extensions", time.perf_counter() - mapped_public_key)
+        except Exception as e:
+            # leave the row empty, it will later be filtered out
+            error_log.add(id, stage, None, e)
+            continue
+
+        for column, value in values:
+            # the handlers only emit columns of the schema, extensions the library could
+            # not decode are recorded in the error log instead
+            if column in columns:
+                columns[column][i] = value
 
 
 def map_certificate_row(row):
-    try:
-        pem_cert = "" + \
-            "-----BEGIN CERTIFICATE-----\n" +\
-            row['certificate_base64'] +\
-            "\n-----END CERTIFICATE-----"
-        # parse PEM certificate format
-        cert = x509.load_pem_x509_certificate(
-            # decode ascii string to bytes
-            pem_cert.encode("ascii")
-        )
+    # map a single row with the batch mapping, mainly useful for debugging single certificates
+    columns = map_certificate_batch([row['id']], [row['certificate_base64']])
 
-        # cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+    for _, stage, extension, error in error_log.collect():
+        print(f"Could not map certificate with id '{row['id']}': {error} in {extension or stage}")
 
-        mapped_extensions = map_certificate_extensions(
-            cert.extensions, cert.serial_number
-        )
-        extension_labels = [x[0] for x in mapped_extensions]
-        extension_values = [x[1] for x in mapped_extensions]
-
-        # if map_certificate_datetime(cert.not_valid_after) - map_certificate_datetime(cert.not_valid_before) <= 60 * 60 * 24:
-        #     print(pem_cert)
-        #     exit()
-
-        # for l, v in mapped_extensions:
-        #     if l == "EXTENSION_SUBJECT_ALTERNATIVE_NAME" and len(v) > 1000:
-        #         print(pem_cert)
-        #         exit()
-
-        # if "EXTENSION_EXTENDED_KEY_USAGE_SERVER_AUTH" not in extension_labels:
-        #     print(pem_cert)
-        #     exit()
-
-        # if map_certificate_name(cert.subject)[names_object_identifier_names.index("COMMON_NAME")] is None:
-        #     print(pem_cert)
-        #     exit()
-
-        if row['id'] is None:
-            print(row)
-            exit()
-
-        return pd.Series(
-            [
-                row['id'],
-                map_certificate_version(cert),
-                map_certificate_datetime(cert.not_valid_before),
-                map_certificate_datetime(cert.not_valid_after),
-                map_certificate_datetime(cert.not_valid_after) -
-                map_certificate_datetime(cert.not_valid_before),
-            ] +
-            map_certificate_name(cert.issuer) +
-            map_certificate_name(cert.subject) +
-            [
-                cert.signature_hash_algorithm.name if cert.signature_hash_algorithm != None else None,
-                map_certificate_signature_algorithm_oid(
-                    cert.signature_algorithm_oid
-                )
-            ] +
-            extension_values,
-            index=[
-                'id',
-                'version',
-                'not_valid_before',
-                'not_valid_after',
-                'validity_time',
-            ] +
-            ['issuer_' + name for name in names_object_identifier_names] +
-            ['subject_' + name for name in names_object_identifier_names] +
-            [
-                'signature_hash_algorithm',
-                'signature_algorithm'
-            ] +
-            extension_labels,
-        )
-    except Exception as e:
+    if columns['id'][0] is None:
         # return an empty row that will later be filtered out
-        print(e)
         return pd.Series([], index=[], dtype=pd.Float64Dtype)
+
+    return pd.Series({column: values[0] for column, values in columns.items()})
+
+
+# the fingerprints of the certificates of the chains by their base64 encoding. a few
+# thousand intermediates and roots are part of almost all chains, so most lookups are hits
+intermediate_cache = BoundedCache(4096)
+
+# the mapped certificates of the chains by their fingerprint, every distinct certificate
+# is only parsed once. these are the rows of the intermediates table, see intermediates.py
+intermediates: Dict[str, Tuple[Any, ...]] = {}
+
+# the type of the columns derived from the chain of every certificate
+chain_column_types: Dict[str, str] = {
+    'chain_fingerprints': 'list',
+}
+
+
+def map_intermediate(der: bytes) -> Tuple[Any, ...]:
+    "Maps a certificate of a chain to a row of the intermediates table, without its fingerprint"
+    cert = x509.load_der_x509_certificate(der)
+
+    try:
+        ca = cert.extensions.get_extension_for_class(x509.BasicConstraints).value.ca
+    except x509.ExtensionNotFound:
+        ca = None
+
+    return (
+        cert.subject.rfc4514_string(),
+        cert.issuer.rfc4514_string(),
+        map_certificate_datetime(cert.not_valid_before),
+        map_certificate_datetime(cert.not_valid_after),
+        ca,
+        cert.subject == cert.issuer,
+    )
+
+
+def map_certificate_chain(id: int, chain: List[str]) -> List[str]:
+    "Returns the sha256 fingerprints of the certificates of a chain, certificates seen for the first time are added to `intermediates`"
+    fingerprints: List[str] = []
+
+    for certificate_base64 in chain:
+        fingerprint = intermediate_cache.get(certificate_base64)
+
+        if fingerprint is None:
+            try:
+                der = base64.b64decode(certificate_base64, validate=True)
+            except ValueError as e:
+                # the certificate can't be identified, it is left out of the chain
+                error_log.add(id, 'chain', None, e)
+                continue
+
+            fingerprint = hashlib.sha256(der).hexdigest()
+            intermediate_cache.put(certificate_base64, fingerprint)
+
+            if fingerprint not in intermediates:
+                try:
+                    intermediates[fingerprint] = map_intermediate(der)
+                except Exception as e:
+                    # keep the certificate in the chain but without any of its fields
+                    error_log.add(id, 'chain', None, e)
+                    intermediates[fingerprint] = (None, None, None, None, None, None)
+
+        fingerprints.append(fingerprint)
+
+    return fingerprints
+
+
+def map_certificate_chains(ids: List[Optional[int]], chains: List[List[str]]) -> List[Optional[List[str]]]:
+    "Maps the chains of the rows of the column buffers, the rows of certificates that could not be parsed stay empty"
+    return [
+        None if id is None else map_certificate_chain(id, chain)
+        for id, chain in zip(ids, chains)
+    ]
+
+
+def collect_statistics() -> Dict[str, int]:
+    "Returns the counters of the caches since the last call, they are summed up over all chunks"
+    issuer_name_cache_hits, issuer_name_cache_misses = issuer_name_cache.collect_statistics()
+    public_key_cache_hits, public_key_cache_misses = public_key_cache.collect_statistics()
+
+    return {
+        'issuer_name_cache_hits': issuer_name_cache_hits,
+        'issuer_name_cache_misses': issuer_name_cache_misses,
+        'public_key_cache_hits': public_key_cache_hits,
+        'public_key_cache_misses': public_key_cache_misses,
+    }
+
+
+def map_certificate_chunk(chunk: pd.DataFrame) -> Tuple[Dict[str, List[Any]], Dict[str, int], Dict[str, Dict[str, Any]], List[Tuple[int, str, Optional[str], str]], Dict[int, List[Any]]]:
+    # map a whole chunk of rows at once, this is the unit of work handed to
+    # the worker processes when parsing in parallel. as the caches, the profile,
+    # the errors and the mapped issuers live in the worker processes, they are
+    # returned along with the columns
+    columns = map_certificate_batch(
+        chunk['id'].tolist(),
+        chunk['certificate_base64'].tolist()
+    )
+
+    return columns, collect_statistics(), profile.collect(), error_log.collect(), collect_issuers()
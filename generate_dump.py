@@ -0,0 +1,350 @@
+import os
+import csv
+import gzip
+import base64
+import struct
+import random
+import hashlib
+import datetime
+import ipaddress
+import click
+from typing import Tuple, List, Dict, Any
+from tqdm import tqdm
+from cryptography import x509
+from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+# generates gzipped csv files in the format of the CT dumps read by extraction.py, made
+# up of synthetic certificates signed by a synthetic CA hierarchy. the contents of the
+# certificates only depend on the seed, the files are not byte identical across runs
+# though as the RSA keys and the ECDSA signatures are random
+
+# the log all entries are attributed to
+LOG_URL = "https://ct.example.com/log"
+
+# the number of distinct leaf keys, generating a key per certificate would take most
+# of the time. real CT logs contain plenty of certificates sharing a key as well
+LEAF_KEY_COUNT = 64
+
+# the share of leaf keys that are RSA keys, the others are P-256 keys
+RSA_LEAF_KEY_SHARE = 0.25
+
+# the order of the P-256 curve, the private values of the EC keys are drawn below it
+P256_ORDER = 0xFFFFFFFF00000000FFFFFFFFFFFFFFFFBCE6FAADA7179E84F3B9CAC2FC632551
+
+# the registrable domains the names are generated under, see domain_index.py
+TOP_LEVEL_DOMAINS = ['com', 'org', 'net', 'de', 'ch', 'co.uk', 'github.io']
+
+# the number of alternative names per certificate and their weights, most certificates
+# have a few names while some carry up to a hundred
+SAN_COUNTS = [0, 1, 2, 3, 5, 10, 50, 100]
+SAN_COUNT_WEIGHTS = [3, 40, 30, 10, 8, 5, 3, 1]
+
+# the validity times in days, the short lived ones are the most common
+VALIDITY_DAYS = [90, 90, 90, 365, 397, 398, 730, 825]
+
+# the CA/Browser forum policies for domain, organization and extended validation
+VALIDATION_POLICIES = ["2.23.140.1.2.1", "2.23.140.1.2.2", "2.23.140.1.1"]
+VALIDATION_POLICY_WEIGHTS = [70, 20, 10]
+
+# a policy of the CA itself, which some certificates carry in addition
+CA_POLICY = "1.3.6.1.4.1.99999.1.1"
+
+# the first certificate is valid from this date on, the others up to 8 years later
+FIRST_NOT_VALID_BEFORE = datetime.datetime(2016, 1, 1)
+
+
+def derive_ec_key(rnd: random.Random) -> ec.EllipticCurvePrivateKey:
+    "Derives a P-256 key from the random generator, unlike generated keys it is reproducible"
+    return ec.derive_private_key(rnd.randrange(1, P256_ORDER), ec.SECP256R1())
+
+
+def build_name(common_name: str, organization: str = None, country: str = None, locality: str = None) -> x509.Name:
+    attributes = []
+
+    if country is not None:
+        attributes.append(x509.NameAttribute(NameOID.COUNTRY_NAME, country))
+
+    if locality is not None:
+        attributes.append(x509.NameAttribute(NameOID.LOCALITY_NAME, locality))
+
+    if organization is not None:
+        attributes.append(x509.NameAttribute(NameOID.ORGANIZATION_NAME, organization))
+
+    if common_name is not None:
+        attributes.append(x509.NameAttribute(NameOID.COMMON_NAME, common_name))
+
+    return x509.Name(attributes)
+
+
+def to_base64(certificate: x509.Certificate) -> str:
+    return base64.b64encode(certificate.public_bytes(serialization.Encoding.DER)).decode()
+
+
+def generate_issuers(rnd: random.Random, count: int) -> List[Tuple[Any, x509.Name, str]]:
+    """
+    Generates an RSA and an EC root and `count` intermediates below them. Returns the
+    key, the name and the base64 encoded chain (intermediate;root) of every intermediate.
+    """
+    roots = []
+
+    for i, key in enumerate([rsa.generate_private_key(65537, 2048), derive_ec_key(rnd)]):
+        name = build_name(f"Synthetic Root CA {i}", "Synthetic Trust Services", "US")
+        certificate = x509.CertificateBuilder()\
+            .subject_name(name)\
+            .issuer_name(name)\
+            .public_key(key.public_key())\
+            .serial_number(i + 1)\
+            .not_valid_before(datetime.datetime(2010, 1, 1))\
+            .not_valid_after(datetime.datetime(2040, 1, 1))\
+            .add_extension(x509.BasicConstraints(True, None), True)\
+            .add_extension(x509.KeyUsage(False, False, False, False, False, True, True, False, False), True)\
+            .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), False)\
+            .sign(key, hashes.SHA256())
+
+        roots.append((key, name, certificate))
+
+    issuers = []
+
+    for i in range(count):
+        root_key, root_name, root_certificate = roots[i % len(roots)]
+        key = derive_ec_key(rnd)
+        name = build_name(
+            f"Synthetic Issuing CA {i}",
+            f"Synthetic Trust Services {i}",
+            rnd.choice(["US", "DE", "CH", "GB", "JP"])
+        )
+        certificate = x509.CertificateBuilder()\
+            .subject_name(name)\
+            .issuer_name(root_name)\
+            .public_key(key.public_key())\
+            .serial_number(100 + i)\
+            .not_valid_before(datetime.datetime(2012, 1, 1))\
+            .not_valid_after(datetime.datetime(2035, 1, 1))\
+            .add_extension(x509.BasicConstraints(True, 0), True)\
+            .add_extension(x509.KeyUsage(True, False, False, False, False, True, True, False, False), True)\
+            .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), False)\
+            .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(root_key.public_key()), False)\
+            .sign(root_key, hashes.SHA256())
+
+        issuers.append((key, name, to_base64(certificate) + ";" + to_base64(root_certificate)))
+
+    return issuers
+
+
+def generate_leaf_keys(rnd: random.Random) -> List[Any]:
+    return [
+        rsa.generate_private_key(65537, 2048) if rnd.random() < RSA_LEAF_KEY_SHARE else derive_ec_key(rnd)
+        for _ in range(LEAF_KEY_COUNT)
+    ]
+
+
+def encode_sct_list(rnd: random.Random, count: int, timestamp: int) -> bytes:
+    "Encodes a signed certificate timestamp list (RFC 6962, section 3.3) of random SCTs as a DER octet string"
+    scts = b""
+
+    for i in range(count):
+        signature = rnd.randbytes(70)
+        sct = bytes([0]) + \
+            rnd.randbytes(32) + \
+            struct.pack(">Q", timestamp + i) + \
+            struct.pack(">H", 0) + \
+            bytes([4, 3]) + \
+            struct.pack(">H", len(signature)) + signature
+        scts += struct.pack(">H", len(sct)) + sct
+
+    content = struct.pack(">H", len(scts)) + scts
+
+    # the length of the octet string in DER encoding
+    if len(content) < 128:
+        length = bytes([len(content)])
+    else:
+        length_bytes = len(content).to_bytes((len(content).bit_length() + 7) // 8, 'big')
+        length = bytes([0x80 | len(length_bytes)]) + length_bytes
+
+    return bytes([4]) + length + content
+
+
+def generate_alternative_names(rnd: random.Random, domain: str, count: int) -> List[x509.GeneralName]:
+    names: List[x509.GeneralName] = []
+
+    for i in range(count):
+        kind = rnd.random()
+
+        if i == 0 or kind < 0.1:
+            names.append(x509.DNSName(domain if i == 0 else f"www.{domain}"))
+        elif kind < 0.2:
+            names.append(x509.DNSName(f"*.{domain}"))
+        elif kind < 0.25:
+            names.append(x509.IPAddress(ipaddress.ip_address(f"10.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(1, 255)}")))
+        elif kind < 0.27:
+            names.append(x509.RFC822Name(f"admin@{domain}"))
+        else:
+            names.append(x509.DNSName(f"host{i}.{domain}"))
+
+    # alternative names have to be distinct
+    return list(dict.fromkeys(names))
+
+
+def generate_certificate(rnd: random.Random, issuers: List[Tuple[Any, x509.Name, str]], leaf_keys: List[Any], domain_count: int) -> Tuple[x509.Certificate, str]:
+    "Generates a leaf certificate and returns it along with its chain"
+    issuer_key, issuer_name, chain = rnd.choice(issuers)
+
+    domain = f"site{rnd.randrange(domain_count)}.{rnd.choice(TOP_LEVEL_DOMAINS)}"
+    alternative_names = generate_alternative_names(
+        rnd, domain, rnd.choices(SAN_COUNTS, SAN_COUNT_WEIGHTS)[0]
+    )
+    policy = rnd.choices(VALIDATION_POLICIES, VALIDATION_POLICY_WEIGHTS)[0]
+    policies = [policy] + ([CA_POLICY] if rnd.random() < 0.3 else [])
+
+    # only organization and extended validation certificates name the organization
+    if policy == VALIDATION_POLICIES[0]:
+        subject = build_name(None if rnd.random() < 0.05 else domain)
+    else:
+        subject = build_name(
+            domain,
+            f"Organization of {domain}",
+            rnd.choice(["US", "DE", "CH", "GB", "JP"]),
+            rnd.choice([None, "Zurich", "Berlin", "London"])
+        )
+
+    key = rnd.choice(leaf_keys)
+    not_valid_before = FIRST_NOT_VALID_BEFORE + datetime.timedelta(seconds=rnd.randrange(8 * 365 * 24 * 60 * 60))
+    not_valid_after = not_valid_before + datetime.timedelta(days=rnd.choice(VALIDITY_DAYS))
+
+    builder = x509.CertificateBuilder()\
+        .subject_name(subject)\
+        .issuer_name(issuer_name)\
+        .public_key(key.public_key())\
+        .serial_number(rnd.getrandbits(64) + 1)\
+        .not_valid_before(not_valid_before)\
+        .not_valid_after(not_valid_after)\
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(issuer_key.public_key()), False)\
+        .add_extension(x509.CertificatePolicies([
+            x509.PolicyInformation(x509.ObjectIdentifier(oid), None) for oid in policies
+        ]), False)
+
+    if len(alternative_names) > 0:
+        builder = builder.add_extension(x509.SubjectAlternativeName(alternative_names), False)
+
+    if rnd.random() < 0.9:
+        builder = builder.add_extension(x509.BasicConstraints(False, None), True)
+
+    if rnd.random() < 0.85:
+        is_rsa = isinstance(key, rsa.RSAPrivateKey)
+        builder = builder\
+            .add_extension(x509.KeyUsage(True, False, is_rsa, False, False, False, False, False, False), True)\
+            .add_extension(x509.ExtendedKeyUsage(
+                [ExtendedKeyUsageOID.SERVER_AUTH] + ([ExtendedKeyUsageOID.CLIENT_AUTH] if rnd.random() < 0.6 else [])
+            ), False)
+
+    if rnd.random() < 0.6:
+        builder = builder.add_extension(x509.CRLDistributionPoints([
+            x509.DistributionPoint([x509.UniformResourceIdentifier(f"http://crl{i}.ct.example.com/ca.crl")], None, None, None)
+            for i in range(rnd.choice([1, 1, 2]))
+        ]), False)
+
+    if rnd.random() < 0.05:
+        builder = builder.add_extension(x509.TLSFeature([x509.TLSFeatureType.status_request]), False)
+
+    # precertificates carry the poison, final certificates the timestamps of the logs
+    if rnd.random() < 0.4:
+        builder = builder.add_extension(x509.PrecertPoison(), True)
+    elif rnd.random() < 0.85:
+        builder = builder.add_extension(x509.UnrecognizedExtension(
+            x509.ExtensionOID.PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS,
+            encode_sct_list(rnd, rnd.choice([1, 2, 3]), int(not_valid_before.timestamp() * 1000))
+        ), False)
+
+    return builder.sign(issuer_key, hashes.SHA384() if rnd.random() < 0.1 else hashes.SHA256()), chain
+
+
+def malform(rnd: random.Random, certificate_base64: str) -> str:
+    "Breaks a base64 encoded certificate the way entries of real dumps are broken"
+    kind = rnd.randrange(3)
+
+    # truncated
+    if kind == 0:
+        return certificate_base64[:rnd.randrange(4, len(certificate_base64) // 4) * 4]
+
+    # valid base64 but not a certificate
+    if kind == 1:
+        return base64.b64encode(rnd.randbytes(rnd.randrange(16, 512))).decode()
+
+    # not base64 at all
+    return certificate_base64[:64] + "%%%" + certificate_base64[64:]
+
+
+def generate_rows(rnd: random.Random, issuers: List[Tuple[Any, x509.Name, str]], leaf_keys: List[Any], first_id: int, count: int, domain_count: int, malformed_share: float) -> List[List[Any]]:
+    rows: List[List[Any]] = []
+
+    for id in range(first_id, first_id + count):
+        certificate, chain = generate_certificate(rnd, issuers, leaf_keys, domain_count)
+
+        certificate_base64 = to_base64(certificate)
+
+        if rnd.random() < malformed_share:
+            certificate_base64 = malform(rnd, certificate_base64)
+
+        try:
+            domains = certificate.extensions\
+                .get_extension_for_class(x509.SubjectAlternativeName)\
+                .value.get_values_for_type(x509.DNSName)
+        except x509.ExtensionNotFound:
+            domains = []
+
+        timestamp = int(certificate.not_valid_before.timestamp() * 1000)
+
+        rows.append([
+            LOG_URL,
+            id,
+            hashlib.sha256(certificate_base64.encode()).hexdigest(),
+            certificate_base64,
+            chain,
+            " ".join(domains),
+            timestamp,
+            timestamp,
+        ])
+
+    return rows
+
+
+@click.command()
+# positional arguments
+# the directory the dump files are written to
+@click.argument('output_dir', type=click.Path(file_okay=False))
+# flags / options
+@click.option('--files', type=click.IntRange(min=1), default=2)
+# the number of certificates per file
+@click.option('--certificates', type=click.IntRange(min=1), default=10000)
+@click.option('--seed', type=int, default=0)
+# the number of intermediate CAs issuing the certificates
+@click.option('--issuers', type=click.IntRange(min=1), default=8)
+# the share of entries that cannot be parsed
+@click.option('--malformed-share', type=click.FloatRange(min=0, max=1), default=0.01)
+def main(output_dir: str, files: int, certificates: int, seed: int, issuers: int, malformed_share: float):
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    rnd = random.Random(seed)
+
+    issuer_keys = generate_issuers(rnd, issuers)
+    leaf_keys = generate_leaf_keys(rnd)
+
+    # the certificates of a domain are spread over all files, like renewals
+    domain_count = max(1, files * certificates // 4)
+
+    for i in tqdm(range(files), unit="files"):
+        rows = generate_rows(
+            rnd, issuer_keys, leaf_keys, i * certificates, certificates, domain_count, malformed_share
+        )
+
+        with gzip.open(f"{output_dir}/dump-{i:05d}.gz", 'wt', newline='') as f:
+            csv.writer(f).writerows(rows)
+
+    print(f"Generated {files} files with {files * certificates} certificates in '{output_dir}'")
+
+
+if __name__ == '__main__':
+    main()
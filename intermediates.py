@@ -0,0 +1,59 @@
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Tuple, List, Dict, Any, Iterable, Optional
+
+# one row per distinct certificate found in the chains of the certificates (intermediates
+# and roots), identified by the sha256 fingerprint of its DER encoding. the certificates
+# reference them by the fingerprints in their `chain_fingerprints` column
+intermediates_schema = pa.schema([
+    ('fingerprint', pa.string()),
+    ('subject', pa.string()),
+    ('issuer', pa.string()),
+    ('not_valid_before', pa.int64()),
+    ('not_valid_after', pa.int64()),
+    ('ca', pa.bool_()),
+    ('self_signed', pa.bool_()),
+])
+
+
+def build_intermediates_table(rows: Dict[str, Tuple[Any, ...]], fingerprints: Optional[Iterable[str]] = None) -> pa.Table:
+    "Builds the intermediates table from the mapped rows by fingerprint, optionally only of the given fingerprints"
+    if fingerprints is None:
+        fingerprints = rows.keys()
+
+    fingerprints = sorted(fingerprints)
+
+    return pa.Table.from_arrays(
+        [pa.array(fingerprints, type=pa.string())] + [
+            pa.array([rows[fingerprint][i] for fingerprint in fingerprints], type=field.type)
+            for i, field in enumerate(intermediates_schema.remove(0))
+        ],
+        schema=intermediates_schema
+    )
+
+
+def referenced_fingerprints(table: pa.Table) -> List[str]:
+    "Returns the distinct fingerprints of the chains of the parsed certificates"
+    if 'chain_fingerprints' not in table.column_names:
+        return []
+
+    return table['chain_fingerprints'].combine_chunks()\
+        .flatten()\
+        .unique()\
+        .to_pylist()
+
+
+def merge_intermediates(input_paths: List[str], output_path: str):
+    "Merges intermediates tables into a single one without duplicates, they are small enough to be merged in memory"
+    rows: Dict[str, Tuple[Any, ...]] = {}
+
+    for path in input_paths:
+        table = pq.read_table(path)
+
+        for row in zip(*[table[column].to_pylist() for column in intermediates_schema.names]):
+            rows[row[0]] = row[1:]
+
+    # write to a temporary file first, an existing output is always complete
+    pq.write_table(build_intermediates_table(rows), f"{output_path}.tmp")
+    os.replace(f"{output_path}.tmp", output_path)
@@ -0,0 +1,55 @@
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+from typing import Tuple, List, Dict, Any, Iterable, Optional
+
+# custom imports
+from extraction_helpers import issuer_columns
+
+# one row per distinct issuer, identified by the id derived from its DER encoded name
+# (see map_certificate_issuer). the certificates reference it by their `issuer_id`
+# column instead of repeating the issuer names in every row
+issuers_schema = pa.schema(
+    [('issuer_id', pa.int64())] +
+    [(column, pa.list_(pa.string())) for column in issuer_columns]
+)
+
+
+def build_issuers_table(rows: Dict[int, List[Any]], ids: Optional[Iterable[int]] = None) -> pa.Table:
+    "Builds the issuers table from the mapped names by issuer id, optionally only of the given ids"
+    if ids is None:
+        ids = rows.keys()
+
+    ids = sorted(ids)
+
+    return pa.Table.from_arrays(
+        [pa.array(ids, type=pa.int64())] + [
+            pa.array([rows[id][i] for id in ids], type=field.type)
+            for i, field in enumerate(issuers_schema.remove(0))
+        ],
+        schema=issuers_schema
+    )
+
+
+def referenced_issuers(table: pa.Table) -> List[int]:
+    "Returns the distinct issuer ids of the parsed certificates"
+    if 'issuer_id' not in table.column_names:
+        return []
+
+    return pc.unique(table['issuer_id']).drop_null().to_pylist()
+
+
+def merge_issuers(input_paths: List[str], output_path: str):
+    "Merges issuers tables into a single one without duplicates, they are small enough to be merged in memory"
+    rows: Dict[int, List[Any]] = {}
+
+    for path in input_paths:
+        table = pq.read_table(path)
+
+        for row in zip(*[table[column].to_pylist() for column in issuers_schema.names]):
+            rows[row[0]] = list(row[1:])
+
+    # write to a temporary file first, an existing output is always complete
+    pq.write_table(build_issuers_table(rows), f"{output_path}.tmp")
+    os.replace(f"{output_path}.tmp", output_path)
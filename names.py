@@ -0,0 +1,119 @@
+import os
+import heapq
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+from typing import Tuple, List, Dict, Any, Iterator
+
+# the list columns the names are taken from, mapped to the name_type they are stored as
+name_columns = {
+    'subject_COMMON_NAME': 'common_name',
+    'EXTENSION_SUBJECT_ALTERNATIVE_NAME': 'subject_alternative_name',
+}
+
+# one row per name of a certificate, sorted by the name. the names repeat a lot
+# (e.g. the same domain in every renewal), so they are dictionary encoded
+names_schema = pa.schema([
+    ('id', pa.int64()),
+    ('name_type', pa.dictionary(pa.int32(), pa.string())),
+    ('name', pa.dictionary(pa.int32(), pa.string())),
+])
+
+# the sort order of the names table, the id and type make the order deterministic
+names_sort_keys = [('name', 'ascending'), ('id', 'ascending'), ('name_type', 'ascending')]
+
+# the number of rows written at once when merging sorted runs
+MERGE_BATCH_SIZE = 65536
+
+
+def build_names_table(table: pa.Table) -> pa.Table:
+    "Flattens the name columns of the parsed certificates into a sorted table of (id, name_type, name) rows"
+    ids: List[pa.Array] = []
+    name_types: List[pa.Array] = []
+    names: List[pa.Array] = []
+
+    for column, name_type in name_columns.items():
+        if column not in table.column_names:
+            continue
+
+        lists = table[column].combine_chunks()
+        values = lists.flatten()
+        parents = pc.list_parent_indices(lists)
+
+        # names of a list might be missing
+        is_valid = pc.is_valid(values)
+
+        ids.append(pc.take(table['id'], parents.filter(is_valid)).combine_chunks())
+        names.append(values.filter(is_valid))
+        name_types.append(pa.array([name_type] * len(names[-1]), type=pa.string()))
+
+    if len(ids) == 0:
+        return names_schema.empty_table()
+
+    return encode_names(
+        pa.table({
+            'id': pa.concat_arrays(ids),
+            'name_type': pa.concat_arrays(name_types),
+            'name': pa.concat_arrays(names),
+        }).sort_by(names_sort_keys)
+    )
+
+
+def encode_names(table: pa.Table) -> pa.Table:
+    "Dictionary encodes the name types and names of a table with plain string columns"
+    return pa.table([
+        table['id'],
+        pc.dictionary_encode(table['name_type']),
+        pc.dictionary_encode(table['name']),
+    ], schema=names_schema)
+
+
+def iterate_run(file: pq.ParquetFile, row_group: int) -> Iterator[Tuple[str, int, str]]:
+    "Iterates over the (name, id, name_type) rows of one sorted row group"
+    for batch in file.iter_batches(batch_size=MERGE_BATCH_SIZE, row_groups=[row_group]):
+        yield from zip(
+            batch['name'].to_pylist(),
+            batch['id'].to_pylist(),
+            batch['name_type'].to_pylist()
+        )
+
+
+def merge_sorted_runs(input_paths: List[str], output_path: str):
+    """
+    Merges names tables whose row groups are each sorted into a single sorted table.
+    Only one batch per row group is held in memory at a time.
+    """
+    files = [pq.ParquetFile(path) for path in input_paths]
+
+    runs = [
+        iterate_run(file, row_group)
+        for file in files
+        for row_group in range(file.num_row_groups)
+    ]
+
+    # write to a temporary file first, an existing output is always complete
+    with pq.ParquetWriter(f"{output_path}.tmp", names_schema) as writer:
+        buffer: List[Tuple[str, int, str]] = []
+
+        # the tuples are ordered by name, id and name_type just like `names_sort_keys`
+        for row in heapq.merge(*runs):
+            buffer.append(row)
+
+            if len(buffer) == MERGE_BATCH_SIZE:
+                writer.write_table(rows_to_table(buffer))
+                buffer = []
+
+        if len(buffer) > 0 or len(runs) == 0:
+            writer.write_table(rows_to_table(buffer))
+
+    os.replace(f"{output_path}.tmp", output_path)
+
+
+def rows_to_table(rows: List[Tuple[str, int, str]]) -> pa.Table:
+    names, ids, name_types = zip(*rows) if len(rows) > 0 else ([], [], [])
+
+    return encode_names(pa.table({
+        'id': pa.array(ids, type=pa.int64()),
+        'name_type': pa.array(name_types, type=pa.string()),
+        'name': pa.array(names, type=pa.string()),
+    }))
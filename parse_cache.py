@@ -0,0 +1,146 @@
+import sqlite3
+import pickle
+from typing import Tuple, List, Dict, Any, Optional
+
+# sqlite limits the number of variables in a single statement
+# (https://www.sqlite.org/limits.html#max_variable_number)
+LOOKUP_BATCH_SIZE = 900
+
+
+class ParseCache:
+    """
+    Persists the extracted rows of certificates keyed by the certificate hash of the
+    input files, such that certificates seen in previous runs do not have to be parsed
+    again. The rows are stored as pickled tuples in the order of `columns`. The names
+    of the issuers the rows refer to by their id and the mapping errors of the
+    certificates are stored alongside. If the `version` of the stored rows doesn't
+    match, all of them are dropped.
+    """
+
+    def __init__(self, path: str, version: str, columns: List[str]):
+        self.columns = columns
+        self.connection = sqlite3.connect(path)
+
+        # the cache can always be rebuilt, durability is not a concern
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=OFF")
+
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        # a row of NULL marks a certificate that could not be parsed
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS certificates (hash TEXT PRIMARY KEY, row BLOB)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS issuers (id INTEGER PRIMARY KEY, names BLOB)"
+        )
+        # the (stage, extension, error) rows of the certificates with errors, see ErrorLog
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS errors (hash TEXT PRIMARY KEY, errors BLOB)"
+        )
+
+        # the version covers the extraction code as well as the columns
+        version = f"{version}:{','.join(columns)}"
+        stored_version = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'version'"
+        ).fetchone()
+
+        if stored_version is None or stored_version[0] != version:
+            if stored_version is not None:
+                print("Parse cache was written by a different extraction version, clearing it")
+
+            self.connection.execute("DELETE FROM certificates")
+            self.connection.execute("DELETE FROM issuers")
+            self.connection.execute("DELETE FROM errors")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                (version,)
+            )
+
+        self.connection.commit()
+
+    def lookup(self, hashes: List[str]) -> Dict[str, Optional[Tuple[Any, ...]]]:
+        "Returns the cached rows of the given hashes, hashes that are not cached are missing in the result"
+        rows: Dict[str, Optional[Tuple[Any, ...]]] = {}
+        unique_hashes = list(set(hashes))
+
+        for start in range(0, len(unique_hashes), LOOKUP_BATCH_SIZE):
+            batch = unique_hashes[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+
+            for hash, row in self.connection.execute(
+                f"SELECT hash, row FROM certificates WHERE hash IN ({placeholders})",
+                batch
+            ):
+                rows[hash] = None if row is None else pickle.loads(row)
+
+        return rows
+
+    def store(self, rows: List[Tuple[str, Optional[Tuple[Any, ...]]]]):
+        "Stores the rows of the given hashes, a row of None marks a certificate that could not be parsed"
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO certificates (hash, row) VALUES (?, ?)",
+            [
+                (hash, None if row is None else pickle.dumps(row, protocol=pickle.HIGHEST_PROTOCOL))
+                for hash, row in rows
+            ]
+        )
+        self.connection.commit()
+
+    def lookup_issuers(self, ids: List[int]) -> Dict[int, List[Any]]:
+        "Returns the names of the given issuers, issuers that are not cached are missing in the result"
+        issuers: Dict[int, List[Any]] = {}
+        unique_ids = list(set(ids))
+
+        for start in range(0, len(unique_ids), LOOKUP_BATCH_SIZE):
+            batch = unique_ids[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+
+            for id, names in self.connection.execute(
+                f"SELECT id, names FROM issuers WHERE id IN ({placeholders})",
+                batch
+            ):
+                issuers[id] = pickle.loads(names)
+
+        return issuers
+
+    def store_issuers(self, issuers: Dict[int, List[Any]]):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO issuers (id, names) VALUES (?, ?)",
+            [
+                (id, pickle.dumps(names, protocol=pickle.HIGHEST_PROTOCOL))
+                for id, names in issuers.items()
+            ]
+        )
+        self.connection.commit()
+
+    def lookup_errors(self, hashes: List[str]) -> Dict[str, List[Tuple[str, Optional[str], str]]]:
+        "Returns the errors of the given hashes, hashes without errors are missing in the result"
+        errors: Dict[str, List[Tuple[str, Optional[str], str]]] = {}
+        unique_hashes = list(set(hashes))
+
+        for start in range(0, len(unique_hashes), LOOKUP_BATCH_SIZE):
+            batch = unique_hashes[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+
+            for hash, rows in self.connection.execute(
+                f"SELECT hash, errors FROM errors WHERE hash IN ({placeholders})",
+                batch
+            ):
+                errors[hash] = pickle.loads(rows)
+
+        return errors
+
+    def store_errors(self, errors: Dict[str, List[Tuple[str, Optional[str], str]]]):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO errors (hash, errors) VALUES (?, ?)",
+            [
+                (hash, pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+                for hash, rows in errors.items()
+            ]
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
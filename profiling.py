@@ -0,0 +1,150 @@
+import io
+import json
+import time
+import resource
+import contextlib
+from typing import Tuple, List, Dict, Any, Iterable, Iterator, Optional
+
+
+def peak_rss() -> int:
+    "Returns the peak resident set size of the current process in bytes"
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profile:
+    """
+    Records the wall time, the CPU time, the number of processed items (rows, certificates
+    or bytes) and the peak memory usage of the stages of the extraction. Stages are named
+    hierarchically, the time of e.g. `read_csv.decompress` is part of the time of `read_csv`.
+    Coarse stages running once per chunk are measured with `stage`, fine grained ones
+    running once per certificate only record their wall time with `add`, the CPU time
+    and the memory usage would cost more to measure than the stages themselves. The
+    stages return immediately if the profile is not enabled.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, wall_time: float, cpu_time: float = 0.0, items: int = 1, rss: int = 0):
+        stage = self.stages.get(name)
+
+        if stage is None:
+            stage = self.stages[name] = {
+                'wall_time': 0.0, 'cpu_time': 0.0, 'calls': 0, 'items': 0
+            }
+
+        stage['wall_time'] += wall_time
+        stage['cpu_time'] += cpu_time
+        stage['calls'] += 1
+        stage['items'] += items
+
+        # the fine grained stages don't measure the memory usage
+        if rss > 0:
+            stage['peak_rss'] = max(stage.get('peak_rss', 0), rss)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, items: int = 0) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        yield
+
+        self.add(
+            name, time.perf_counter() - start, time.process_time() - cpu_start, items, peak_rss()
+        )
+
+    def count(self, name: str, items: int):
+        "Adds items to a stage whose number of items is only known after it ran"
+        if self.enabled:
+            self.stages[name]['items'] += items
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator[Any]:
+        "Measures every step of an iteration as the stage, e.g. reading the chunks of a file. The length of every item is counted"
+        if not self.enabled:
+            yield from iterable
+            return
+
+        iterator = iter(iterable)
+
+        while True:
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+
+            self.add(
+                name, time.perf_counter() - start, time.process_time() - cpu_start, len(item), peak_rss()
+            )
+
+            yield item
+
+    def merge(self, stages: Dict[str, Dict[str, Any]]):
+        "Adds the stages recorded by another process, e.g. a worker of the extraction"
+        for name, other in stages.items():
+            stage = self.stages.get(name)
+
+            if stage is None:
+                self.stages[name] = dict(other)
+                continue
+
+            for key in ['wall_time', 'cpu_time', 'calls', 'items']:
+                stage[key] += other[key]
+
+            if 'peak_rss' in other:
+                stage['peak_rss'] = max(stage.get('peak_rss', 0), other['peak_rss'])
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        "Returns the stages recorded since the last call and resets them"
+        stages = self.stages
+        self.stages = {}
+        return stages
+
+    def write(self, path: str, wall_time: float, statistics: Dict[str, int]):
+        # the CPU time of the worker processes is only part of the stages they ran
+        report = {
+            'wall_time': wall_time,
+            'cpu_time': time.process_time(),
+            'peak_rss': peak_rss(),
+            'stages': dict(sorted(self.stages.items())),
+            'statistics': statistics,
+        }
+
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+class TimedFile(io.RawIOBase):
+    "Wraps a binary file and records the time spent reading it as a stage, e.g. the decompression of a gzipped file"
+
+    def __init__(self, file: Any, profile: Profile, name: str):
+        self.file = file
+        self.profile = profile
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        size = self.file.readinto(buffer)
+
+        self.profile.add(
+            self.name, time.perf_counter() - start, time.process_time() - cpu_start, size
+        )
+
+        return size
+
+    def close(self):
+        self.file.close()
+        super().close()
@@ -0,0 +1,53 @@
+import os
+import sys
+import subprocess
+import pandas as pd
+import pyarrow.parquet as pq
+
+# the scripts are run in their own process, the extraction keeps global state (the
+# error log, the issuers, ..) across calls of its functions
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_script(script: str, *args) -> str:
+    "Runs one of the scripts of the repository and returns its output, fails if it exits with an error"
+    result = subprocess.run(
+        [sys.executable, f"{REPO_DIR}/{script}", *[str(arg) for arg in args]],
+        cwd=REPO_DIR, capture_output=True, text=True
+    )
+
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    return result.stdout
+
+
+def generate_dump(output_dir, files: int = 1, certificates: int = 100, seed: int = 0, malformed_share: float = 0.05, issuers: int = 8):
+    "Generates a synthetic dump, see generate_dump.py"
+    run_script(
+        "generate_dump.py", output_dir, "--files", files, "--certificates", certificates,
+        "--seed", seed, "--malformed-share", malformed_share, "--issuers", issuers
+    )
+
+
+def read_dump(path) -> pd.DataFrame:
+    return pd.read_csv(path, header=None)
+
+
+def write_dump(df: pd.DataFrame, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, header=False, index=False, compression='gzip')
+
+
+def assert_same_output(a, b, suffixes=["invalid.csv", "errors.csv", "single-valued.csv", "names.parquet", "issuers.parquet", "intermediates.parquet"]):
+    "Checks that two .parquet extraction outputs and the tables written along with them are the same"
+    a, b = str(a).removesuffix(".parquet"), str(b).removesuffix(".parquet")
+
+    assert pq.read_table(f"{a}.parquet").equals(pq.read_table(f"{b}.parquet"))
+
+    for suffix in suffixes:
+        if suffix.endswith(".parquet"):
+            assert pq.read_table(f"{a}-{suffix}").equals(pq.read_table(f"{b}-{suffix}")), suffix
+        else:
+            with open(f"{a}-{suffix}") as fa, open(f"{b}-{suffix}") as fb:
+                assert fa.read() == fb.read(), suffix
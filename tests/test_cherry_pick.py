@@ -0,0 +1,79 @@
+import os
+import shutil
+import subprocess
+import sys
+import pandas as pd
+
+from tests.helpers import REPO_DIR, run_script, generate_dump, read_dump
+
+# the indexed lookups are compared against reading all rows of the dump
+
+
+def pem(certificates) -> str:
+    return "".join(
+        "-----BEGIN CERTIFICATE-----\n" + c + "\n-----END CERTIFICATE-----\n" for c in certificates
+    )
+
+
+def test_lookup(tmp_path):
+    generate_dump(tmp_path / "dump", files=2, certificates=50)
+
+    # a copy of the first file, as if its certificates were part of another log
+    shutil.copy(tmp_path / "dump/dump-00000.gz", tmp_path / "dump/other-log.gz")
+
+    run_script("cherry-pick.py", "index", tmp_path / "dump", tmp_path / "index")
+
+    rows = pd.concat([
+        read_dump(tmp_path / f"dump/{file}").assign(file=file.removesuffix(".gz"))
+        for file in os.listdir(tmp_path / "dump")
+    ])
+
+    ids = [0, 7, 49, 50, 99]
+    pd.DataFrame({'id': [12, 7]}).to_csv(tmp_path / "ids.csv", index=False)
+
+    output = run_script(
+        "cherry-pick.py", "lookup", tmp_path / "index", *ids, 123456,
+        "--ids-file", tmp_path / "ids.csv", "--output-dir", tmp_path / "pem"
+    )
+    assert "Could not find any entry with id 123456" in output
+
+    # one file per row with the id, the rows of both logs are kept apart
+    expected = {
+        (row[1], row['file']): pem([row[3]] + row[4].split(";"))
+        for _, row in rows[rows[1].isin(ids + [12])].iterrows()
+    }
+    written = {}
+    for filename in os.listdir(tmp_path / "pem"):
+        id, file_offset = filename.removesuffix(".pem").split("-", 1)
+        file, offset = file_offset.rsplit("-", 1)
+        with open(tmp_path / f"pem/{filename}") as f:
+            written[(int(id), file)] = f.read()
+
+    assert written == expected
+
+
+def test_scan_matches_lookup(tmp_path):
+    generate_dump(tmp_path / "dump", files=2, certificates=30)
+    run_script("cherry-pick.py", "index", tmp_path / "dump", tmp_path / "index")
+
+    # the invocation without a command reads all inputs
+    scanned = run_script("cherry-pick.py", tmp_path / "dump", 42)
+    looked_up = run_script("cherry-pick.py", "lookup", tmp_path / "index", 42)
+
+    # apart from the progress / id lines, the same certificate is printed
+    assert [line for line in scanned.splitlines() if not line.startswith("Reading file")] == \
+        [line for line in looked_up.splitlines() if line != "id 42:"]
+
+
+def test_changed_input(tmp_path):
+    generate_dump(tmp_path / "dump", certificates=10)
+    run_script("cherry-pick.py", "index", tmp_path / "dump", tmp_path / "index")
+
+    os.utime(tmp_path / "dump/dump-00000.gz", (0, 0))
+
+    result = subprocess.run(
+        [sys.executable, f"{REPO_DIR}/cherry-pick.py", "lookup", tmp_path / "index", "1"],
+        cwd=REPO_DIR, capture_output=True, text=True
+    )
+    assert result.returncode != 0
+    assert "changed since the index was built" in result.stderr
@@ -0,0 +1,80 @@
+import os
+import pandas as pd
+
+from tests.helpers import run_script, generate_dump, read_dump, write_dump
+from dataset import load_manifest, save_manifest, part_paths, temporary_path
+
+# the partitioned output resumes interrupted runs and only extracts changed inputs again
+
+
+def read_dataset(path) -> pd.DataFrame:
+    return pd.read_parquet(path).sort_values('id', ignore_index=True)
+
+
+def test_resume_after_interrupted_run(tmp_path):
+    generate_dump(tmp_path / "dump", certificates=100)
+    dataset = tmp_path / "dataset"
+
+    run_script("extraction.py", tmp_path / "dump", dataset, "--chunk-size", "40")
+    expected = read_dataset(dataset)
+
+    # an interrupted run completed the first part only and left a half-written part behind
+    manifest = load_manifest(dataset)
+    [entry] = manifest['inputs'].values()
+    assert len(entry['parts']) == 3
+
+    for i in [1, 2]:
+        os.remove(f"{dataset}/{part_paths(entry, i)[0]}")
+    entry['parts'] = entry['parts'][:1]
+    entry['complete'] = False
+    save_manifest(dataset, manifest)
+
+    tmp_part = f"{dataset}/{temporary_path(part_paths(entry, 1)[0])}"
+    with open(tmp_part, 'wb') as f:
+        f.write(b"PAR1 truncated")
+
+    # the incomplete part is not read as part of the dataset
+    assert read_dataset(dataset).equals(read_dataset(f"{dataset}/{entry['parts'][0]}"))
+
+    # temporary parts of earlier versions weren't prefixed, they are removed as well
+    legacy_tmp_part = f"{dataset}/{part_paths(entry, 1)[0]}.tmp"
+    with open(legacy_tmp_part, 'wb') as f:
+        f.write(b"PAR1 truncated")
+
+    output = run_script("extraction.py", tmp_path / "dump", dataset, "--chunk-size", "40")
+    assert "after 1 completed chunks" in output
+
+    assert not os.path.exists(tmp_part) and not os.path.exists(legacy_tmp_part)
+    assert read_dataset(dataset).equals(expected)
+
+
+def test_changed_inputs(tmp_path):
+    generate_dump(tmp_path / "dump", certificates=60)
+    dataset = tmp_path / "dataset"
+    input_file = tmp_path / "dump/dump-00000.gz"
+
+    run_script("extraction.py", tmp_path / "dump", dataset)
+
+    # only the modification time changed, the checksum still matches
+    os.utime(input_file, (0, 0))
+    output = run_script("extraction.py", tmp_path / "dump", dataset)
+    assert "Skipping already extracted input" in output
+
+    [entry] = load_manifest(dataset)['inputs'].values()
+    assert entry['mtime'] == 0
+
+    # a different chunk size splits the input into different parts
+    output = run_script("extraction.py", tmp_path / "dump", dataset, "--chunk-size", "25")
+    assert "changed, extracting it again" in output
+    [entry] = load_manifest(dataset)['inputs'].values()
+    assert len(entry['parts']) == 3
+
+    # the content changed
+    dump = read_dump(input_file)
+    write_dump(dump.iloc[:30], input_file)
+    output = run_script("extraction.py", tmp_path / "dump", dataset, "--chunk-size", "25")
+    assert "changed, extracting it again" in output
+
+    run_script("extraction.py", tmp_path / "dump", tmp_path / "fresh", "--chunk-size", "25")
+    assert read_dataset(dataset).equals(read_dataset(tmp_path / "fresh"))
+    assert len(read_dataset(dataset)) <= 30
@@ -0,0 +1,118 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from click.testing import CliRunner
+
+from domain_index import index, load_index, query_ids, reverse_labels, normalize_name, PublicSuffixList
+from names import build_names_table
+
+# the queries of the index are compared against scanning all names
+
+
+public_suffix_rules = """
+// comments and empty lines are skipped
+
+com
+uk
+co.uk
+*.ck
+!www.ck
+"""
+
+certificate_names = {
+    1: ["www.example.com", "example.com"],
+    2: ["*.example.com"],
+    3: ["a.b.example.com", "WWW.Example.COM."],
+    4: ["example.co.uk", "shop.example.co.uk"],
+    5: ["foo.bar.ck", "www.ck", "x.www.ck"],
+    6: ["notexample.com", "192.168.0.1", "admin@example.com"],
+}
+
+
+def write_psl(tmp_path) -> str:
+    path = tmp_path / "public_suffix_list.dat"
+    path.write_text(public_suffix_rules)
+    return str(path)
+
+
+def build_index(tmp_path):
+    ids = list(certificate_names.keys())
+
+    # the names are split into common names and alternative names like the extraction does
+    table = pa.table({
+        'id': pa.array(ids, type=pa.int64()),
+        'subject_COMMON_NAME': pa.array([names[:1] for names in certificate_names.values()], type=pa.list_(pa.string())),
+        'EXTENSION_SUBJECT_ALTERNATIVE_NAME': pa.array([names[1:] for names in certificate_names.values()], type=pa.list_(pa.string())),
+    })
+    pq.write_table(build_names_table(table), tmp_path / "output-names.parquet")
+
+    result = CliRunner().invoke(index, [
+        str(tmp_path / "output-names.parquet"), str(tmp_path / "index"),
+        "--public-suffix-list", write_psl(tmp_path),
+    ])
+    assert result.exit_code == 0, result.output
+
+    info, names, domains = load_index(str(tmp_path / "index"))
+    return names, domains
+
+
+def scan(matches) -> list:
+    "The ids of the certificates having a (normalized) name the predicate matches"
+    return sorted(
+        id for id, names in certificate_names.items()
+        if any(matches(normalize_name(name)) for name in names)
+    )
+
+
+def test_reverse_labels():
+    assert reverse_labels("www.example.com") == "com.example.www"
+    assert reverse_labels("*.example.com") == "com.example.*"
+    assert reverse_labels(reverse_labels("a.b.example.co.uk")) == "a.b.example.co.uk"
+
+    # the subdomains of a name are a contiguous range of the sorted keys
+    keys = sorted(reverse_labels(normalize_name(name)) for names in certificate_names.values() for name in names)
+    positions = [i for i, key in enumerate(keys) if key.startswith("com.example.")]
+    assert positions == list(range(positions[0], positions[-1] + 1))
+
+
+def test_public_suffix_list(tmp_path):
+    psl = PublicSuffixList(write_psl(tmp_path))
+
+    assert psl.registrable_domain("www.example.com") == "example.com"
+    assert psl.registrable_domain("*.example.com") == "example.com"
+    assert psl.registrable_domain("shop.example.co.uk") == "example.co.uk"
+    # co.uk itself is a public suffix without a registrable domain
+    assert psl.registrable_domain("co.uk") is None
+    # wildcard rule and its exception
+    assert psl.registrable_domain("foo.bar.ck") == "foo.bar.ck"
+    assert psl.registrable_domain("x.www.ck") == "www.ck"
+    # the implicit "*" rule
+    assert psl.registrable_domain("example.org") == "example.org"
+    # no host names
+    assert psl.registrable_domain("192.168.0.1") is None
+    assert psl.registrable_domain("admin@example.com") is None
+
+
+def test_queries(tmp_path):
+    names, domains = build_index(tmp_path)
+    psl = PublicSuffixList(write_psl(tmp_path))
+
+    def query(name: str, mode: str) -> list:
+        return query_ids(names, domains, name, mode).tolist()
+
+    assert query("www.example.com", 'exact') == scan(lambda n: n == "www.example.com")
+    assert query("Www.Example.com.", 'exact') == [1, 3]
+    assert query("missing.example.com", 'exact') == []
+
+    assert query("foo.example.com", 'covers') == scan(lambda n: n in ["foo.example.com", "*.example.com"])
+    assert query("www.example.com", 'covers') == [1, 2, 3]
+
+    # exactly one label in front of example.com
+    assert query("*.example.com", 'wildcard') == scan(
+        lambda n: n.endswith(".example.com") and "." not in n.removesuffix(".example.com")
+    )
+
+    assert query("example.com", 'suffix') == scan(lambda n: n == "example.com" or n.endswith(".example.com"))
+    assert query("example.co.uk", 'suffix') == [4]
+
+    for domain in ["example.com", "example.co.uk", "www.ck", "foo.bar.ck", "notexample.com"]:
+        assert query(domain, 'domain') == scan(lambda n: psl.registrable_domain(n) == domain)
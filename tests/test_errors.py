@@ -0,0 +1,34 @@
+import glob
+import pandas as pd
+
+from tests.helpers import run_script, generate_dump
+
+# the certificates that could not be mapped are listed in the errors table of every
+# kind of output, instead of being printed
+
+
+def test_errors_table(tmp_path):
+    generate_dump(tmp_path / "dump", files=2, certificates=60, malformed_share=0.2)
+
+    run_script("extraction.py", tmp_path / "dump", tmp_path / "memory.parquet")
+    run_script("extraction.py", tmp_path / "dump", tmp_path / "stream.parquet", "--stream", "--chunk-size", "32")
+    run_script("extraction.py", tmp_path / "dump", tmp_path / "dataset", "--chunk-size", "32")
+
+    errors = pd.read_csv(tmp_path / "memory-errors.csv")
+    invalid = pd.read_csv(tmp_path / "memory-invalid.csv")
+
+    # every invalid certificate has an error, the valid ones don't
+    assert len(invalid) > 0
+    assert set(invalid['id']) == set(errors[errors['stage'] == 'decode']['id'])
+    assert set(errors['id']).isdisjoint(pd.read_parquet(tmp_path / "memory.parquet")['id'])
+
+    def sorted_errors(df: pd.DataFrame) -> pd.DataFrame:
+        return df.sort_values(list(df.columns), ignore_index=True)
+
+    assert sorted_errors(pd.read_csv(tmp_path / "stream-errors.csv")).equals(sorted_errors(errors))
+
+    # the errors of a dataset are written per part
+    dataset_errors = pd.concat([
+        pd.read_csv(path) for path in glob.glob(f"{tmp_path}/dataset/*/_errors-*.csv")
+    ])
+    assert sorted_errors(dataset_errors).equals(sorted_errors(errors))
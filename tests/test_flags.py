@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from cryptography import x509
+
+from extraction_helpers import flags_to_bitmask, flag_columns, map_key_usage, map_extended_key_usage
+from analysis.kernels import bitmasks, popcount, bitmask_bits, count_bits, count_bit_pairs
+
+# the bitmasks are compared against the columns of one boolean per flag they replaced
+
+
+def flags_of(mask: int, names: list) -> dict:
+    return {name: bool(mask >> bit & 1) for bit, name in enumerate(names)}
+
+
+def test_flags_to_bitmask():
+    assert flags_to_bitmask([]) == 0
+    # the first flag is the lowest bit
+    assert flags_to_bitmask([True]) == 1
+    assert flags_to_bitmask([False, True, False, True]) == 0b1010
+
+    flags = [bool(flag) for flag in np.random.default_rng(0).integers(0, 2, 40)]
+    assert list(flags_of(flags_to_bitmask(flags), range(40)).values()) == flags
+
+
+def test_key_usage_bits():
+    extension = x509.KeyUsage(
+        digital_signature=True, content_commitment=False, key_encipherment=True,
+        data_encipherment=False, key_agreement=True, key_cert_sign=False,
+        crl_sign=True, encipher_only=False, decipher_only=True,
+    )
+
+    [(name, mask)] = map_key_usage('EXTENSION_KEY_USAGE', extension)
+
+    # the bits follow the order of RFC 5280
+    assert name == 'EXTENSION_KEY_USAGE'
+    assert flags_of(mask, flag_columns[name]) == {
+        'DIGITAL_SIGNATURE': True,
+        'CONTENT_COMMITMENT': False,
+        'KEY_ENCIPHERMENT': True,
+        'DATA_ENCIPHERMENT': False,
+        'KEY_AGREEMENT': True,
+        'KEY_CERT_SIGN': False,
+        'CRL_SIGN': True,
+        'ENCIPHER_ONLY': False,
+        'DECIPHER_ONLY': True,
+    }
+
+
+def test_extended_key_usage_bits():
+    usages = ['SERVER_AUTH', 'CLIENT_AUTH']
+    extension = x509.ExtendedKeyUsage([getattr(x509.ExtendedKeyUsageOID, usage) for usage in usages])
+
+    [(name, mask)] = map_extended_key_usage('EXTENSION_EXTENDED_KEY_USAGE', extension)
+
+    assert flags_of(mask, flag_columns[name]) == {
+        usage: usage in usages for usage in flag_columns[name]
+    }
+
+
+def random_masks(count: int, bit_count: int) -> np.ndarray:
+    return np.random.default_rng(1).integers(0, 1 << bit_count, count).astype(np.uint64)
+
+
+def test_popcount():
+    masks = np.append(random_masks(1000, 20), np.array([0, 1, (1 << 64) - 1], dtype=np.uint64))
+
+    assert popcount(masks).tolist() == [bin(int(mask)).count("1") for mask in masks]
+
+
+def test_bitmasks():
+    # integer columns with missing values are read as floats
+    series = pd.Series([3.0, np.nan, 256.0])
+
+    assert bitmasks(series).tolist() == [3, 0, 256]
+
+
+def test_count_bits():
+    bit_count = len(flag_columns['EXTENSION_KEY_USAGE'])
+    masks = random_masks(200, bit_count)
+    counts = np.random.default_rng(2).integers(1, 100, len(masks))
+
+    bits = bitmask_bits(masks, bit_count)
+
+    expected_bits = np.zeros(bit_count, dtype=np.int64)
+    expected_pairs = np.zeros((bit_count, bit_count), dtype=np.int64)
+
+    for row, (mask, count) in enumerate(zip(masks, counts)):
+        flags = list(flags_of(int(mask), range(bit_count)).values())
+
+        assert bits[row].tolist() == flags
+
+        for i in range(bit_count):
+            if flags[i]:
+                expected_bits[i] += count
+
+            for j in range(bit_count):
+                if flags[i] and flags[j]:
+                    expected_pairs[i, j] += count
+
+    assert count_bits(masks, counts, bit_count).tolist() == expected_bits.tolist()
+    assert count_bit_pairs(masks, counts, bit_count).tolist() == expected_pairs.tolist()
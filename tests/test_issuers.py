@@ -0,0 +1,78 @@
+import os
+import base64
+import shutil
+import pandas as pd
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+
+from tests.helpers import run_script, generate_dump, read_dump
+
+# the certificates refer to their issuer by an id derived from the issuer name, the
+# same issuer has the same id in every output and the combined output
+
+
+def issuer_common_names(dump_dir) -> dict:
+    "Parses the issuer of every certificate of a dump, by the id of its log entry"
+    names = {}
+
+    for file in sorted(os.listdir(dump_dir)):
+        dump = read_dump(f"{dump_dir}/{file}")
+
+        for id, certificate_base64 in zip(dump[1], dump[3]):
+            certificate = x509.load_der_x509_certificate(base64.b64decode(certificate_base64))
+            names[id] = [
+                attribute.value for attribute in certificate.issuer.get_attributes_for_oid(NameOID.COMMON_NAME)
+            ]
+
+    return names
+
+
+def joined_common_names(output) -> dict:
+    "Joins the certificates of an output with its issuers table, by the id of the certificates"
+    certificates = pd.read_parquet(output, columns=['id', 'issuer_id'])
+    issuers = pd.read_parquet(output.replace(".parquet", "-issuers.parquet")).set_index('issuer_id')
+
+    assert issuers.index.is_unique
+
+    return {
+        id: list(issuers.loc[issuer_id, 'issuer_COMMON_NAME'])
+        for id, issuer_id in zip(certificates['id'], certificates['issuer_id'])
+    }
+
+
+def test_issuer_ids_across_combined_outputs(tmp_path):
+    generate_dump(tmp_path / "dump", files=2, certificates=80, malformed_share=0)
+
+    # the files share their issuers, each one is extracted on its own
+    for i in range(2):
+        os.makedirs(tmp_path / f"input-{i}")
+        shutil.copy(tmp_path / f"dump/dump-0000{i}.gz", tmp_path / f"input-{i}")
+        run_script("extraction.py", tmp_path / f"input-{i}", tmp_path / f"output-{i}.parquet")
+
+    first, second = [
+        pd.read_parquet(tmp_path / f"output-{i}-issuers.parquet").set_index('issuer_id')
+        for i in range(2)
+    ]
+    shared = first.index.intersection(second.index)
+    assert len(shared) > 0
+    assert first.loc[shared, 'issuer_COMMON_NAME'].map(list).equals(second.loc[shared, 'issuer_COMMON_NAME'].map(list))
+
+    combined = str(tmp_path / "combined.parquet")
+    run_script("combiner.py", tmp_path / "output-0.parquet", tmp_path / "output-1.parquet", combined)
+
+    # the names joined by the id match the names of the certificates themselves
+    expected = issuer_common_names(tmp_path / "dump")
+    assert joined_common_names(combined) == expected
+    assert joined_common_names(str(tmp_path / "output-0.parquet")).items() <= expected.items()
+
+
+def test_single_issuer_keeps_issuer_id(tmp_path):
+    generate_dump(tmp_path / "dump", certificates=30, issuers=1, malformed_share=0)
+    run_script("extraction.py", tmp_path / "dump", tmp_path / "output.parquet")
+
+    combined = str(tmp_path / "combined.parquet")
+    run_script("combiner.py", tmp_path / "output.parquet", combined)
+
+    # the column only holds a single value but is needed to join the issuers
+    assert 'issuer_id' in pd.read_parquet(combined).columns
+    assert joined_common_names(combined) == issuer_common_names(tmp_path / "dump")
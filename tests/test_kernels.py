@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from analysis.kernels import list_lengths, flatten_lists, distinct_values_per_key, count_distinct_values_per_key, single_distinct_values, list_types_mapper
+
+# the kernels are compared against the row-wise implementations they replaced
+
+
+def lists_series(arrow: bool) -> pd.Series:
+    "A list column like the ones read from the extraction output, with missing and empty lists"
+    rows = [
+        ["a.example.com", "b.example.com"],
+        None,
+        [],
+        ["c.example.org", "c.example.org"],
+        ["d.example.net"],
+        ["a.example.com", None, "e.example.com"],
+    ]
+
+    if arrow:
+        table = pa.table({'names': pa.array(rows, type=pa.list_(pa.string()))})
+        return table.to_pandas(types_mapper=list_types_mapper)['names']
+
+    return pd.Series([None if row is None else np.array(row, dtype=object) for row in rows])
+
+
+def row_lists(series: pd.Series):
+    return [None if row is None or row is pd.NA else list(row) for row in series]
+
+
+def test_list_lengths():
+    for arrow in [False, True]:
+        series = lists_series(arrow)
+
+        expected = [0 if row is None else len(row) for row in row_lists(series)]
+
+        assert list_lengths(series).tolist() == expected
+
+
+def test_flatten_lists():
+    for arrow in [False, True]:
+        series = lists_series(arrow)
+
+        expected_rows = []
+        expected_values = []
+        for i, row in enumerate(row_lists(series)):
+            for value in row or []:
+                expected_rows.append(i)
+                expected_values.append(value)
+
+        rows, values = flatten_lists(series)
+
+        assert rows.tolist() == expected_rows
+        assert values.to_pylist() == expected_values
+
+
+def test_single_distinct_values():
+    for arrow in [False, True]:
+        series = lists_series(arrow)
+
+        is_single, single_values = single_distinct_values(series)
+
+        for i, row in enumerate(row_lists(series)):
+            distinct = set(row or [])
+
+            assert is_single[i] == (len(distinct) == 1)
+
+            if len(distinct) == 1:
+                assert single_values[i] == distinct.pop()
+
+
+def test_distinct_values_per_key():
+    series = lists_series(False)
+    # the second to last row has no key and is skipped
+    keys = np.array(["DE", "US", "DE", "US", np.nan, "DE"], dtype=object)
+
+    expected = {}
+    for key, row in zip(keys, row_lists(series)):
+        if pd.isna(key):
+            continue
+
+        expected.setdefault(key, set()).update(row or [])
+
+    pairs = distinct_values_per_key(keys, series, 'country', 'name')
+
+    assert sorted(zip(pairs['country'].to_pylist(), pairs['name'].to_pylist()), key=str) == \
+        sorted([(key, value) for key, values in expected.items() for value in values], key=str)
+
+    counts = count_distinct_values_per_key(pairs, 'country')
+
+    assert counts.to_dict() == {key: len(values) for key, values in expected.items() if len(values) > 0}
@@ -0,0 +1,37 @@
+import shutil
+import pytest
+import pandas as pd
+
+from tests.helpers import run_script, generate_dump, read_dump, write_dump, assert_same_output
+
+# a run with a warm parse cache has to write the same output as a run without the cache
+
+
+@pytest.mark.parametrize("mode", [[], ["--stream", "--chunk-size", "64"], ["--workers", "2", "--chunk-size", "64"]])
+def test_cache_hits_keep_the_ids(tmp_path, mode):
+    generate_dump(tmp_path / "first", certificates=100, malformed_share=0.1)
+
+    # the same certificates under different ids, as if they were part of another log
+    dump = read_dump(tmp_path / "first/dump-00000.gz")
+    dump[1] += 1000000
+    write_dump(dump, tmp_path / "both/dump-00001.gz")
+    shutil.copy(tmp_path / "first/dump-00000.gz", tmp_path / "both/dump-00000.gz")
+
+    cache = tmp_path / "cache.sqlite"
+
+    # the first run fills the cache, all certificates of the second dump are cache hits
+    run_script("extraction.py", tmp_path / "first", tmp_path / "first.parquet", "--cache", cache, *mode)
+    output = run_script("extraction.py", tmp_path / "both", tmp_path / "cached.parquet", "--cache", cache, *mode)
+    assert "Parse cache: 200 hits, 0 misses" in output
+
+    run_script("extraction.py", tmp_path / "both", tmp_path / "uncached.parquet", *mode)
+
+    assert_same_output(tmp_path / "cached.parquet", tmp_path / "uncached.parquet")
+
+    # every certificate keeps the id of its log entry, the errors included
+    ids = set(pd.read_parquet(tmp_path / "cached.parquet")['id'])
+    assert any(id >= 1000000 for id in ids) and any(id < 1000000 for id in ids)
+
+    errors = pd.read_csv(tmp_path / "cached-errors.csv")
+    assert len(errors) > 0
+    assert (errors['id'] >= 1000000).sum() == (errors['id'] < 1000000).sum()
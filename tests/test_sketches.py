@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from analysis.sketches import HyperLogLog, HeavyHitters
+
+# the sketches are compared against the exact counts they approximate
+
+
+def names(count: int, offset: int = 0) -> np.ndarray:
+    return np.array([f"host-{i}.example.com" for i in range(offset, offset + count)], dtype=object)
+
+
+def test_hyperloglog_error_bound():
+    for count in [100, 5000, 200000]:
+        sketch = HyperLogLog().add(names(count))
+
+        # within 3 standard errors, the hashes are deterministic
+        assert abs(sketch.estimate() - count) <= 3 * sketch.standard_error() * count
+
+
+def test_hyperloglog_merge_is_union():
+    a = HyperLogLog().add(names(60000))
+    b = HyperLogLog().add(names(60000, offset=30000))
+
+    merged = a.merge(b)
+
+    assert np.array_equal(merged.registers, HyperLogLog().add(names(90000)).registers)
+    assert abs(merged.estimate() - 90000) <= 3 * merged.standard_error() * 90000
+
+    # duplicates and missing values don't change the sketch
+    assert np.array_equal(a.add(np.append(names(100), [None, np.nan])).registers, a.registers)
+
+
+def zipf_values(count: int, seed: int) -> np.ndarray:
+    ranks = np.random.default_rng(seed).zipf(1.3, count)
+    return np.array([f"issuer-{rank}" for rank in ranks], dtype=object)
+
+
+def check_heavy_hitters(sketch: HeavyHitters, values: np.ndarray):
+    exact = pd.Series(values).value_counts()
+
+    bound = sketch.error_bound()
+    assert bound <= len(values) / (sketch.capacity + 1)
+
+    counts = sketch.counters['count']
+
+    # the counts are never too high and at most `bound` too low
+    assert (counts <= exact[counts.index]).all()
+    assert (exact[counts.index] - counts <= bound).all()
+
+    # every value occurring more often than the bound is kept
+    assert set(exact[exact > bound].index) <= set(counts.index)
+
+
+def test_heavy_hitters_error_bound():
+    values = zipf_values(50000, seed=1)
+
+    sketch = HeavyHitters(capacity=50)
+    for batch in np.array_split(values, 7):
+        sketch.add(batch)
+
+    check_heavy_hitters(sketch, values)
+
+
+def test_heavy_hitters_merge():
+    a_values = zipf_values(30000, seed=2)
+    b_values = zipf_values(20000, seed=3)
+
+    merged = HeavyHitters(capacity=50).add(a_values).merge(HeavyHitters(capacity=50).add(b_values))
+
+    check_heavy_hitters(merged, np.concatenate([a_values, b_values]))
+
+    # the summary survives the serialization
+    restored = HeavyHitters.from_dict(merged.to_dict())
+    assert restored.top(10).equals(merged.top(10))
+
+
+def test_heavy_hitters_exact_below_capacity():
+    values = np.array(["a", "b", "a", None, "c", "a", "b"], dtype=object)
+    weights = np.arange(len(values), dtype=np.float64)
+
+    sketch = HeavyHitters(capacity=10).add(values, weights)
+
+    # nothing is dropped, the counts and weights are exact
+    assert sketch.error_bound() == 0
+    assert sketch.counters['count'].to_dict() == {"a": 3, "b": 2, "c": 1}
+    assert sketch.counters['weight'].to_dict() == {"a": 0 + 2 + 5, "b": 1 + 6, "c": 4}